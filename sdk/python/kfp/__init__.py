@@ -14,4 +14,5 @@
 # limitations under the License.
 
 from ._client import Client
+from ._local_runner import LocalRunner
 from ._config import *
\ No newline at end of file
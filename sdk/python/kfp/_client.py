@@ -25,6 +25,7 @@ from .compiler import compiler
 from .compiler import _k8s_helper
 
 from ._auth import get_auth_token
+from ._resume import build_rerun_workflow, build_resume_workflow
 
 class Client(object):
   """ API Client for KubeFlow Pipeline.
@@ -166,16 +167,19 @@ class Client(object):
     raise ValueError('No experiment is found with name {}.'.format(experiment_name))
 
   def _extract_pipeline_yaml(self, tar_file):
+    """Extracts the workflow from a package holding either a pipeline yaml or json file."""
     with tarfile.open(tar_file, "r:gz") as tar:
-      all_yaml_files = [m for m in tar if m.isfile() and 
-          (os.path.splitext(m.name)[-1] == '.yaml' or os.path.splitext(m.name)[-1] == '.yml')]
-      if len(all_yaml_files) == 0:
+      all_pipeline_files = [m for m in tar if m.isfile() and
+          os.path.splitext(m.name)[-1] in ['.yaml', '.yml', '.json']]
+      if len(all_pipeline_files) == 0:
         raise ValueError('Invalid package. Missing pipeline yaml file in the package.')
         
-      if len(all_yaml_files) > 1:
+      if len(all_pipeline_files) > 1:
         raise ValueError('Invalid package. Multiple yaml files in the package.')
         
-      with tar.extractfile(all_yaml_files[0]) as f:
+      with tar.extractfile(all_pipeline_files[0]) as f:
+        if os.path.splitext(all_pipeline_files[0].name)[-1] == '.json':
+          return json.load(f)
         return yaml.load(f)
 
   def run_pipeline(self, experiment_id, job_name, pipeline_package_path=None, params={}, pipeline_id=None):
@@ -199,12 +203,19 @@ class Client(object):
       pipeline_json_string = json.dumps(pipeline_obj)
     api_params = [kfp_run.ApiParameter(name=_k8s_helper.K8sHelper.sanitize_k8s_name(k), value=str(v))
                   for k,v in params.items()]
+    return self._create_run(experiment_id, job_name, api_params, pipeline_id=pipeline_id,
+                            workflow_manifest=pipeline_json_string)
+
+  def _create_run(self, experiment_id, job_name, api_params, pipeline_id=None, workflow_manifest=None):
+    """Creates a run of a pipeline or of a workflow manifest in an experiment."""
+    import kfp_run
+
     key = kfp_run.models.ApiResourceKey(id=experiment_id,
                                         type=kfp_run.models.ApiResourceType.EXPERIMENT)
     reference = kfp_run.models.ApiResourceReference(key, kfp_run.models.ApiRelationship.OWNER)
     spec = kfp_run.models.ApiPipelineSpec(
         pipeline_id=pipeline_id,
-        workflow_manifest=pipeline_json_string, 
+        workflow_manifest=workflow_manifest,
         parameters=api_params)
     run_body = kfp_run.models.ApiRun(
         pipeline_spec=spec, resource_references=[reference], name=job_name)
@@ -218,6 +229,42 @@ class Client(object):
       IPython.display.display(IPython.display.HTML(html))
     return response.run
 
+  def rerun(self, run_id, from_failed=True, job_name=None):
+    """Runs the pipeline of a run again, in the experiment of the run.
+
+    Args:
+      run_id: the id of the run, returned from run_pipeline.
+      from_failed: whether to resume the run from its failed steps. The succeeded steps are
+          skipped, and the steps downstream of them take their recorded output parameters and
+          artifacts. Steps which ran several times, such as the steps of loops, run again.
+          Otherwise the whole pipeline runs again. Default: True.
+      job_name: the name of the new run. Defaults to the name of the run with a suffix.
+
+    Returns:
+      A run object. Most important field is id.
+
+    Raises:
+      ValueError if from_failed is set and the run has no failed step.
+    """
+    import kfp_run
+
+    run = self._run_api.get_run(run_id=run_id).run
+    workflow = self._get_workflow_json(run_id)
+    if from_failed:
+      workflow, skipped_tasks = build_resume_workflow(workflow)
+      logging.info('Resuming the run %s, skipping %d succeeded task(s).', run_id, len(skipped_tasks))
+    else:
+      workflow = build_rerun_workflow(workflow)
+    experiment_ids = [reference.key.id for reference in run.resource_references or []
+                      if reference.key.type == kfp_run.models.ApiResourceType.EXPERIMENT]
+    if not experiment_ids:
+      raise ValueError('The run %s is not in an experiment.' % run_id)
+    api_params = [kfp_run.ApiParameter(name=p.name, value=p.value)
+                  for p in run.pipeline_spec.parameters or []]
+    job_name = job_name or '%s (%s)' % (run.name, 'resumed' if from_failed else 'rerun')
+    return self._create_run(experiment_ids[0], job_name, api_params,
+                            workflow_manifest=json.dumps(workflow))
+
   def list_runs(self, page_token='', page_size=10, sort_by='', experiment_id=None):
     """List runs.
     Args:
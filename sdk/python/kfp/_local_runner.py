@@ -0,0 +1,301 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import namedtuple
+import concurrent.futures
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from . import dsl
+from .compiler import compiler
+from .compiler._group_index import GroupTreeIndex
+from .compiler._k8s_helper import K8sHelper
+from .dsl._pipeline_param import _split_serialized_pipelineparams
+
+
+# status is 'Succeeded' or 'Failed'. op_statuses is a dict of the op names to 'Succeeded',
+# 'Failed', 'Skipped' or 'Omitted'. outputs is a dict of the op names to dicts of their output
+# names to values.
+LocalRunResult = namedtuple('LocalRunResult', 'status op_statuses outputs work_dir')
+
+_OPERATORS = {
+  '==': lambda a, b: a == b,
+  '!=': lambda a, b: a != b,
+  '<': lambda a, b: a < b,
+  '<=': lambda a, b: a <= b,
+  '>': lambda a, b: a > b,
+  '>=': lambda a, b: a >= b,
+}
+
+
+def _evaluate_condition(operator, value1, value2):
+  """Compares two values like argo, as numbers if both are numbers and as strings otherwise."""
+  try:
+    value1, value2 = float(value1), float(value2)
+  except ValueError:
+    pass
+  return _OPERATORS[operator](value1, value2)
+
+
+def _copy(source, destination):
+  os.makedirs(os.path.dirname(destination), exist_ok=True)
+  if os.path.isdir(source):
+    shutil.copytree(source, destination)
+  else:
+    shutil.copyfile(source, destination)
+
+
+class LocalRunner(object):
+  """Runs pipelines on the local machine, without a cluster.
+
+  The ops run as local processes in a thread pool, as soon as the ops they depend on are
+  done, instead of in containers. Commands starting with a python interpreter, such as the
+  ones of python function components, run with the current interpreter. The file outputs and
+  artifacts of the ops are stored in a local work directory, and the command arguments which
+  are their paths are rewritten to point there. Conditions and exit handlers are honored,
+  loops are not supported.
+
+  Example usage:
+  ```python
+  result = LocalRunner().run(my_pipeline, {'learning_rate': '0.1'})
+  print(result.status, result.outputs['train'])
+  ```
+  """
+
+  def __init__(self, work_dir: str=None, max_workers: int=None):
+    """Create a new instance of LocalRunner.
+
+    Args:
+      work_dir: the directory holding the outputs and logs of the runs. Defaults to a new
+          temporary directory per run.
+      max_workers: the maximum number of ops running at the same time. Defaults to the
+          ThreadPoolExecutor default.
+    """
+    self.work_dir = work_dir
+    self.max_workers = max_workers
+
+  def run(self, pipeline_func, arguments: dict=None):
+    """Runs a pipeline function decorated with @dsl.pipeline.
+
+    Args:
+      pipeline_func: the pipeline function.
+      arguments: a dict of the pipeline argument names to their values. The arguments
+          without values take their default values.
+
+    Returns:
+      A LocalRunResult. The log of every op is written to <work_dir>/<op name>/log.txt.
+
+    Raises:
+      ValueError if an argument has no value, or if the pipeline has a loop or an op without
+      an explicit command.
+    """
+    pipeline, args = compiler.Compiler()._build_pipeline(pipeline_func)
+    return _LocalRun(pipeline, args, arguments or {},
+                     self.work_dir or tempfile.mkdtemp(prefix='kfp-local-run-'),
+                     self.max_workers).run()
+
+
+class _LocalRun(object):
+  """The state of one run of a LocalRunner."""
+
+  def __init__(self, pipeline, args, arguments, work_dir, max_workers):
+    self.pipeline = pipeline
+    self.work_dir = work_dir
+    self.max_workers = max_workers
+    self.values = {}
+    for arg in args:
+      value = arguments.get(arg.name, arguments.get(K8sHelper.sanitize_k8s_name(arg.name), arg.value))
+      if value is None:
+        raise ValueError('The pipeline argument %s has no value.' % arg.name)
+      self.values[arg.name] = str(value)
+    # Key is an op name, value is a dict of the output names to the local output paths.
+    self.output_paths = {}
+    self.statuses = {}
+
+    self.group_index = GroupTreeIndex(pipeline.groups[0])
+    self.conditions = {}
+    self._index_conditions(pipeline.groups[0], [])
+    # Key is an op name, value is a tuple (data dependencies, other dependencies).
+    self.dependencies = {}
+    for op in pipeline.ops.values():
+      if not op.command:
+        raise ValueError('The op %s has no explicit command, which LocalRunner needs.' % op.name)
+      data_dependencies = set(param.op_name for param in op.inputs if param.op_name)
+      data_dependencies |= set(param.op_name for param in self.group_index.condition_params[op.name]
+                               if param.op_name)
+      other_dependencies = set(op.dependent_op_names) | set(pipeline.upstream_ops.get(op.name, ()))
+      self.dependencies[op.name] = (data_dependencies, other_dependencies - data_dependencies)
+
+  def _index_conditions(self, group, conditions):
+    if isinstance(group, dsl.ParallelFor):
+      raise ValueError('LocalRunner does not support loops.')
+    if group.type == 'condition':
+      conditions = conditions + [group.condition]
+    for op in group.ops:
+      self.conditions[op.name] = conditions
+    for sub_group in group.groups:
+      self._index_conditions(sub_group, conditions)
+
+  def _value(self, param):
+    """Returns the value of a PipelineParam or PipelineParamTuple of a finished run step."""
+    op_name = getattr(param, 'op_name', getattr(param, 'op', None))
+    if not op_name:
+      if param.value:
+        return str(param.value)
+      return self.values[K8sHelper.sanitize_k8s_name(param.name)]
+    path = self.output_paths[K8sHelper.sanitize_k8s_name(op_name)][K8sHelper.sanitize_k8s_name(param.name)]
+    with open(path) as f:
+      return f.read()
+
+  def _operand_value(self, operand):
+    return self._value(operand) if isinstance(operand, dsl.PipelineParam) else str(operand)
+
+  def _prepare(self, op, op_dir):
+    """Resolves the command line and the environment of an op, and stages its input artifacts."""
+    # Key is a path of the op, value is the local path it is rewritten to.
+    local_paths = {}
+    output_paths = {}
+    for name, path in list((op.file_outputs or {}).items()) + list(op.output_artifact_paths.items()):
+      local_path = os.path.join(op_dir, 'outputs', name, os.path.basename(path.rstrip('/')) or 'data')
+      os.makedirs(os.path.dirname(local_path), exist_ok=True)
+      local_paths[path] = output_paths[name] = local_path
+    self.output_paths[op.name] = output_paths
+    for argument in op.artifact_arguments:
+      local_path = os.path.join(op_dir, 'inputs', argument.input, os.path.basename(argument.path) or 'data')
+      if isinstance(argument.argument, dsl.PipelineParam) and argument.argument.op_name:
+        _copy(self.output_paths[argument.argument.op_name][argument.argument.name], local_path)
+      else:
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, 'w') as f:
+          f.write(self._operand_value(argument.argument))
+      local_paths[argument.path] = local_path
+
+    # A path is only rewritten as a whole argument, a prefix of an argument followed by '/', or
+    # the value of a --flag=value argument, so that longer paths and messages are left alone.
+    path_pattern = None
+    if local_paths:
+      path_pattern = re.compile(r'(^|=)(%s)(?=/|$)' % '|'.join(
+          re.escape(path) for path in sorted(local_paths, key=len, reverse=True)))
+
+    def _resolve(value):
+      parts = []
+      for text, param in _split_serialized_pipelineparams(str(value), op._placeholders):
+        if param is not None:
+          parts.append(self._value(param))
+          continue
+        if path_pattern:
+          text = path_pattern.sub(lambda match: match.group(1) + local_paths[match.group(2)], text)
+        parts.append(text)
+      return ''.join(parts)
+
+    command = [_resolve(x) for x in list(op.command) + list(op.arguments or [])]
+    if os.path.basename(command[0]).startswith('python'):
+      command[0] = sys.executable
+    env = dict(os.environ)
+    for env_variable in op.env_variables:
+      if getattr(env_variable, 'value', None) is not None:
+        env[env_variable.name] = _resolve(env_variable.value)
+    return command, env
+
+  def _run_op(self, op):
+    """Runs an op. Errors, such as a missing upstream output or command, fail the op only."""
+    op_dir = os.path.join(self.work_dir, op.name)
+    os.makedirs(op_dir, exist_ok=True)
+    with open(os.path.join(op_dir, 'log.txt'), 'w') as log:
+      try:
+        command, env = self._prepare(op, op_dir)
+      except (OSError, KeyError) as e:
+        log.write('The op could not be prepared: %r\n' % e)
+        return 'Failed'
+      # Ops without their own retries or timeout get the pipeline level defaults, like in the
+      # compiled workflow.
+      num_retries = op.num_retries or self.pipeline.conf.default_num_retries or 0
+      timeout = op.timeout or self.pipeline.conf.default_timeout
+      for attempt in range(num_retries + 1):
+        try:
+          code = subprocess.call(command, env=env, cwd=op_dir, stdout=log,
+                                 stderr=subprocess.STDOUT, timeout=timeout)
+        except subprocess.TimeoutExpired:
+          log.write('The op timed out after %d seconds.\n' % timeout)
+          code = None
+        except OSError as e:
+          log.write('The op could not be started: %r\n' % e)
+          code = None
+        if code == 0:
+          return 'Succeeded'
+        logging.info('The op %s failed, attempt %d of %d.', op.name, attempt + 1, num_retries + 1)
+    return 'Failed'
+
+  def _status_before_running(self, op_name):
+    """Returns the status of an op whose dependencies are done, or None if it needs to run."""
+    data_dependencies, other_dependencies = self.dependencies[op_name]
+    dependency_statuses = set(self.statuses[x] for x in data_dependencies | other_dependencies)
+    if dependency_statuses & {'Failed', 'Omitted'}:
+      return 'Omitted'
+    if any(self.statuses[x] != 'Succeeded' for x in data_dependencies):
+      return 'Skipped'
+    for condition in self.conditions.get(op_name, []):
+      try:
+        operand1 = self._operand_value(condition.operand1)
+        operand2 = self._operand_value(condition.operand2)
+      except (OSError, KeyError) as e:
+        # E.g. an upstream op succeeded without writing the output the condition checks.
+        logging.warning('The condition of the op %s could not be evaluated: %r', op_name, e)
+        return 'Failed'
+      if not _evaluate_condition(condition.operator, operand1, operand2):
+        return 'Skipped'
+    return None
+
+  def run(self):
+    exit_ops = [op for op in self.pipeline.ops.values() if op.is_exit_handler]
+    pending = [op for op in self.pipeline.ops.values() if not op.is_exit_handler]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+      running = {}
+      while pending or running:
+        for op in list(pending):
+          if not all(x in self.statuses for x in set.union(*self.dependencies[op.name])):
+            continue
+          pending.remove(op)
+          status = self._status_before_running(op.name)
+          if status is not None:
+            self.statuses[op.name] = status
+          else:
+            running[executor.submit(self._run_op, op)] = op
+        if not running:
+          if pending:
+            raise ValueError('The ops %s depend on each other.' % [op.name for op in pending])
+          break
+        done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+          self.statuses[running.pop(future).name] = future.result()
+
+    status = 'Failed' if 'Failed' in self.statuses.values() else 'Succeeded'
+    for op in exit_ops:
+      self.statuses[op.name] = self._run_op(op)
+
+    outputs = {}
+    for op_name, output_paths in self.output_paths.items():
+      if self.statuses.get(op_name) == 'Succeeded':
+        outputs[op_name] = {}
+        for name, path in output_paths.items():
+          if os.path.isfile(path):
+            with open(path) as f:
+              outputs[op_name][name] = f.read()
+    return LocalRunResult(status, self.statuses, outputs, self.work_dir)
@@ -0,0 +1,174 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import defaultdict
+import copy
+import re
+
+
+# The metadata fields of a workflow which argo sets when it is submitted.
+_SUBMITTED_METADATA_FIELDS = ['name', 'namespace', 'uid', 'resourceVersion', 'selfLink',
+                              'creationTimestamp', 'generation', 'labels', 'annotations']
+
+# The fields of a recorded artifact which locate it in the artifact repository.
+_ARTIFACT_LOCATION_FIELDS = ['s3', 'gcs', 'http', 'git', 'artifactory', 'hdfs', 'raw']
+
+_TASK_OUTPUT_REFERENCE = re.compile(r'{{tasks\.([^.}]+)\.outputs\.(parameters|artifacts)\.([^}]+)}}')
+
+
+def _succeeded_task_outputs(workflow):
+  """Collects the outputs of the succeeded tasks from the status of a workflow.
+
+  The tasks are op tasks, and group tasks whose whole DAG succeeded.
+
+  Returns:
+    A dict. Key is a tuple (DAG template name, task name), value is the outputs of the node,
+    with the parameters and artifacts indexed by name. Tasks which ran several times, such as
+    the tasks of loops, are left out, since their downstream tasks may need any of the runs.
+  """
+  nodes = workflow.get('status', {}).get('nodes', {})
+  entrypoint = workflow['spec'].get('entrypoint')
+  runs = defaultdict(list)
+  for node in nodes.values():
+    if node.get('type') not in ['Pod', 'Retry', 'DAG'] or node.get('templateName') == entrypoint:
+      continue
+    boundary = nodes.get(node.get('boundaryID'), {})
+    runs[(boundary.get('templateName'), node.get('displayName'))].append(node)
+
+  outputs = {}
+  for key, task_nodes in runs.items():
+    if len(task_nodes) != 1 or task_nodes[0].get('phase') != 'Succeeded':
+      continue
+    node_outputs = task_nodes[0].get('outputs', {})
+    outputs[key] = {
+      'parameters': {p['name']: p.get('value', '') for p in node_outputs.get('parameters', [])},
+      'artifacts': {a['name']: a for a in node_outputs.get('artifacts', [])},
+    }
+  return outputs
+
+
+def _replace_references(value, outputs):
+  """Replaces the references to the outputs of skipped tasks in a DAG template value.
+
+  Args:
+    value: a part of a DAG template.
+    outputs: dict of the names of the skipped tasks of the DAG to their recorded outputs.
+  """
+  if isinstance(value, list):
+    return [_replace_references(x, outputs) for x in value]
+  if isinstance(value, dict):
+    match = _TASK_OUTPUT_REFERENCE.fullmatch(value.get('from', ''))
+    if match and match.group(1) in outputs and match.group(2) == 'artifacts':
+      # An artifact argument takes the recorded artifact location instead.
+      artifact = outputs[match.group(1)]['artifacts'][match.group(3)]
+      replaced = {k: v for k, v in value.items() if k != 'from'}
+      replaced.update({k: copy.deepcopy(v) for k, v in artifact.items() if k in _ARTIFACT_LOCATION_FIELDS})
+      return replaced
+    return {k: _replace_references(v, outputs) for k, v in value.items()}
+  if isinstance(value, str):
+    def _replace(match):
+      task_name, kind, name = match.groups()
+      if task_name not in outputs or kind != 'parameters':
+        return match.group(0)
+      return outputs[task_name]['parameters'][name]
+    return _TASK_OUTPUT_REFERENCE.sub(_replace, value)
+  return value
+
+
+def build_rerun_workflow(workflow):
+  """Builds a workflow running all the steps of a run again.
+
+  Args:
+    workflow: the workflow of the run, with its status, as returned by
+        Client._get_workflow_json.
+
+  Returns:
+    A copy of the workflow without its status and the metadata set by argo, which can be
+    submitted as a new run.
+  """
+  rerun = {key: copy.deepcopy(value) for key, value in workflow.items() if key != 'status'}
+  metadata = rerun.setdefault('metadata', {})
+  if 'name' in metadata and 'generateName' not in metadata:
+    metadata['generateName'] = metadata['name'] + '-'
+  for field in _SUBMITTED_METADATA_FIELDS:
+    metadata.pop(field, None)
+  return rerun
+
+
+def build_resume_workflow(workflow):
+  """Builds a workflow resuming a run from its failed steps.
+
+  The succeeded tasks of the run are removed from their DAGs, along with the templates only
+  they used. The references of the other tasks to their output parameters are replaced by the
+  recorded values, and the artifact arguments taken from them point to the recorded artifact
+  locations instead. Tasks which ran several times, such as the tasks of loops, and the exit
+  handler are run again.
+
+  Args:
+    workflow: the workflow of the run, with its status, as returned by
+        Client._get_workflow_json.
+
+  Returns:
+    A tuple (workflow, skipped_tasks). The workflow has no status and can be submitted as a
+    new run. skipped_tasks is a list of (DAG template name, task name) tuples.
+
+  Raises:
+    ValueError if the run has no failed step, or if a skipped task has an output which is not
+    recorded.
+  """
+  outputs = _succeeded_task_outputs(workflow)
+  resumed = build_rerun_workflow(workflow)
+  spec = resumed['spec']
+  templates = {t['name']: t for t in spec['templates']}
+  skipped_tasks = []
+  # The templates still run, visited from the entrypoint and the exit handler.
+  used_template_names = set()
+  pending_template_names = [spec['entrypoint']] + ([spec['onExit']] if spec.get('onExit') else [])
+  while pending_template_names:
+    template_name = pending_template_names.pop()
+    if template_name in used_template_names:
+      continue
+    used_template_names.add(template_name)
+    template = templates[template_name]
+    if 'dag' not in template:
+      continue
+    skipped_outputs = {task['name']: outputs[(template_name, task['name'])]
+                       for task in template['dag']['tasks']
+                       if (template_name, task['name']) in outputs}
+    for match in _TASK_OUTPUT_REFERENCE.finditer(str(template)):
+      task_name, kind, name = match.groups()
+      if task_name in skipped_outputs and name not in skipped_outputs[task_name][kind]:
+        raise ValueError('The output %s of the task %s in %s is not recorded in the run.' %
+                         (name, task_name, template_name))
+    tasks = []
+    for task in template['dag']['tasks']:
+      if task['name'] in skipped_outputs:
+        skipped_tasks.append((template_name, task['name']))
+        continue
+      task = _replace_references(task, skipped_outputs)
+      if 'dependencies' in task:
+        task['dependencies'] = [x for x in task['dependencies'] if x not in skipped_outputs]
+        if not task['dependencies']:
+          del task['dependencies']
+      tasks.append(task)
+      pending_template_names.append(task['template'])
+    template['dag']['tasks'] = tasks
+    if 'outputs' in template:
+      template['outputs'] = _replace_references(template['outputs'], skipped_outputs)
+
+  if not templates[spec['entrypoint']]['dag']['tasks']:
+    raise ValueError('The run has no failed step to resume from.')
+  spec['templates'] = [t for t in spec['templates'] if t['name'] in used_template_names]
+  return resumed, skipped_tasks
@@ -14,4 +14,8 @@
 
 
 from .compiler import Compiler
+from ._cache import CompilationCache
+from ._package_cache import PackageInstallCache
+from ._profiler import CompilerProfiler
+from ._simulator import PipelineSimulator, NodePool
 from ._component_builder import build_python_component, build_docker_image, VersionedDependency
\ No newline at end of file
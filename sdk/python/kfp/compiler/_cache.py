@@ -0,0 +1,155 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+
+def _get_sdk_version():
+  """Returns the installed kfp version, or 'unknown' when running from a source tree."""
+  try:
+    from importlib import metadata
+    return metadata.version('kfp')
+  except Exception:
+    pass
+  try:
+    import pkg_resources
+    return pkg_resources.get_distribution('kfp').version
+  except Exception:
+    return 'unknown'
+
+
+def _get_component_spec_digest(component_spec):
+  spec_text = json.dumps(component_spec.to_struct(), sort_keys=True, default=str)
+  return hashlib.sha256(spec_text.encode()).hexdigest()
+
+
+def _get_component_spec_digests(pipeline_func):
+  """Computes the digests of the component specs a pipeline function can reach.
+
+  Task factories created by kfp.components carry their ComponentSpec. They are looked up in
+  the globals of the pipeline function's module and in the function's closure, so factories
+  used through helper functions of the same module are covered too. Components loaded while
+  the pipeline function runs are not reachable.
+  """
+  candidates = {}
+  module = inspect.getmodule(pipeline_func)
+  if module is not None:
+    candidates.update(vars(module))
+  candidates.update(inspect.getclosurevars(pipeline_func).nonlocals)
+
+  digests = []
+  for name in sorted(candidates):
+    component_spec = getattr(candidates[name], 'component_spec', None)
+    if component_spec is None or not hasattr(component_spec, 'to_struct'):
+      continue
+    digests.append(name + ':' + _get_component_spec_digest(component_spec))
+  return digests
+
+
+class CompilationCache(object):
+  """On-disk cache of compiled pipeline packages.
+
+  The cache key covers the source of the pipeline function and its module, the digests of
+  the component specs in the module globals and the function closure, the SDK version and the
+  compile options such as type_check. Pipelines which load other components, e.g. in their
+  body, are not cached, since the key would not change with those components.
+  Example usage:
+  ```python
+  cache = CompilationCache('/tmp/kfp-cache')
+  Compiler().compile(my_pipeline, 'my_pipeline.tar.gz', cache=cache)
+  print(cache.hits, cache.misses)
+  ```
+  """
+
+  def __init__(self, cache_dir: str=None):
+    """Create a new instance of CompilationCache.
+
+    Args:
+      cache_dir: the directory holding the cached packages. Defaults to ~/.cache/kfp/compilation.
+    """
+    self.cache_dir = cache_dir or os.path.join(os.path.expanduser('~'), '.cache', 'kfp', 'compilation')
+    self.hits = 0
+    self.misses = 0
+
+  def get_key(self, pipeline_func, **options):
+    """Computes the cache key of a pipeline function compiled with the given options.
+
+    Returns:
+      A hex digest string, or None if the pipeline source cannot be retrieved, in which case
+      the compilation is not cacheable.
+    """
+    try:
+      key_parts = {
+        'pipeline_source': inspect.getsource(pipeline_func),
+        'component_specs': _get_component_spec_digests(pipeline_func),
+        'sdk_version': _get_sdk_version(),
+        'options': {name: str(value) for name, value in options.items()},
+      }
+      module = inspect.getmodule(pipeline_func)
+      if module is not None:
+        key_parts['module_source'] = inspect.getsource(module)
+    except (OSError, TypeError):
+      logging.info('Cannot retrieve the source of %s. Skipping the compilation cache.', pipeline_func)
+      return None
+    key_text = json.dumps(key_parts, sort_keys=True)
+    return hashlib.sha256(key_text.encode()).hexdigest()
+
+  def covers(self, pipeline_func, component_specs):
+    """Returns whether the cache key of a pipeline function covers the given component specs,
+    typically the ones of the ops the compilation created."""
+    reachable = set(x.rsplit(':', 1)[1] for x in _get_component_spec_digests(pipeline_func))
+    return all(hasattr(component_spec, 'to_struct') and
+               _get_component_spec_digest(component_spec) in reachable
+               for component_spec in component_specs)
+
+  def _entry_path(self, key):
+    return os.path.join(self.cache_dir, key + '.tar.gz')
+
+  def fetch(self, key, package_path):
+    """Copies the cached package for key to package_path.
+
+    Returns:
+      True on a cache hit, False otherwise.
+    """
+    if key is not None and os.path.isfile(self._entry_path(key)):
+      shutil.copyfile(self._entry_path(key), package_path)
+      self.hits += 1
+      logging.info('Compilation cache hit: %s', key)
+      return True
+    self.misses += 1
+    logging.info('Compilation cache miss: %s', key)
+    return False
+
+  def store(self, key, package_path):
+    """Stores the package at package_path under key."""
+    if key is None:
+      return
+    os.makedirs(self.cache_dir, exist_ok=True)
+    # Write to a temporary file first so concurrent compilations never observe partial entries.
+    fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+      shutil.copyfile(package_path, tmp_path)
+      os.replace(tmp_path, self._entry_path(key))
+    finally:
+      # The temporary file is left over when the copy failed or was interrupted.
+      if os.path.exists(tmp_path):
+        os.remove(tmp_path)
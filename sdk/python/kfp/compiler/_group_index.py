@@ -0,0 +1,96 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import defaultdict
+
+from .. import dsl
+from ._k8s_helper import K8sHelper
+
+
+class GroupTreeIndex(object):
+  """Index over the group tree of a pipeline.
+
+  The index is built in a single traversal of the tree and holds, for every group and op,
+  its parent, its depth and its ancestor chain. The ancestor chain of a node is the list of
+  names from the root group down to the node itself. The index also records the params
+  referenced by the conditions enclosing each op, and the item params of the loops.
+  """
+
+  def __init__(self, root_group):
+    self.parent = {root_group.name: None}
+    self.depth = {root_group.name: 0}
+    self.ancestors = {root_group.name: [root_group.name]}
+    # All groups (not including ops) in pre-order.
+    self.groups = []
+    # Key is op name, value is the set of params used in the conditions enclosing the op,
+    # including the params providing the items of the enclosing loops.
+    self.condition_params = defaultdict(set)
+    # Key is the sanitized name of a loop item param, value is a tuple (loop group name,
+    # item field name). The field name is None for the whole item.
+    self.loop_items = {}
+
+    stack = [(root_group, [])]
+    while stack:
+      group, condition_params = stack.pop()
+      self.groups.append(group)
+      if group.type == 'condition':
+        condition_params = list(condition_params)
+        for operand in [group.condition.operand1, group.condition.operand2]:
+          if isinstance(operand, dsl.PipelineParam):
+            condition_params.append(operand)
+      elif isinstance(group, dsl.ParallelFor):
+        if group.items_param is not None:
+          condition_params = condition_params + [group.items_param]
+        self._add_loop_items(group)
+
+      group_chain = self.ancestors[group.name]
+      for op in group.ops:
+        self._add_node(op.name, group.name, group_chain)
+        self.condition_params[op.name].update(condition_params)
+      # Push in reverse order so that sub groups are visited in their declaration order.
+      for sub_group in reversed(group.groups):
+        self._add_node(sub_group.name, group.name, group_chain)
+        stack.append((sub_group, condition_params))
+
+  def _add_loop_items(self, loop_group):
+    loop_args = loop_group.loop_args
+    self.loop_items[K8sHelper.sanitize_k8s_name(loop_args.name)] = (loop_group.name, None)
+    for field, param in loop_args._fields.items():
+      self.loop_items[K8sHelper.sanitize_k8s_name(param.name)] = (loop_group.name, field)
+
+  def _add_node(self, name, parent_name, parent_chain):
+    self.parent[name] = parent_name
+    self.depth[name] = len(parent_chain)
+    self.ancestors[name] = parent_chain + [name]
+
+  def lowest_common_ancestor(self, name1, name2):
+    """Returns the name of the deepest group that contains both nodes."""
+    while self.depth[name1] > self.depth[name2]:
+      name1 = self.parent[name1]
+    while self.depth[name2] > self.depth[name1]:
+      name2 = self.parent[name2]
+    while name1 != name2:
+      name1 = self.parent[name1]
+      name2 = self.parent[name2]
+    return name1
+
+  def uncommon_ancestors(self, name1, name2):
+    """Returns the ancestors that are not shared between two nodes.
+
+    For example, if the ancestor chain of op1 is [root, G1, G2, G3, op1] and the one of op2 is
+    [root, G1, G4, op2], then it returns a tuple ([G2, G3, op1], [G4, op2]).
+    """
+    common_depth = self.depth[self.lowest_common_ancestor(name1, name2)] + 1
+    return (self.ancestors[name1][common_depth:], self.ancestors[name2][common_depth:])
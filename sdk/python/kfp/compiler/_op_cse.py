@@ -0,0 +1,179 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import namedtuple
+import json
+
+from .. import dsl
+from ..dsl._metadata import TypeMeta
+from ..dsl._pipeline_param import _split_serialized_pipelineparams
+from ._k8s_helper import K8sHelper
+
+
+# merged_ops is a dict of the names of the removed ops to the names of the ops kept instead.
+DuplicateOpStats = namedtuple('DuplicateOpStats', 'ops_before ops_after merged_ops')
+
+# Fields of an op which are compiled into its template as they are. The command, the
+# arguments, the artifact arguments and the dependencies refer to other ops and are
+# fingerprinted separately.
+_FINGERPRINTED_FIELDS = ['image', 'file_outputs', 'output_artifact_paths', 'env_variables',
+                         'resource_requests', 'resource_limits', 'node_selector', 'affinity',
+                         'tolerations', 'priority_class_name', 'volumes', 'volume_mounts',
+                         'init_containers', 'sidecars', 'pod_annotations', 'pod_labels',
+                         'num_retries', 'retry_policy', 'backoff_duration', 'backoff_factor',
+                         'backoff_max_duration', 'timeout', 'produces_ui_metadata',
+                         'produces_metrics', 'cache_store', 'cache_ttl_seconds',
+                         'artifact_compression']
+
+
+def _to_json(value):
+  """Converts a field value to JSON. Values which cannot be compared by value, such as
+  callables, raise a TypeError, so that their ops are never merged."""
+  if value is None or isinstance(value, (str, int, float, bool)):
+    return value
+  if isinstance(value, (list, tuple)):
+    return [_to_json(x) for x in value]
+  if isinstance(value, dict):
+    return {str(k): _to_json(v) for k, v in value.items()}
+  if hasattr(value, 'swagger_types'):
+    return K8sHelper.convert_k8s_obj_to_json(value)
+  raise TypeError('%s cannot be fingerprinted.' % type(value).__name__)
+
+
+def _fingerprint(op, group, survivors):
+  """Returns a string which is equal for ops running the same container with the same inputs,
+  or None if the op has a field which cannot be fingerprinted.
+
+  Args:
+    op: the ContainerOp.
+    group: the OpsGroup the op is in. Ops are only merged within the same group, so that their
+        conditions and loops are the same.
+    survivors: dict of the names of the merged ops to the names of the ops kept instead.
+  """
+  def _param(param):
+    op_name = K8sHelper.sanitize_k8s_name(param.op) if param.op else ''
+    return [survivors.get(op_name, op_name), K8sHelper.sanitize_k8s_name(param.name), param.value]
+
+  def _strings(values):
+    return [[text if param is None else _param(param)
+             for text, param in _split_serialized_pipelineparams(str(value), op._placeholders)]
+            for value in values or []]
+
+  artifact_arguments = []
+  for argument in op.artifact_arguments:
+    if isinstance(argument.argument, dsl.PipelineParam):
+      argument_value = [survivors.get(argument.argument.op_name, argument.argument.op_name),
+                        argument.argument.name, argument.argument.value]
+    else:
+      argument_value = str(argument.argument)
+    artifact_arguments.append([argument_value, argument.input, argument.path])
+
+  try:
+    fingerprint = {key: _to_json(getattr(op, key)) for key in _FINGERPRINTED_FIELDS}
+  except TypeError:
+    return None
+  fingerprint.update({
+    'group': id(group),
+    'command': _strings(op.command),
+    'arguments': _strings(op.arguments),
+    'artifact_arguments': artifact_arguments,
+    'dependent_op_names': sorted(set(survivors.get(x, x) for x in op.dependent_op_names)),
+  })
+  return json.dumps(fingerprint, sort_keys=True)
+
+
+def _rewire_strings(values, survivors, placeholders):
+  """Replaces the serialized params of merged ops in a list of commands or arguments."""
+  if not values:
+    return values
+  rewired = []
+  for value in values:
+    parts = []
+    changed = False
+    for text, param in _split_serialized_pipelineparams(str(value), placeholders):
+      op_name = K8sHelper.sanitize_k8s_name(param.op) if param is not None and param.op else None
+      if op_name in survivors:
+        param_type = param.type if isinstance(param.type, TypeMeta) else TypeMeta.deserialize(param.type or '')
+        text = str(dsl.PipelineParam(param.name, survivors[op_name], param.value or None, param_type))
+        changed = True
+      parts.append(text)
+    rewired.append(''.join(parts) if changed else value)
+  return rewired
+
+
+def merge_duplicate_ops(pipeline):
+  """Merges the ops which would run the same container with the same inputs.
+
+  Pipelines built from shared sub-pipeline functions may instantiate the same op several
+  times. Such ops have equal images, commands, resolved arguments, upstream outputs and
+  settings, and are in the same group. Only the first of them is kept. The params, the
+  dependencies and the conditions of the other ops' consumers are rewired to it. The ops are
+  visited in the order they were added, so the consumers of merged ops can be merged in turn.
+  The exit handler is never merged.
+
+  Args:
+    pipeline: the dsl.Pipeline, with sanitized names.
+
+  Returns:
+    A DuplicateOpStats.
+  """
+  ops_before = len(pipeline.ops)
+  survivors = {}
+  fingerprints = {}
+  for op in list(pipeline.ops.values()):
+    if op.is_exit_handler:
+      continue
+    group = pipeline.op_groups.get(op.name)
+    fingerprint = _fingerprint(op, group, survivors)
+    if fingerprint is None:
+      continue
+    survivor = fingerprints.setdefault(fingerprint, op)
+    if survivor is op:
+      continue
+
+    survivors[op.name] = survivor.name
+    # The params held by the consumers are the output params themselves, or interned copies.
+    for param in op.outputs.values():
+      param.op_name = survivor.name
+    del pipeline.ops[op.name]
+    pipeline.op_groups.pop(op.name, None)
+    if group is not None:
+      group.ops.remove(op)
+
+    for consumer_name in pipeline.downstream_ops.pop(op.name, set()):
+      consumer = pipeline.ops.get(consumer_name)
+      if consumer is None:
+        continue
+      for attr in ['argument_inputs', 'inputs']:
+        params = []
+        seen = set()
+        for param in getattr(consumer, attr):
+          if param.op_name == op.name:
+            param.op_name = survivor.name
+          if (param.op_name, param.name) not in seen:
+            seen.add((param.op_name, param.name))
+            params.append(param)
+        setattr(consumer, attr, params)
+      consumer.command = _rewire_strings(consumer.command, survivors, consumer._placeholders)
+      consumer.arguments = _rewire_strings(consumer.arguments, survivors, consumer._placeholders)
+      consumer.dependent_op_names = [survivors.get(x, x) for x in consumer.dependent_op_names]
+      upstream = pipeline.upstream_ops[consumer_name]
+      upstream.discard(op.name)
+      upstream.add(survivor.name)
+      pipeline.downstream_ops[survivor.name].add(consumer_name)
+    for upstream_name in pipeline.upstream_ops.pop(op.name, set()):
+      pipeline.downstream_ops[upstream_name].discard(op.name)
+
+  return DuplicateOpStats(ops_before, len(pipeline.ops), survivors)
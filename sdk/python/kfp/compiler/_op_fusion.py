@@ -0,0 +1,296 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import OrderedDict, defaultdict, namedtuple
+import copy
+import json
+import os
+import re
+
+from ._template_dedup import _TASK_OUTPUT_REFERENCE, _rewrite_strings
+
+
+OpFusionStats = namedtuple('OpFusionStats', 'tasks_before tasks_after fused_chains')
+
+_INPUT_PARAMETER_REFERENCE = re.compile(r'{{inputs\.parameters\.([^}]+)}}')
+_TASK_OUTPUT_PARAMETER = re.compile(r'^{{tasks\.([^.}]+)\.outputs\.parameters\.([^}]+)}}$')
+
+# The outputs of the fused steps are copied here once a step finishes, so that a later step
+# writing to the same path does not overwrite them.
+_FUSED_OUTPUTS_DIR = '/tmp/kfp-fused-outputs'
+
+# Runs the fused steps in sequence. The first argument is the JSON list of the steps, the other
+# arguments are the text pieces of the step command lines. Every command line argument of a
+# step is a list of pieces: an int is the index of a text piece, a str is the path of a file
+# holding an output of an earlier step.
+_FUSION_DRIVER = '''import json, os, shutil, subprocess, sys
+steps = json.loads(sys.argv[1])
+pieces = sys.argv[2:]
+def read(path):
+  with open(path) as f:
+    return f.read()
+for step in steps:
+  argv = [''.join(pieces[x] if isinstance(x, int) else read(x) for x in arg) for arg in step['argv']]
+  print('Running the fused step %s.' % step['name'], flush=True)
+  code = subprocess.call(argv)
+  if code:
+    sys.exit(code)
+  for path, saved_path in step['outputs']:
+    if os.path.isdir(path):
+      shutil.copytree(path, saved_path)
+    elif os.path.exists(path):
+      os.makedirs(os.path.dirname(saved_path), exist_ok=True)
+      shutil.copyfile(path, saved_path)
+'''
+
+# Fields of the op templates of a chain which may differ. All the other fields, such as the
+# image, the resources and the volume mounts, must be equal.
+_STEP_FIELDS = ['name', 'inputs', 'outputs', 'activeDeadlineSeconds']
+_STEP_CONTAINER_FIELDS = ['command', 'args']
+
+
+def _is_python_command(command):
+  return bool(command) and os.path.basename(command[0]).startswith('python')
+
+
+# Artifacts shared by all the steps of a fused op.
+_CONVENTIONAL_ARTIFACTS = ['mlpipeline-ui-metadata', 'mlpipeline-metrics']
+
+
+def _is_fusible(task, template):
+  """Only plain tasks of python ops whose inputs and outputs are all parameters can be fused."""
+  return (set(task.keys()) <= {'name', 'template', 'arguments', 'dependencies'}
+          and 'container' in template
+          and _is_python_command(template['container'].get('command'))
+          and set(template.get('inputs', {}).keys()) <= {'parameters'}
+          and all(artifact['name'] in _CONVENTIONAL_ARTIFACTS
+                  for artifact in template.get('outputs', {}).get('artifacts', [])))
+
+
+def _pod_spec(template):
+  """The part of an op template which must be equal for the ops to share a pod."""
+  spec = {key: value for key, value in template.items() if key not in _STEP_FIELDS}
+  spec['container'] = {key: value for key, value in template['container'].items()
+                       if key not in _STEP_CONTAINER_FIELDS}
+  return json.dumps(spec, sort_keys=True)
+
+
+class _Chain(object):
+  """A linear chain of op tasks being fused, in execution order."""
+
+  def __init__(self, task, template):
+    self.task = task
+    self.templates = [template]
+    # Key is an output parameter name of the chain, value is the path the output is saved at.
+    self.saved_outputs = {}
+    self._save_outputs(template)
+    # Key is the name of an input parameter of a step fed by an earlier step of the chain.
+    self.internal_inputs = {}
+    self.arguments = OrderedDict((p['name'], p['value'])
+                                 for p in task.get('arguments', {}).get('parameters', []))
+
+  def _save_outputs(self, template):
+    for output in template.get('outputs', {}).get('parameters', []):
+      self.saved_outputs[output['name']] = '%s/%s/%s' % (_FUSED_OUTPUTS_DIR, template['name'],
+                                                         output['name'])
+
+  @property
+  def names(self):
+    return [t['name'] for t in self.templates]
+
+  def append(self, downstream):
+    """Fuses the chain of a downstream task, which only depends on this chain, into this one."""
+    for name, value in downstream.arguments.items():
+      match = _TASK_OUTPUT_PARAMETER.match(value)
+      if match and match.group(1) == self.task['name'] and match.group(2) in self.saved_outputs:
+        self.internal_inputs[name] = self.saved_outputs[match.group(2)]
+      else:
+        self.arguments[name] = value
+    self.internal_inputs.update(downstream.internal_inputs)
+    self.saved_outputs.update(downstream.saved_outputs)
+    self.templates.extend(downstream.templates)
+    downstream.task['dependencies'] = self.task.get('dependencies', [])
+    if not downstream.task['dependencies']:
+      del downstream.task['dependencies']
+    self.task = downstream.task
+
+  def to_template(self):
+    """Builds the op template running all the steps of the chain in one pod."""
+    pieces = []
+    steps = []
+
+    def _split(value):
+      arg = []
+      position = 0
+      for match in _INPUT_PARAMETER_REFERENCE.finditer(value):
+        if match.group(1) not in self.internal_inputs:
+          continue
+        if match.start() > position:
+          arg.append(len(pieces))
+          pieces.append(value[position:match.start()])
+        arg.append(self.internal_inputs[match.group(1)])
+        position = match.end()
+      if position < len(value) or not arg:
+        arg.append(len(pieces))
+        pieces.append(value[position:])
+      return arg
+
+    input_names = OrderedDict()
+    parameters = []
+    artifacts = OrderedDict()
+    active_deadline_seconds = 0
+    for template in self.templates:
+      container = template['container']
+      steps.append({
+        'name': template['name'],
+        'argv': [_split(x) for x in container.get('command', []) + container.get('args', [])],
+        'outputs': [[output['valueFrom']['path'], self.saved_outputs[output['name']]]
+                    for output in template.get('outputs', {}).get('parameters', [])],
+      })
+      for parameter in template.get('inputs', {}).get('parameters', []):
+        if parameter['name'] not in self.internal_inputs:
+          input_names[parameter['name']] = None
+      for output in template.get('outputs', {}).get('parameters', []):
+        output = copy.deepcopy(output)
+        output['valueFrom']['path'] = self.saved_outputs[output['name']]
+        parameters.append(output)
+      # Conventional artifacts, such as the metrics, are shared by all the steps. The file of
+      # the last step producing it wins.
+      for artifact in template.get('outputs', {}).get('artifacts', []):
+        artifacts[artifact['name']] = artifact
+      active_deadline_seconds += template.get('activeDeadlineSeconds', 0)
+
+    fused = copy.deepcopy(self.templates[-1])
+    interpreter = self.templates[0]['container']['command'][0]
+    fused['container']['command'] = [interpreter, '-u', '-c', _FUSION_DRIVER, json.dumps(steps)]
+    fused['container']['args'] = pieces
+    fused.pop('inputs', None)
+    if input_names:
+      fused['inputs'] = {'parameters': [{'name': name} for name in input_names]}
+    fused.pop('outputs', None)
+    outputs = {}
+    if parameters:
+      outputs['parameters'] = parameters
+    if artifacts:
+      outputs['artifacts'] = list(artifacts.values())
+    if outputs:
+      fused['outputs'] = outputs
+    fused.pop('activeDeadlineSeconds', None)
+    if active_deadline_seconds:
+      fused['activeDeadlineSeconds'] = active_deadline_seconds
+    return fused
+
+  def to_task(self):
+    self.task.pop('arguments', None)
+    if self.arguments:
+      self.task['arguments'] = {'parameters': [{'name': name, 'value': value}
+                                               for name, value in self.arguments.items()]}
+    return self.task
+
+
+def fuse_ops(templates, op_names):
+  """Fuses linear chains of python ops on the same image into single pod templates.
+
+  Within every DAG, a task which only depends on one upstream task, which in turn has no other
+  dependent, is fused with it when both run python ops whose templates only differ in their
+  command, arguments, inputs and outputs. The fused template runs the steps in sequence with a
+  small python driver. The outputs of a step are read by the later steps from local files, and
+  all the step outputs stay exposed to the downstream tasks under their original names. The
+  fused task and template are named after the last op of the chain.
+
+  Args:
+    templates: the list of templates of the workflow.
+    op_names: the names of the op templates that may be fused. Templates referenced directly
+        from the workflow, such as the exit handler, must not be included.
+
+  Returns:
+    A tuple (templates, stats) where stats is an OpFusionStats.
+  """
+  templates_by_name = {t['name']: t for t in templates}
+  tasks_before = 0
+  fused_chains = 0
+  # Key is the name of a fused op, value is the name of the op of its chain the task is named after.
+  renamed = {}
+  fused_templates = {}
+  for template in templates:
+    if 'dag' not in template:
+      continue
+    tasks = template['dag']['tasks']
+    tasks_before += len(tasks)
+    dependents = defaultdict(list)
+    for task in tasks:
+      for dependency in task.get('dependencies', []):
+        dependents[dependency].append(task['name'])
+    chains = {}
+    for task in tasks:
+      op_template = templates_by_name.get(task['template'])
+      if task['name'] in op_names and task['template'] == task['name'] and _is_fusible(task, op_template):
+        chains[task['name']] = _Chain(task, op_template)
+
+    fused_tasks = set()
+    for task in tasks:
+      chain = chains.get(task['name'])
+      if chain is None or task['name'] in fused_tasks:
+        continue
+      while len(chain.task.get('dependencies', [])) == 1:
+        upstream = chains.get(chain.task['dependencies'][0])
+        if (upstream is None or dependents[upstream.task['name']] != [chain.task['name']]
+            or _pod_spec(upstream.templates[0]) != _pod_spec(chain.templates[0])):
+          break
+        upstream_name = upstream.task['name']
+        upstream.append(chain)
+        chain = upstream
+        chains[chain.task['name']] = chain
+        fused_tasks.add(upstream_name)
+        for name in chain.names[:-1]:
+          renamed[name] = chain.task['name']
+        for dependency in chain.task.get('dependencies', []):
+          dependents[dependency] = [chain.task['name'] if x == upstream_name else x
+                                    for x in dependents[dependency]]
+
+    for chain in set(chains.values()):
+      if len(chain.templates) > 1:
+        fused_chains += 1
+        fused_templates[chain.task['name']] = chain.to_template()
+        chain.to_task()
+    template['dag']['tasks'] = [t for t in tasks if t['name'] not in fused_tasks]
+
+  if not fused_templates:
+    return templates, OpFusionStats(tasks_before, tasks_before, 0)
+
+  def _rewrite_output_reference(match):
+    task_name, kind, output_name = match.groups()
+    if task_name not in renamed:
+      return match.group(0)
+    return '{{tasks.%s.outputs.%s.%s}}' % (renamed[task_name], kind, output_name)
+
+  def _rewrite(value):
+    return _TASK_OUTPUT_REFERENCE.sub(_rewrite_output_reference, value)
+
+  fused = []
+  tasks_after = 0
+  for template in templates:
+    name = template['name']
+    if name in fused_templates:
+      fused.append(fused_templates[name])
+    elif name in renamed:
+      continue
+    elif 'dag' in template:
+      template = _rewrite_strings(template, _rewrite)
+      tasks_after += len(template['dag']['tasks'])
+      fused.append(template)
+    else:
+      fused.append(template)
+  return fused, OpFusionStats(tasks_before, tasks_after, fused_chains)
@@ -0,0 +1,82 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import namedtuple
+
+from ._group_index import GroupTreeIndex
+from ._k8s_helper import K8sHelper
+
+
+OpPruningStats = namedtuple('OpPruningStats', 'ops_before ops_after')
+
+
+def _prune_groups(group, kept_op_names):
+  """Removes the pruned ops from a group and the groups left without ops. Returns whether
+  the group still holds an op."""
+  group.ops = [op for op in group.ops if op.name in kept_op_names]
+  group.groups = [g for g in group.groups if _prune_groups(g, kept_op_names)]
+  return bool(group.ops or group.groups)
+
+
+def prune_ops(pipeline, targets):
+  """Removes the ops which the targets do not need.
+
+  The ops needed by the targets are found by walking backwards from them along the op inputs,
+  the params of the enclosing conditions and loops, and the after() dependencies. The exit
+  handler and the ops it needs are always kept. Groups left without ops are removed.
+
+  Args:
+    pipeline: the dsl.Pipeline, with sanitized names.
+    targets: a list of op names, such as 'train' or 'train 2'.
+
+  Returns:
+    An OpPruningStats.
+
+  Raises:
+    ValueError if a target is not an op of the pipeline.
+  """
+  ops_before = len(pipeline.ops)
+  target_names = [K8sHelper.sanitize_k8s_name(target) for target in targets]
+  unknown_names = [name for name in target_names if name not in pipeline.ops]
+  if unknown_names:
+    raise ValueError('The targets %s are not ops of the pipeline %s.' % (unknown_names, pipeline.name))
+  target_names.extend(op.name for op in pipeline.ops.values() if op.is_exit_handler)
+  target_names.extend(g.exit_op.name for g in pipeline.groups[0].groups if g.type == 'exit_handler')
+
+  group_index = GroupTreeIndex(pipeline.groups[0])
+  kept_op_names = set()
+  stack = list(target_names)
+  while stack:
+    op_name = stack.pop()
+    if op_name in kept_op_names or op_name not in pipeline.ops:
+      continue
+    kept_op_names.add(op_name)
+    op = pipeline.ops[op_name]
+    stack.extend(param.op_name for param in op.inputs if param.op_name)
+    stack.extend(param.op_name for param in group_index.condition_params[op_name] if param.op_name)
+    stack.extend(op.dependent_op_names)
+    stack.extend(pipeline.upstream_ops.get(op_name, ()))
+
+  _prune_groups(pipeline.groups[0], kept_op_names)
+  for op_name in list(pipeline.ops):
+    if op_name not in kept_op_names:
+      del pipeline.ops[op_name]
+      pipeline.op_groups.pop(op_name, None)
+      pipeline.upstream_ops.pop(op_name, None)
+      pipeline.downstream_ops.pop(op_name, None)
+  for edges in [pipeline.upstream_ops, pipeline.downstream_ops]:
+    for names in edges.values():
+      names &= kept_op_names
+  return OpPruningStats(ops_before, len(pipeline.ops))
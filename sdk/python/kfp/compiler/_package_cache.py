@@ -0,0 +1,152 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+
+def _get_file_digest(path):
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def _get_tree_size(path):
+  size = 0
+  for root, _, files in os.walk(path):
+    for name in files:
+      file_path = os.path.join(root, name)
+      if not os.path.islink(file_path):
+        size += os.path.getsize(file_path)
+  return size
+
+
+class PackageInstallCache(object):
+  """On-disk cache of pip installed pipeline packages.
+
+  An entry is the directory a package file was installed into with `pip install -t`. The
+  cache key covers the content of the package file and the pip and Python versions, so an
+  unchanged package is installed only once. Least recently used entries are evicted when the
+  cache grows over max_size_bytes, and entries unused for max_age_seconds are evicted too.
+  Example usage:
+  ```python
+  cache = PackageInstallCache('/tmp/kfp-packages', max_size_bytes=2 << 30)
+  sys.path.insert(0, cache.install('my_pipelines-0.1.tar.gz'))
+  ```
+  """
+
+  def __init__(self, cache_dir: str=None, max_size_bytes: int=None, max_age_seconds: float=None):
+    """Create a new instance of PackageInstallCache.
+
+    Args:
+      cache_dir: the directory holding the installed packages. Defaults to ~/.cache/kfp/packages.
+      max_size_bytes: the maximum total size of the entries. Unlimited by default.
+      max_age_seconds: the maximum time an entry is kept after its last use. Unlimited by default.
+    """
+    self.cache_dir = cache_dir or os.path.join(os.path.expanduser('~'), '.cache', 'kfp', 'packages')
+    self.max_size_bytes = max_size_bytes
+    self.max_age_seconds = max_age_seconds
+    self.hits = 0
+    self.misses = 0
+    self._pip_version = None
+
+  def _get_pip_version(self):
+    """Returns the output of `pip --version`, which names both the pip and Python versions."""
+    if self._pip_version is None:
+      self._pip_version = subprocess.check_output(['python3', '-m', 'pip', '--version']).decode().strip()
+    return self._pip_version
+
+  def get_key(self, package_path):
+    key_text = _get_file_digest(package_path) + '\n' + self._get_pip_version()
+    return hashlib.sha256(key_text.encode()).hexdigest()
+
+  def install(self, package_path):
+    """Installs a package file unless it is already cached.
+
+    Returns:
+      The directory the package is installed into, to be added to sys.path.
+    """
+    key = self.get_key(package_path)
+    entry_path = os.path.join(self.cache_dir, key)
+    if os.path.isdir(entry_path):
+      self.hits += 1
+      logging.info('Package install cache hit: %s', package_path)
+      # The modification time of an entry is its last use, which drives the eviction.
+      os.utime(entry_path)
+      return entry_path
+
+    self.misses += 1
+    logging.info('Package install cache miss: %s', package_path)
+    os.makedirs(self.cache_dir, exist_ok=True)
+    # Install into a temporary directory first so concurrent compilations never observe
+    # partial entries.
+    tmpdir = tempfile.mkdtemp(dir=self.cache_dir, suffix='.tmp')
+    try:
+      subprocess.check_call(['python3', '-m', 'pip', 'install', package_path, '-t', tmpdir])
+      os.rename(tmpdir, entry_path)
+    except OSError:
+      # The rename fails when another process installed the same package in the meantime.
+      if not os.path.isdir(entry_path):
+        raise
+    finally:
+      # The temporary directory is left over when the install failed or was interrupted.
+      shutil.rmtree(tmpdir, ignore_errors=True)
+    self.evict(keep=[key])
+    return entry_path
+
+  def evict(self, keep=()):
+    """Removes the entries that are too old, then the least recently used ones until the
+    cache fits in max_size_bytes.
+
+    Args:
+      keep: the keys of the entries that must not be evicted.
+    """
+    if not os.path.isdir(self.cache_dir):
+      return
+    entries = []
+    for name in os.listdir(self.cache_dir):
+      path = os.path.join(self.cache_dir, name)
+      if os.path.isdir(path) and not name.endswith('.tmp'):
+        entries.append((os.path.getmtime(path), name, path))
+    entries.sort()
+
+    now = time.time()
+    remaining = []
+    for mtime, name, path in entries:
+      if (self.max_age_seconds is not None and now - mtime > self.max_age_seconds
+          and name not in keep):
+        logging.info('Evicting expired package install %s', name)
+        shutil.rmtree(path, ignore_errors=True)
+      else:
+        remaining.append((name, path, _get_tree_size(path) if self.max_size_bytes is not None else 0))
+
+    if self.max_size_bytes is None:
+      return
+    total_size = sum(x[2] for x in remaining)
+    for name, path, size in remaining:
+      if total_size <= self.max_size_bytes:
+        break
+      if name in keep:
+        continue
+      logging.info('Evicting package install %s to fit the cache size', name)
+      shutil.rmtree(path, ignore_errors=True)
+      total_size -= size
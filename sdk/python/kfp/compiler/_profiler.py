@@ -0,0 +1,116 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import OrderedDict, namedtuple
+import contextlib
+import sys
+import time
+
+
+PhaseStats = namedtuple('PhaseStats', 'calls seconds allocated_blocks')
+
+
+class CompilerProfiler(object):
+  """Records where the compiler spends its time.
+
+  For every compiler phase, the profiler accumulates the number of times it ran, its wall
+  time and the net number of memory blocks it allocated, as reported by
+  sys.getallocatedblocks(). Phases may nest, e.g. k8s_convert runs inside op_templates, and
+  nested phases are included in the numbers of the enclosing ones. The generation time of the
+  template of every op is recorded too.
+  Example usage:
+  ```python
+  profiler = CompilerProfiler()
+  Compiler().compile(my_pipeline, 'my_pipeline.tar.gz', profiler=profiler)
+  print(profiler.format_report())
+  ```
+  """
+
+  def __init__(self, callback=None):
+    """Create a new instance of CompilerProfiler.
+
+    Args:
+      callback: an optional function called as callback(name, seconds, allocated_blocks) every
+          time a phase ends. The name of the template generation of an op is
+          'op_template/<op name>'.
+    """
+    self.callback = callback
+    # Key is phase name, value is PhaseStats. In the order the phases first ran.
+    self.phases = OrderedDict()
+    # Key is op name, value is the template generation time in seconds.
+    self.op_templates = OrderedDict()
+
+  @contextlib.contextmanager
+  def phase(self, name):
+    """Context manager recording the enclosed code as one run of a phase."""
+    blocks = sys.getallocatedblocks()
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      seconds = time.perf_counter() - start
+      allocated_blocks = sys.getallocatedblocks() - blocks
+      previous = self.phases.get(name, PhaseStats(0, 0.0, 0))
+      self.phases[name] = PhaseStats(previous.calls + 1, previous.seconds + seconds,
+                                     previous.allocated_blocks + allocated_blocks)
+      if self.callback:
+        self.callback(name, seconds, allocated_blocks)
+
+  @contextlib.contextmanager
+  def op_template(self, op_name):
+    """Context manager recording the template generation of an op."""
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      seconds = time.perf_counter() - start
+      self.op_templates[op_name] = seconds
+      if self.callback:
+        self.callback('op_template/' + op_name, seconds, 0)
+
+  def to_dict(self):
+    """Returns the recorded numbers as a JSON serializable dict."""
+    return {
+      'phases': [{'name': name, 'calls': stats.calls, 'seconds': stats.seconds,
+                  'allocated_blocks': stats.allocated_blocks}
+                 for name, stats in self.phases.items()],
+      'op_templates': [{'name': name, 'seconds': seconds}
+                       for name, seconds in self.op_templates.items()],
+    }
+
+  def format_report(self, max_ops=10):
+    """Formats the recorded numbers as a table, listing the max_ops slowest op templates."""
+    lines = ['%-24s %8s %12s %18s' % ('phase', 'calls', 'seconds', 'allocated blocks')]
+    for name, stats in self.phases.items():
+      lines.append('%-24s %8d %12.4f %18d' % (name, stats.calls, stats.seconds, stats.allocated_blocks))
+    if self.op_templates:
+      lines.append('')
+      lines.append('%-45s %12s' % ('slowest op templates', 'seconds'))
+      slowest = sorted(self.op_templates.items(), key=lambda x: x[1], reverse=True)[:max_ops]
+      for name, seconds in slowest:
+        lines.append('%-45s %12.4f' % (name, seconds))
+    return '\n'.join(lines)
+
+
+class _NullProfiler(object):
+  """Profiler used when compiling without profiling. It records nothing."""
+
+  @contextlib.contextmanager
+  def phase(self, name):
+    yield
+
+  @contextlib.contextmanager
+  def op_template(self, op_name):
+    yield
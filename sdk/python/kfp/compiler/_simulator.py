@@ -0,0 +1,273 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import OrderedDict, defaultdict, namedtuple
+import heapq
+import re
+
+from ._group_index import GroupTreeIndex
+from ._k8s_helper import K8sHelper
+
+
+# A node pool of the model cluster. capacity is a dict of the resource names, such as 'cpu',
+# 'memory' or 'nvidia.com/gpu', to the allocatable quantities of every node, e.g. '4' or
+# '16Gi'. labels is a dict of the node labels matched by the node selectors of the ops.
+NodePool = namedtuple('NodePool', 'name node_count capacity labels')
+
+# start and end are in seconds from the start of the run. node is '<pool name>-<index>', or
+# None when the cluster is unbounded.
+ScheduledOp = namedtuple('ScheduledOp', 'start end node')
+
+_QUANTITY_PATTERN = re.compile(r'^([0-9.]+)([a-zA-Z]*)$')
+_QUANTITY_SUFFIXES = {
+  '': 1, 'm': 1e-3,
+  'k': 1e3, 'M': 1e6, 'G': 1e9, 'T': 1e12, 'P': 1e15, 'E': 1e18,
+  'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40, 'Pi': 2 ** 50, 'Ei': 2 ** 60,
+}
+
+
+def _parse_quantity(quantity):
+  """Parses a kubernetes quantity, e.g. '500m' or '2Gi', into a float."""
+  match = _QUANTITY_PATTERN.match(str(quantity).strip())
+  if not match or match.group(2) not in _QUANTITY_SUFFIXES:
+    raise ValueError('Invalid resource quantity %s.' % quantity)
+  return float(match.group(1)) * _QUANTITY_SUFFIXES[match.group(2)]
+
+
+class SimulationReport(namedtuple('SimulationReport', 'makespan critical_path critical_path_seconds '
+                                  'peak_concurrency peak_resources idle_time schedule')):
+  """The result of a PipelineSimulator run.
+
+  makespan is the wall-clock time of the run in seconds. critical_path is the list of the op
+  names of the longest chain of dependent ops, and critical_path_seconds its duration, which
+  is the makespan on an unbounded cluster. peak_concurrency is the maximum number of ops
+  running at the same time, and peak_resources the maximum total requests of every resource.
+  idle_time is a dict of the node names to the seconds they run no op during the makespan.
+  schedule is a dict of the op names to their ScheduledOp, in start order.
+  """
+
+  def format_report(self):
+    """Formats the report as a human readable table."""
+    lines = ['makespan: %.1fs' % self.makespan,
+             'critical path: %.1fs, %s' % (self.critical_path_seconds, ' -> '.join(self.critical_path)),
+             'peak concurrency: %d' % self.peak_concurrency]
+    for name, value in sorted(self.peak_resources.items()):
+      lines.append('peak %s: %g' % (name, value))
+    for node, seconds in sorted(self.idle_time.items()):
+      lines.append('idle %s: %.1fs' % (node, seconds))
+    lines.append('%10s %10s  %-20s %s' % ('start', 'end', 'node', 'op'))
+    for op_name, scheduled in self.schedule.items():
+      lines.append('%10.1f %10.1f  %-20s %s' % (scheduled.start, scheduled.end, scheduled.node or '-',
+                                               op_name))
+    return '\n'.join(lines)
+
+
+class PipelineSimulator(object):
+  """Estimates the wall-clock time and the resource demand of a pipeline run.
+
+  The simulator builds the pipeline like the compiler does and replays its DAG with the given
+  op durations. Every op starts as soon as the ops it depends on are done and a node of the
+  model cluster has room for its resource requests and matches its node selector. When
+  several ops are ready, the ones with the longest remaining path run first. The ops of all
+  the condition branches run, since the conditions are only known at run time, and the ops
+  in loops run once. The exit handler runs after all the other ops.
+  Example usage:
+  ```python
+  simulator = PipelineSimulator([NodePool('default', 3, {'cpu': '8', 'memory': '32Gi'}, {})])
+  report = simulator.simulate(my_pipeline, {'train': 3600, 'evaluate': 600})
+  print(report.format_report())
+  ```
+  """
+
+  def __init__(self, node_pools=None, default_duration: float=60, parallelism: int=None):
+    """Create a new instance of PipelineSimulator.
+
+    Args:
+      node_pools: the list of the NodePools of the model cluster. If None, the cluster is
+          unbounded and every op starts as soon as its dependencies are done.
+      default_duration: the duration in seconds of the ops without an estimate.
+      parallelism: the maximum number of ops running at the same time, like the parallelism
+          of the pipeline conf. Overrides the pipeline conf if set.
+    """
+    self.node_pools = node_pools
+    self.default_duration = default_duration
+    self.parallelism = parallelism
+
+  def _nodes(self):
+    """Returns the list of the (name, free resources, labels) of the nodes."""
+    nodes = []
+    for pool in self.node_pools or []:
+      capacity = {name: _parse_quantity(value) for name, value in pool.capacity.items()}
+      for i in range(pool.node_count):
+        nodes.append(('%s-%d' % (pool.name, i), dict(capacity), pool.labels or {}))
+    return nodes
+
+  def simulate(self, pipeline_func, durations=None):
+    """Simulates a run of a pipeline function decorated with @dsl.pipeline.
+
+    Args:
+      pipeline_func: the pipeline function.
+      durations: a dict of the op names, such as 'train' or 'train 2', to their durations in
+          seconds, or a function called with every ContainerOp and returning its duration or
+          None. Typically computed from past runs.
+
+    Returns:
+      A SimulationReport.
+
+    Raises:
+      ValueError if an op does not fit on any node of the model cluster.
+    """
+    from .compiler import Compiler
+    pipeline, _ = Compiler()._build_pipeline(pipeline_func)
+    if callable(durations):
+      estimate = durations
+    else:
+      sanitized_durations = {K8sHelper.sanitize_k8s_name(name): seconds
+                             for name, seconds in (durations or {}).items()}
+      estimate = lambda op: sanitized_durations.get(op.name)
+
+    group_index = GroupTreeIndex(pipeline.groups[0])
+    ops = OrderedDict((name, op) for name, op in pipeline.ops.items() if not op.is_exit_handler)
+    exit_ops = [op for op in pipeline.ops.values() if op.is_exit_handler]
+    op_durations = {}
+    upstream = {}
+    for name, op in pipeline.ops.items():
+      duration = estimate(op)
+      op_durations[name] = float(self.default_duration if duration is None else duration)
+      dependencies = set(pipeline.upstream_ops.get(name, ())) | set(op.dependent_op_names)
+      dependencies |= set(param.op_name for param in op.inputs if param.op_name)
+      dependencies |= set(param.op_name for param in group_index.condition_params[name] if param.op_name)
+      upstream[name] = dependencies & set(ops)
+    # The downstream ops are listed in pipeline order, and ties are broken by pipeline order, so
+    # that the same pipeline always gives the same report.
+    op_order = {name: i for i, name in enumerate(pipeline.ops)}
+    downstream = defaultdict(list)
+    for name in pipeline.ops:
+      for dependency in sorted(upstream[name], key=op_order.get):
+        downstream[dependency].append(name)
+
+    # The longest path from every op to the end of the run, including the op itself.
+    remaining = {}
+    for name in reversed(self._topological_order(ops, upstream)):
+      remaining[name] = op_durations[name] + max([remaining[x] for x in downstream[name]] or [0])
+
+    critical_path = []
+    candidates = [x for x in ops if not upstream[x]]
+    while candidates:
+      name = min(candidates, key=lambda x: (-remaining[x], op_order[x]))
+      critical_path.append(name)
+      candidates = downstream[name]
+    critical_path_seconds = remaining[critical_path[0]] if critical_path else 0.0
+
+    nodes = self._nodes()
+    parallelism = self.parallelism or pipeline.conf.parallelism
+    requests = {name: {resource: _parse_quantity(value) for resource, value in op.resource_requests.items()}
+                for name, op in pipeline.ops.items()}
+    for name, op in pipeline.ops.items():
+      # The nodes are all free before the run starts.
+      if nodes and not any(self._fits(op, requests[name], node[2], node[1]) for node in nodes):
+        raise ValueError('The op %s does not fit on any node of the model cluster.' % name)
+
+    schedule = {}
+    running_resources = defaultdict(float)
+    peak_resources = defaultdict(float)
+    peak_concurrency = 0
+    # Heap of (end time, op name, node index).
+    running = []
+    now = 0.0
+    pending_upstream = {name: set(dependencies) for name, dependencies in upstream.items() if name in ops}
+    ready = [name for name in ops if not pending_upstream[name]]
+    exit_pending = list(exit_ops)
+
+    while ready or running or exit_pending:
+      if not ready and not running:
+        # The exit handler runs once all the other ops are done.
+        ready = [op.name for op in exit_pending]
+        exit_pending = []
+      ready.sort(key=lambda x: (-remaining.get(x, op_durations[x]), op_order[x]))
+      for name in list(ready):
+        if parallelism and len(running) >= parallelism:
+          break
+        node_index = None
+        if nodes:
+          node_index = next((i for i, node in enumerate(nodes)
+                             if self._fits(pipeline.ops[name], requests[name], node[2], node[1])), None)
+          if node_index is None:
+            continue
+          for resource, value in requests[name].items():
+            nodes[node_index][1][resource] -= value
+        ready.remove(name)
+        end = now + op_durations[name]
+        schedule[name] = ScheduledOp(now, end, nodes[node_index][0] if nodes else None)
+        heapq.heappush(running, (end, name, node_index))
+        for resource, value in requests[name].items():
+          running_resources[resource] += value
+          peak_resources[resource] = max(peak_resources[resource], running_resources[resource])
+        peak_concurrency = max(peak_concurrency, len(running))
+      if not running:
+        continue
+
+      now, name, node_index = heapq.heappop(running)
+      finished = [(name, node_index)]
+      while running and running[0][0] == now:
+        finished.append(heapq.heappop(running)[1:])
+      for name, node_index in finished:
+        for resource, value in requests[name].items():
+          running_resources[resource] -= value
+          if node_index is not None:
+            nodes[node_index][1][resource] += value
+        for downstream_name in downstream[name]:
+          pending_upstream[downstream_name].discard(name)
+          if not pending_upstream[downstream_name]:
+            ready.append(downstream_name)
+
+    makespan = max([x.end for x in schedule.values()] or [0.0])
+    # Several ops can run on a node at the same time, so the node is busy during the union of
+    # their intervals.
+    busy_time = defaultdict(float)
+    busy_until = {}
+    for scheduled in sorted(x for x in schedule.values() if x.node is not None):
+      start = max(scheduled.start, busy_until.get(scheduled.node, 0.0))
+      busy_time[scheduled.node] += max(scheduled.end - start, 0.0)
+      busy_until[scheduled.node] = max(scheduled.end, busy_until.get(scheduled.node, 0.0))
+    idle_time = {node[0]: makespan - busy_time[node[0]] for node in nodes}
+    schedule = OrderedDict(sorted(schedule.items(), key=lambda x: (x[1].start, op_order[x[0]])))
+    return SimulationReport(makespan, critical_path, critical_path_seconds, peak_concurrency,
+                            dict(peak_resources), idle_time, schedule)
+
+  @staticmethod
+  def _fits(op, requests, labels, free):
+    """Returns whether an op matches the labels of a node and fits in its free resources."""
+    if any(labels.get(key) != value for key, value in op.node_selector.items()):
+      return False
+    return all(free.get(resource, 0) >= value for resource, value in requests.items())
+
+  @staticmethod
+  def _topological_order(ops, upstream):
+    order = []
+    visited = set()
+    for name in ops:
+      stack = [(name, False)]
+      while stack:
+        current, expanded = stack.pop()
+        if expanded:
+          order.append(current)
+          continue
+        if current in visited:
+          continue
+        visited.add(current)
+        stack.append((current, True))
+        stack.extend((x, False) for x in upstream[current] if x not in visited)
+    return order
@@ -0,0 +1,89 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import shlex
+
+
+# The conventional artifacts are cached when the command produced them.
+_OPTIONAL_OUTPUTS = ['/mlpipeline-ui-metadata.json', '/mlpipeline-metrics.json']
+
+# The original command and arguments are the positional parameters of the script, so the
+# key covers their values as resolved by argo at run time. The contents of the input files
+# are hashed too, since the command line only holds their paths.
+_STEP_CACHE_SCRIPT = '''set -e
+entry={cache_root}/$({{ printf '%s\\n' {key_spec} "$@";{input_digests} }} | sha256sum | cut -d ' ' -f 1)
+if [ -f "$entry/created" ]{freshness_check}; then
+  echo "Restoring the outputs from the step cache entry $entry."
+{restore}
+  exit 0
+fi
+"$@"
+tmp="$entry.tmp.$$"
+mkdir -p "$tmp"
+{save}
+date +%s > "$tmp/created"
+rm -rf "$entry"
+mv "$tmp" "$entry"
+'''
+
+
+def wrap_command_with_step_cache(command, arguments, image, file_outputs, cache_root,
+                                 ttl_seconds=None, input_paths=None):
+  """Wraps the command of an op in a script which looks up the step cache first.
+
+  Args:
+    command: the processed command of the op.
+    arguments: the processed arguments of the op.
+    image: the image of the op.
+    file_outputs: dict of the output names to their file or directory paths.
+    cache_root: the path the cache store is mounted at.
+    ttl_seconds: the time an entry stays fresh. If None, entries never become stale.
+    input_paths: the file or directory paths of the input artifacts of the op. The contents
+        of their files are part of the cache key.
+
+  Returns:
+    The new command of the op. It includes the original command and arguments.
+  """
+  file_outputs = file_outputs or {}
+  key_spec = json.dumps({'image': image, 'file_outputs': file_outputs}, sort_keys=True)
+  restore = []
+  save = []
+  for i, path in enumerate(sorted(set(file_outputs.values()))):
+    restore.append('  mkdir -p "$(dirname %s)"' % shlex.quote(path))
+    restore.append('  rm -rf %s' % shlex.quote(path))
+    restore.append('  cp -r "$entry/%d" %s' % (i, shlex.quote(path)))
+    save.append('cp -r %s "$tmp/%d"' % (shlex.quote(path), i))
+  for path in _OPTIONAL_OUTPUTS:
+    name = path.lstrip('/')
+    restore.append('  if [ -f "$entry/%s" ]; then cp "$entry/%s" %s; fi' % (name, name, path))
+    save.append('if [ -f %s ]; then cp %s "$tmp/%s"; fi' % (path, path, name))
+
+  input_digests = []
+  for path in sorted(set(input_paths or [])):
+    input_digests.append(' find %s -type f -exec sha256sum {} \\; | LC_ALL=C sort -k 2;'
+                         % shlex.quote(path))
+
+  freshness_check = ''
+  if ttl_seconds is not None:
+    freshness_check = ' && [ $(( $(date +%%s) - $(cat "$entry/created") )) -lt %d ]' % ttl_seconds
+  script = _STEP_CACHE_SCRIPT.format(
+      cache_root=shlex.quote(cache_root.rstrip('/') or '/'),
+      key_spec=shlex.quote(key_spec),
+      input_digests=''.join(input_digests),
+      freshness_check=freshness_check,
+      restore='\n'.join(restore),
+      save='\n'.join(save))
+  return ['sh', '-c', script, 'kfp-step-cache'] + list(command or []) + list(arguments or [])
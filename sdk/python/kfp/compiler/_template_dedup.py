@@ -0,0 +1,182 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+from collections import defaultdict, namedtuple
+import copy
+import json
+import re
+
+
+TemplateDeduplicationStats = namedtuple('TemplateDeduplicationStats',
+                                        'templates_before templates_after bytes_saved')
+
+_INPUT_PARAMETER_REFERENCE = re.compile(r'{{inputs\.parameters\.([^}]+)}}')
+_TASK_OUTPUT_REFERENCE = re.compile(r'{{tasks\.([^.}]+)\.outputs\.(parameters|artifacts)\.([^}]+)}}')
+_CONTAINER_ARG_FIELDS = ['command', 'args']
+
+
+def _canonicalize_op_template(template):
+  """Computes the canonical form of an op template.
+
+  The canonical form drops the template name and inputs, replaces the container command and
+  arguments with their lengths and strips the op name prefix from the output names. Two op
+  templates with the same canonical form only differ in the values they are given.
+  """
+  op_name = template['name']
+  canonical = copy.deepcopy(template)
+  del canonical['name']
+  canonical.pop('inputs', None)
+  for field in _CONTAINER_ARG_FIELDS:
+    if field in canonical['container']:
+      canonical['container'][field] = len(canonical['container'][field])
+  for kind in ['parameters', 'artifacts']:
+    for output in canonical.get('outputs', {}).get(kind, []):
+      if output['name'].startswith(op_name + '-'):
+        output['name'] = '-' + output['name'][len(op_name) + 1:]
+  return json.dumps(canonical, sort_keys=True)
+
+
+def _is_deduplicable(template):
+  """Only templates whose inputs are all parameters can pass their values as task arguments."""
+  return 'container' in template and set(template.get('inputs', {}).keys()) <= {'parameters'}
+
+
+def _resolve_in_task_scope(value, task_arguments, input_values):
+  """Replaces the input parameter references of a template with the values of the task."""
+  def _resolve(match):
+    name = match.group(1)
+    if name in task_arguments:
+      return task_arguments[name]
+    if name in input_values:
+      return input_values[name]
+    return match.group(0)
+  return _INPUT_PARAMETER_REFERENCE.sub(_resolve, value)
+
+
+def _rename_output(name, op_name, survivor_name):
+  if name.startswith(op_name + '-'):
+    return survivor_name + name[len(op_name):]
+  return name
+
+
+def _rewrite_strings(obj, rewrite):
+  if isinstance(obj, str):
+    return rewrite(obj)
+  if isinstance(obj, list):
+    return [_rewrite_strings(x, rewrite) for x in obj]
+  if isinstance(obj, dict):
+    return {key: _rewrite_strings(value, rewrite) for key, value in obj.items()}
+  return obj
+
+
+def deduplicate_templates(templates, op_names):
+  """Emits each distinct op template once.
+
+  Op templates with the same canonical form are merged into the template of the first op in
+  name order. The container command and argument entries that differ between the merged ops,
+  or that reference input parameters, become input parameters of the merged template, and the
+  DAG tasks of the merged ops pass their own values through task arguments. References to the
+  outputs of the merged ops are renamed to the output names of the merged template.
+
+  Args:
+    templates: the list of templates of the workflow.
+    op_names: the names of the op templates that may be merged. Templates referenced directly
+        from the workflow, such as the exit handler, must not be included.
+
+  Returns:
+    A tuple (templates, stats) where stats is a TemplateDeduplicationStats.
+  """
+  size_before = len(json.dumps(templates, sort_keys=True))
+  templates_by_name = {t['name']: t for t in templates}
+
+  tasks_by_op = {}
+  for template in templates:
+    for task in template.get('dag', {}).get('tasks', []):
+      if task['name'] in op_names:
+        tasks_by_op[task['name']] = task
+
+  similar_templates = defaultdict(list)
+  for name in sorted(op_names):
+    template = templates_by_name[name]
+    if name in tasks_by_op and _is_deduplicable(template):
+      similar_templates[_canonicalize_op_template(template)].append(template)
+
+  merged_templates = {}
+  # Key is the name of a merged op, value is the name of the template it is merged into.
+  survivors = {}
+  for members in similar_templates.values():
+    if len(members) < 2:
+      continue
+    survivor = copy.deepcopy(members[0])
+    survivor_name = survivor['name']
+    lifted_inputs = []
+    for field in _CONTAINER_ARG_FIELDS:
+      if field not in survivor['container']:
+        continue
+      for i, value in enumerate(survivor['container'][field]):
+        values = [m['container'][field][i] for m in members]
+        if all(v == value for v in values) and not _INPUT_PARAMETER_REFERENCE.search(value):
+          continue
+        input_name = '%s-%d' % (field, i)
+        survivor['container'][field][i] = '{{inputs.parameters.%s}}' % input_name
+        lifted_inputs.append((input_name, field, i))
+    survivor.pop('inputs', None)
+    if lifted_inputs:
+      survivor['inputs'] = {'parameters': [{'name': x[0]} for x in lifted_inputs]}
+    merged_templates[survivor_name] = survivor
+
+    for member in members:
+      survivors[member['name']] = survivor_name
+      task = tasks_by_op[member['name']]
+      task_arguments = {p['name']: p['value'] for p in task.get('arguments', {}).get('parameters', [])}
+      input_values = {p['name']: p['value'] for p in member.get('inputs', {}).get('parameters', [])
+                      if 'value' in p}
+      arguments = [{
+        'name': input_name,
+        'value': _resolve_in_task_scope(member['container'][field][i], task_arguments, input_values),
+      } for input_name, field, i in lifted_inputs]
+      task['template'] = survivor_name
+      task.pop('arguments', None)
+      if arguments:
+        task['arguments'] = {'parameters': arguments}
+
+  if not merged_templates:
+    return templates, TemplateDeduplicationStats(len(templates), len(templates), 0)
+
+  def _rewrite_output_reference(match):
+    task_name, kind, output_name = match.groups()
+    if task_name not in survivors:
+      return match.group(0)
+    return '{{tasks.%s.outputs.%s.%s}}' % (
+        task_name, kind, _rename_output(output_name, task_name, survivors[task_name]))
+
+  def _rewrite(value):
+    return _TASK_OUTPUT_REFERENCE.sub(_rewrite_output_reference, value)
+
+  deduplicated = []
+  for template in templates:
+    name = template['name']
+    if name in merged_templates:
+      deduplicated.append(merged_templates[name])
+    elif name in survivors:
+      continue
+    elif 'dag' in template:
+      deduplicated.append(_rewrite_strings(template, _rewrite))
+    else:
+      deduplicated.append(template)
+
+  size_after = len(json.dumps(deduplicated, sort_keys=True))
+  return deduplicated, TemplateDeduplicationStats(len(templates), len(deduplicated),
+                                                  size_before - size_after)
@@ -15,14 +15,34 @@
 
 from collections import defaultdict
 import inspect
-import re
+import io
+import json
+import logging
 import tarfile
+import tempfile
 import yaml
 
 from .. import dsl
 from ._k8s_helper import K8sHelper
-from ..dsl._pipeline_param import _match_serialized_pipelineparam
+from ._group_index import GroupTreeIndex
+from ._profiler import CompilerProfiler, _NullProfiler
+from ._step_cache import wrap_command_with_step_cache
+from ._op_fusion import fuse_ops as _fuse_ops
+from ._op_cse import merge_duplicate_ops as _merge_duplicate_ops
+from ._op_pruning import prune_ops as _prune_ops
+from ._template_dedup import deduplicate_templates as _deduplicate_templates
+from ..dsl._pipeline_param import _split_serialized_pipelineparams
 from ..dsl._metadata import TypeMeta
+from ..dsl._pipeline import PipelineConf
+
+
+# Use the libyaml based dumper when PyYAML is built with it, since it is much faster.
+class _WorkflowYamlDumper(getattr(yaml, 'CDumper', yaml.Dumper)):
+  """YAML dumper for workflows, which never emits anchors and aliases."""
+
+  def ignore_aliases(self, data):
+    return True
+
 
 class Compiler(object):
   """DSL Compiler.
@@ -40,6 +60,23 @@ class Compiler(object):
   ```
   """
 
+  # TemplateDeduplicationStats of the last compilation with deduplicate_templates enabled.
+  template_deduplication_stats = None
+  # OpFusionStats of the last compilation with fuse_ops enabled.
+  op_fusion_stats = None
+  # DuplicateOpStats of the last compilation with merge_duplicate_ops enabled.
+  duplicate_op_stats = None
+  # OpPruningStats of the last compilation with targets.
+  op_pruning_stats = None
+  # The ComponentSpecs of the ops of the last compilation created from components.
+  _component_specs = ()
+  # The profiler of the ongoing compilation.
+  _profiler = _NullProfiler()
+
+  def _convert_k8s_obj_to_json(self, k8s_obj):
+    with self._profiler.phase('k8s_convert'):
+      return K8sHelper.convert_k8s_obj_to_json(k8s_obj)
+
   def _pipelineparam_full_name(self, param):
     """_pipelineparam_full_name converts the names of pipeline parameters
       to unique names in the argo yaml
@@ -51,57 +88,13 @@ class Compiler(object):
       return param.op_name + '-' + param.name
     return param.name
 
-  def _get_groups_for_ops(self, root_group):
-    """Helper function to get belonging groups for each op.
-
-    Each pipeline has a root group. Each group has a list of operators (leaf) and groups.
-    This function traverse the tree and get all ancestor groups for all operators.
-
-    Returns:
-      A dict. Key is the operator's name. Value is a list of ancestor groups including the
-              op itself. The list of a given operator is sorted in a way that the farthest
-              group is the first and operator itself is the last.
-    """
-    def _get_op_groups_helper(current_groups, ops_to_groups):
-      root_group = current_groups[-1]
-      for g in root_group.groups:
-        current_groups.append(g)
-        _get_op_groups_helper(current_groups, ops_to_groups)
-        del current_groups[-1]
-      for op in root_group.ops:
-        ops_to_groups[op.name] = [x.name for x in current_groups] + [op.name]
-
-    ops_to_groups = {}
-    current_groups = [root_group]
-    _get_op_groups_helper(current_groups, ops_to_groups)
-    return ops_to_groups
-
-  def _get_groups(self, root_group):
-    """Helper function to get all groups (not including ops) in a pipeline."""
-
-    def _get_groups_helper(group):
-      groups = [group]
-      for g in group.groups:
-        groups += _get_groups_helper(g)
-      return groups
-
-    return _get_groups_helper(root_group)
-
-  def _get_uncommon_ancestors(self, op_groups, op1, op2):
-    """Helper function to get unique ancestors between two ops.
-
-    For example, op1's ancestor groups are [root, G1, G2, G3, op1], op2's ancestor groups are
-    [root, G1, G4, op2], then it returns a tuple ([G2, G3, op1], [G4, op2]).
-    """
-    both_groups = [op_groups[op1.name], op_groups[op2.name]]
-    common_groups_len = sum(1 for x in zip(*both_groups) if x==(x[0],)*len(x))
-    group1 = op_groups[op1.name][common_groups_len:]
-    group2 = op_groups[op2.name][common_groups_len:]
-    return (group1, group2)
-
-  def _get_inputs_outputs(self, pipeline, root_group, op_groups):
+  def _get_inputs_outputs(self, pipeline, group_index):
     """Get inputs and outputs of each group and op.
 
+    Args:
+      pipeline: the pipeline whose ops are analyzed.
+      group_index(GroupTreeIndex): the index of the pipeline's group tree.
+
     Returns:
       A tuple (inputs, outputs).
       inputs and outputs are dicts with key being the group/op names and values being list of
@@ -109,12 +102,11 @@ class Compiler(object):
       produces the param. If the param is a pipeline param (no producer op), then
       producing_op_name is None.
     """
-    condition_params = self._get_condition_params_for_ops(root_group)
     inputs = defaultdict(set)
     outputs = defaultdict(set)
     for op in pipeline.ops.values():
       # op's inputs and all params used in conditions for that op are both considered.
-      for param in op.inputs + list(condition_params[op.name]):
+      for param in op.inputs + list(group_index.condition_params[op.name]):
         # if the value is already provided (immediate value), then no need to expose
         # it as input for its parent groups.
         if param.value:
@@ -122,9 +114,8 @@ class Compiler(object):
 
         full_name = self._pipelineparam_full_name(param)
         if param.op_name:
-          upstream_op = pipeline.ops[param.op_name]
-          upstream_groups, downstream_groups = self._get_uncommon_ancestors(
-              op_groups, upstream_op, op)
+          upstream_groups, downstream_groups = group_index.uncommon_ancestors(
+              param.op_name, op.name)
           for i, g in enumerate(downstream_groups):
             if i == 0:
               # If it is the first uncommon downstream group, then the input comes from
@@ -143,33 +134,19 @@ class Compiler(object):
               outputs[g].add((full_name, upstream_groups[i+1]))
         else:
           if not op.is_exit_handler:
-            for g in op_groups[op.name]:
+            ancestors = group_index.ancestors[op.name]
+            if full_name in group_index.loop_items:
+              # A loop item is only available inside its loop.
+              loop_name = group_index.loop_items[full_name][0]
+              if loop_name not in ancestors:
+                raise ValueError('The item of %s is used by %s, which is outside of the loop.' %
+                                 (loop_name, op.name))
+              ancestors = ancestors[ancestors.index(loop_name):]
+            for g in ancestors:
               inputs[g].add((full_name, None))
     return inputs, outputs
 
-  def _get_condition_params_for_ops(self, root_group):
-    """Get parameters referenced in conditions of ops."""
-
-    conditions = defaultdict(set)
-
-    def _get_condition_params_for_ops_helper(group, current_conditions_params):
-      new_current_conditions_params = current_conditions_params
-      if group.type == 'condition':
-        new_current_conditions_params = list(current_conditions_params)
-        if isinstance(group.condition.operand1, dsl.PipelineParam):
-          new_current_conditions_params.append(group.condition.operand1)
-        if isinstance(group.condition.operand2, dsl.PipelineParam):
-          new_current_conditions_params.append(group.condition.operand2)
-      for op in group.ops:
-        for param in new_current_conditions_params:
-          conditions[op.name].add(param)
-      for g in group.groups:
-        _get_condition_params_for_ops_helper(g, new_current_conditions_params)
-
-    _get_condition_params_for_ops_helper(root_group, [])
-    return conditions
-
-  def _get_dependencies(self, pipeline, root_group, op_groups):
+  def _get_dependencies(self, pipeline, group_index):
     """Get dependent groups and ops for all ops and groups.
 
     Returns:
@@ -179,22 +156,48 @@ class Compiler(object):
       then G3 is dependent on G2. Basically dependency only exists in the first uncommon
       ancesters in their ancesters chain. Only sibling groups/ops can have dependencies.
     """
-    condition_params = self._get_condition_params_for_ops(root_group)
     dependencies = defaultdict(set)
     for op in pipeline.ops.values():
-      unstream_op_names = set()
-      for param in op.inputs + list(condition_params[op.name]):
+      # The pipeline records the ops consumed from and run after while the ops are added.
+      unstream_op_names = set(pipeline.upstream_ops.get(op.name, ()))
+      for param in group_index.condition_params[op.name]:
         if param.op_name:
           unstream_op_names.add(param.op_name)
       unstream_op_names |= set(op.dependent_op_names)
 
       for op_name in unstream_op_names:
-        upstream_op = pipeline.ops[op_name]
-        upstream_groups, downstream_groups = self._get_uncommon_ancestors(
-            op_groups, upstream_op, op)
+        upstream_groups, downstream_groups = group_index.uncommon_ancestors(op_name, op.name)
         dependencies[downstream_groups[0]].add(upstream_groups[0])
     return dependencies
 
+  def _get_artifact_outputs(self, pipeline, group_index):
+    """Finds the op outputs passed as argo artifacts.
+
+    An output is an artifact if the op declares it as an output artifact, or if an op takes it
+    as an InputArgumentPath. A file output taken as an InputArgumentPath is also passed as a
+    parameter if another op takes it as a command line value.
+
+    Returns:
+      A dict. Key is the full name of an artifact output, value is whether the output is also
+      passed as a parameter.
+    """
+    artifact_names = set()
+    declared_names = set()
+    value_names = set()
+    for op in pipeline.ops.values():
+      for name in op.output_artifact_paths:
+        declared_names.add(self._pipelineparam_full_name(op.outputs[name]))
+      path_names = set(self._pipelineparam_full_name(argument.argument)
+                       for argument in op.artifact_arguments
+                       if isinstance(argument.argument, dsl.PipelineParam) and argument.argument.op_name)
+      artifact_names |= path_names
+      value_params = set(self._pipelineparam_full_name(param)
+                         for param in op.argument_inputs + list(group_index.condition_params[op.name]))
+      value_names |= set(self._pipelineparam_full_name(param) for param in op.inputs
+                         if self._pipelineparam_full_name(param) not in path_names) | value_params
+    artifact_names |= declared_names
+    return {name: name in value_names and name not in declared_names for name in artifact_names}
+
   def _resolve_value_or_reference(self, value_or_reference, potential_references):
     """_resolve_value_or_reference resolves values and PipelineParams, which could be task parameters or input parameters.
 
@@ -204,7 +207,8 @@ class Compiler(object):
       """
     if isinstance(value_or_reference, dsl.PipelineParam):
       parameter_name = self._pipelineparam_full_name(value_or_reference)
-      task_names = [task_name for param_name, task_name in potential_references if param_name == parameter_name]
+      task_names = [task_name for param_name, task_name in potential_references
+                    if param_name == parameter_name and task_name]
       if task_names:
         task_name = task_names[0]
         return '{{tasks.%s.outputs.parameters.%s}}' % (task_name, parameter_name)
@@ -213,68 +217,159 @@ class Compiler(object):
     else:
       return str(value_or_reference)
 
-  def _process_args(self, raw_args, argument_inputs):
+  def _process_args(self, raw_args, argument_inputs, placeholders=None):
+    """_process_args replaces the serialized PipelineParams in the raw arguments with argo
+    input parameter references.
+
+    Each argument is tokenized once into literal and placeholder segments, and each
+    placeholder is looked up by its sanitized op and param names among the argument inputs.
+    Placeholders that are not argument inputs are kept as they are.
+
+    Args:
+      raw_args: a list of arguments or commands, which may contain serialized PipelineParams.
+      argument_inputs(list[PipelineParam]): the sanitized argument inputs of the op.
+      placeholders: the placeholder registry of the pipeline of the op.
+    """
     if not raw_args:
       return []
-    processed_args = list(map(str, raw_args))
-    for i, _ in enumerate(processed_args):
-      # unsanitized_argument_inputs stores a dict: string of sanitized param -> string of unsanitized param
-      param_tuples = []
-      param_tuples += _match_serialized_pipelineparam(str(processed_args[i]))
-      unsanitized_argument_inputs = {}
-      for param_tuple in list(set(param_tuples)):
-        sanitized_str = str(dsl.PipelineParam(K8sHelper.sanitize_k8s_name(param_tuple.name), K8sHelper.sanitize_k8s_name(param_tuple.op), param_tuple.value, TypeMeta.deserialize(param_tuple.type)))
-        unsanitized_argument_inputs[sanitized_str] = str(dsl.PipelineParam(param_tuple.name, param_tuple.op, param_tuple.value, TypeMeta.deserialize(param_tuple.type)))
-      if argument_inputs:
-        for param in argument_inputs:
-          if str(param) in unsanitized_argument_inputs:
-            full_name = self._pipelineparam_full_name(param)
-            processed_args[i] = re.sub(unsanitized_argument_inputs[str(param)], '{{inputs.parameters.%s}}' % full_name,
-                                       processed_args[i])
+    input_references = {}
+    for param in argument_inputs or []:
+      input_references[(param.op_name or '', param.name)] = \
+          '{{inputs.parameters.%s}}' % self._pipelineparam_full_name(param)
+
+    # Maps the unsanitized (op, name) of a placeholder to its reference.
+    resolved_references = {}
+    processed_args = []
+    for arg in raw_args:
+      processed_parts = []
+      for text, param_tuple in _split_serialized_pipelineparams(str(arg), placeholders):
+        if param_tuple is None:
+          processed_parts.append(text)
+          continue
+        key = (param_tuple.op, param_tuple.name)
+        if key not in resolved_references:
+          sanitized_key = (K8sHelper.sanitize_k8s_name(param_tuple.op),
+                           K8sHelper.sanitize_k8s_name(param_tuple.name))
+          resolved_references[key] = input_references.get(sanitized_key)
+        processed_parts.append(resolved_references[key] or text)
+      processed_args.append(''.join(processed_parts))
     return processed_args
 
-  def _op_to_template(self, op):
-    """Generate template given an operator inherited from dsl.ContainerOp."""
-
-    def _build_conventional_artifact(name, path):
-      return {
-        'name': name,
-        'path': path,
-        's3': {
-          # TODO: parameterize namespace for minio service
-          'endpoint': 'minio-service.kubeflow:9000',
-          'bucket': 'mlpipeline',
-          'key': 'runs/{{workflow.uid}}/{{pod.name}}/' + name + '.tgz',
+  def _build_retry_strategy(self, num_retries, policy, backoff_duration, backoff_factor,
+                            backoff_max_duration):
+    """Builds the argo retryStrategy of an op, or None if the op is not retried."""
+    if not num_retries:
+      return None
+    retry_strategy = {'limit': num_retries}
+    if policy:
+      retry_strategy['retryPolicy'] = policy
+    backoff = {}
+    if backoff_duration:
+      backoff['duration'] = backoff_duration
+    if backoff_factor:
+      backoff['factor'] = backoff_factor
+    if backoff_max_duration:
+      backoff['maxDuration'] = backoff_max_duration
+    if backoff:
+      retry_strategy['backoff'] = backoff
+    return retry_strategy
+
+  def _op_to_template(self, op, conf=None, artifacts=None):
+    """Generate template given an operator inherited from dsl.ContainerOp.
+
+    Args:
+      op: the op.
+      conf: the PipelineConf of the pipeline. Defaults to a PipelineConf with default settings.
+      artifacts: the artifact outputs of the pipeline, see _get_artifact_outputs.
+    """
+    conf = conf or PipelineConf()
+    artifacts = artifacts or {}
+
+    def _build_conventional_artifact(name, path, compressed=True):
+      if conf.artifact_repository_ref:
+        # The artifact is stored in the workflow level artifact repository.
+        artifact = {'name': name, 'path': path}
+      else:
+        artifact = {
+          'name': name,
+          'path': path,
+          's3': {
+            # TODO: parameterize namespace for minio service
+            'endpoint': 'minio-service.kubeflow:9000',
+            'bucket': 'mlpipeline',
+            'key': 'runs/{{workflow.uid}}/{{pod.name}}/' + name + ('.tgz' if compressed else ''),
           'insecure': True,
-          'accessKeySecret': {
-            'name': 'mlpipeline-minio-artifact',
-            'key': 'accesskey',
+            'accessKeySecret': {
+              'name': 'mlpipeline-minio-artifact',
+              'key': 'accesskey',
+            },
+            'secretKeySecret': {
+              'name': 'mlpipeline-minio-artifact',
+              'key': 'secretkey'
+            }
           },
-          'secretKeySecret': {
-            'name': 'mlpipeline-minio-artifact',
-            'key': 'secretkey'
-          }
-        },
-      }
-    processed_arguments = self._process_args(op.arguments, op.argument_inputs)
-    processed_command = self._process_args(op.command, op.argument_inputs)
+        }
+      if not compressed:
+        artifact['archive'] = {'none': {}}
+      return artifact
+
+    for param in op.argument_inputs:
+      full_name = self._pipelineparam_full_name(param)
+      if full_name in artifacts and not artifacts[full_name]:
+        raise ValueError('The output artifact %s cannot be used as a value by %s. '
+                         'Pass it with dsl.InputArgumentPath.' % (full_name, op.name))
+
+    processed_arguments = self._process_args(op.arguments, op.argument_inputs, op._placeholders)
+    processed_command = self._process_args(op.command, op.argument_inputs, op._placeholders)
+    if op.cache_store is not None:
+      processed_command = wrap_command_with_step_cache(
+          processed_command, processed_arguments, op.image,
+          dict(op.file_outputs or {}, **op.output_artifact_paths),
+          op.cache_store.mount_path, op.cache_ttl_seconds,
+          [argument.path for argument in op.artifact_arguments])
+      processed_arguments = []
 
     input_parameters = []
+    input_artifacts = []
+    for argument in op.artifact_arguments:
+      if isinstance(argument.argument, dsl.PipelineParam):
+        full_name = self._pipelineparam_full_name(argument.argument)
+        if full_name in artifacts:
+          input_artifacts.append({'name': full_name, 'path': argument.path})
+          continue
+        data = '{{inputs.parameters.%s}}' % full_name
+      else:
+        data = str(argument.argument)
+      # Argo writes the value to the file.
+      input_artifacts.append({'name': K8sHelper.sanitize_k8s_name(argument.input),
+                              'path': argument.path, 'raw': {'data': data}})
+    input_artifacts.sort(key=lambda x: x['name'])
     for param in op.inputs:
+      if artifacts.get(self._pipelineparam_full_name(param)) is False:
+        continue
       one_parameter = {'name': self._pipelineparam_full_name(param)}
       if param.value:
         one_parameter['value'] = str(param.value)
       input_parameters.append(one_parameter)
     # Sort to make the results deterministic.
+    input_parameters = list({x['name']: x for x in input_parameters}.values())
     input_parameters.sort(key=lambda x: x['name'])
 
+    compression = op.artifact_compression or conf.artifact_compression
     output_parameters = []
+    output_artifacts = []
     for param in op.outputs.values():
-      output_parameters.append({
-        'name': self._pipelineparam_full_name(param),
-        'valueFrom': {'path': op.file_outputs[param.name]}
-      })
+      full_name = self._pipelineparam_full_name(param)
+      path = (op.file_outputs or {}).get(param.name) or op.output_artifact_paths[param.name]
+      if artifacts.get(full_name, True):
+        output_parameters.append({
+          'name': full_name,
+          'valueFrom': {'path': path}
+        })
+      if full_name in artifacts:
+        output_artifacts.append(_build_conventional_artifact(full_name, path, compression != 'none'))
     output_parameters.sort(key=lambda x: x['name'])
+    output_artifacts.sort(key=lambda x: x['name'])
 
     template = {
       'name': op.name,
@@ -286,8 +381,12 @@ class Compiler(object):
       template['container']['args'] = processed_arguments
     if processed_command:
       template['container']['command'] = processed_command
+    if input_parameters or input_artifacts:
+      template['inputs'] = {}
     if input_parameters:
-      template['inputs'] = {'parameters': input_parameters}
+      template['inputs']['parameters'] = input_parameters
+    if input_artifacts:
+      template['inputs']['artifacts'] = input_artifacts
 
     template['outputs'] = {}
     if output_parameters:
@@ -295,14 +394,23 @@ class Compiler(object):
 
     # Generate artifact for metadata output
     # The motivation of appending the minio info in the yaml
-    # is to specify a unique path for the metadata.
-    # TODO: after argo addresses the issue that configures a unique path
-    # for the artifact output when default artifact repository is configured,
-    # this part needs to be updated to use the default artifact repository.
-    output_artifacts = []
-    output_artifacts.append(_build_conventional_artifact('mlpipeline-ui-metadata', '/mlpipeline-ui-metadata.json'))
-    output_artifacts.append(_build_conventional_artifact('mlpipeline-metrics', '/mlpipeline-metrics.json'))
-    template['outputs']['artifacts'] = output_artifacts
+    # is to specify a unique path for the metadata, unless the pipeline references
+    # a workflow level artifact repository.
+    # Ops that do not produce an artifact skip it, so that nothing is uploaded at pod exit.
+    produces_ui_metadata = op.produces_ui_metadata
+    if produces_ui_metadata is None:
+      produces_ui_metadata = conf.produces_ui_metadata
+    produces_metrics = op.produces_metrics
+    if produces_metrics is None:
+      produces_metrics = conf.produces_metrics
+    if produces_ui_metadata:
+      output_artifacts.append(_build_conventional_artifact('mlpipeline-ui-metadata', '/mlpipeline-ui-metadata.json'))
+    if produces_metrics:
+      output_artifacts.append(_build_conventional_artifact('mlpipeline-metrics', '/mlpipeline-metrics.json'))
+    if output_artifacts:
+      template['outputs']['artifacts'] = output_artifacts
+    if not template['outputs']:
+      del template['outputs']
 
     # Set resources.
     if op.resource_limits or op.resource_requests:
@@ -316,10 +424,27 @@ class Compiler(object):
     if op.node_selector:
       template['nodeSelector'] = op.node_selector
 
+    # Set scheduling constraints. The pipeline level defaults are set on the workflow.
+    if op.affinity:
+      template['affinity'] = self._convert_k8s_obj_to_json(op.affinity)
+    if op.tolerations:
+      template['tolerations'] = list(map(self._convert_k8s_obj_to_json, op.tolerations))
+    if op.priority_class_name:
+      template['priorityClassName'] = op.priority_class_name
+
     if op.env_variables:
-      template['container']['env'] = list(map(K8sHelper.convert_k8s_obj_to_json, op.env_variables))
+      template['container']['env'] = list(map(self._convert_k8s_obj_to_json, op.env_variables))
     if op.volume_mounts:
-      template['container']['volumeMounts'] = list(map(K8sHelper.convert_k8s_obj_to_json, op.volume_mounts))
+      template['container']['volumeMounts'] = list(map(self._convert_k8s_obj_to_json, op.volume_mounts))
+
+    for field, containers in [('initContainers', op.init_containers), ('sidecars', op.sidecars)]:
+      if containers:
+        template[field] = []
+        for container, mirror_volume_mounts in containers:
+          user_container = self._convert_k8s_obj_to_json(container)
+          if mirror_volume_mounts:
+            user_container['mirrorVolumeMounts'] = True
+          template[field].append(user_container)
 
     if op.pod_annotations or op.pod_labels:
       template['metadata'] = {}
@@ -328,38 +453,76 @@ class Compiler(object):
       if op.pod_labels:
         template['metadata']['labels'] = op.pod_labels
 
+    # Ops without their own retries or timeout get the pipeline level defaults.
     if op.num_retries:
-      template['retryStrategy'] = {'limit': op.num_retries}
+      retry_strategy = self._build_retry_strategy(op.num_retries, op.retry_policy,
+                                                  op.backoff_duration, op.backoff_factor,
+                                                  op.backoff_max_duration)
+    else:
+      retry_strategy = self._build_retry_strategy(conf.default_num_retries, conf.default_retry_policy,
+                                                  conf.default_backoff_duration,
+                                                  conf.default_backoff_factor,
+                                                  conf.default_backoff_max_duration)
+    if retry_strategy:
+      template['retryStrategy'] = retry_strategy
+
+    timeout = op.timeout or conf.default_timeout
+    if timeout:
+      template['activeDeadlineSeconds'] = timeout
 
     return template
 
-  def _group_to_template(self, group, inputs, outputs, dependencies):
+  def _group_to_template(self, group, inputs, outputs, dependencies, loop_items=None,
+                         artifacts=None):
     """Generate template given an OpsGroup.
 
-    inputs, outputs, dependencies are all helper dicts.
+    inputs, outputs, dependencies are all helper dicts. loop_items maps the loop item params
+    to their (loop group name, field name), see GroupTreeIndex. artifacts holds the outputs
+    passed as artifacts, see _get_artifact_outputs.
     """
+    loop_items = loop_items or {}
+    artifacts = artifacts or {}
     template = {'name': group.name}
 
     # Generate inputs section.
     if inputs.get(group.name, None):
-      template_inputs = [{'name': x[0]} for x in inputs[group.name]]
+      template['inputs'] = {}
+      template_inputs = [{'name': x[0]} for x in inputs[group.name] if artifacts.get(x[0], True)]
       template_inputs.sort(key=lambda x: x['name'])
-      template['inputs'] = {
-        'parameters': template_inputs
-      }
+      if template_inputs:
+        template['inputs']['parameters'] = template_inputs
+      input_artifacts = [{'name': x[0]} for x in inputs[group.name] if x[0] in artifacts]
+      input_artifacts.sort(key=lambda x: x['name'])
+      if input_artifacts:
+        template['inputs']['artifacts'] = input_artifacts
 
     # Generate outputs section.
     if outputs.get(group.name, None):
+      template['outputs'] = {}
       template_outputs = []
+      output_artifacts = []
       for param_name, depentent_name in outputs[group.name]:
-        template_outputs.append({
-          'name': param_name,
-          'valueFrom': {
-            'parameter': '{{tasks.%s.outputs.parameters.%s}}' % (depentent_name, param_name)
-          }
-        })
+        if artifacts.get(param_name, True):
+          template_outputs.append({
+            'name': param_name,
+            'valueFrom': {
+              'parameter': '{{tasks.%s.outputs.parameters.%s}}' % (depentent_name, param_name)
+            }
+          })
+        if param_name in artifacts:
+          output_artifacts.append({
+            'name': param_name,
+            'from': '{{tasks.%s.outputs.artifacts.%s}}' % (depentent_name, param_name)
+          })
       template_outputs.sort(key=lambda x: x['name'])
-      template['outputs'] = {'parameters': template_outputs}
+      output_artifacts.sort(key=lambda x: x['name'])
+      if template_outputs:
+        template['outputs']['parameters'] = template_outputs
+      if output_artifacts:
+        template['outputs']['artifacts'] = output_artifacts
+
+    if group.parallelism:
+      template['parallelism'] = group.parallelism
 
     # Generate tasks section.
     tasks = []
@@ -385,7 +548,19 @@ class Compiler(object):
       # Generate arguments section for this task.
       if inputs.get(sub_group.name, None):
         arguments = []
+        artifact_arguments = []
         for param_name, dependent_name in inputs[sub_group.name]:
+          if loop_items.get(param_name, (None,))[0] == sub_group.name:
+            # The loop provides its items itself.
+            continue
+          if param_name in artifacts:
+            artifact_arguments.append({
+              'name': param_name,
+              'from': ('{{tasks.%s.outputs.artifacts.%s}}' % (dependent_name, param_name)
+                       if dependent_name else '{{inputs.artifacts.%s}}' % param_name)
+            })
+            if not artifacts[param_name]:
+              continue
           if dependent_name:
             # The value comes from an upstream sibling.
             arguments.append({
@@ -399,28 +574,107 @@ class Compiler(object):
               'value': '{{inputs.parameters.%s}}' % param_name
             })
         arguments.sort(key=lambda x: x['name'])
-        task['arguments'] = {'parameters': arguments}
+        artifact_arguments.sort(key=lambda x: x['name'])
+        if arguments or artifact_arguments:
+          task['arguments'] = {}
+        if arguments:
+          task['arguments']['parameters'] = arguments
+        if artifact_arguments:
+          task['arguments']['artifacts'] = artifact_arguments
       tasks.append(task)
     tasks.sort(key=lambda x: x['name'])
     template['dag'] = {'tasks': tasks}
     return template
 
+  def _loop_group_to_templates(self, group, inputs, outputs, dependencies, loop_items,
+                               artifacts=None):
+    """Generate the templates of a ParallelFor group.
+
+    The group template runs a single task, which iterates over the items with withItems or
+    withParam and runs the body template once per item. The body template holds the ops of
+    the group. Keeping the iterations in their own template lets the group's parallelism
+    limit the number of iterations running at the same time.
+    """
+    if outputs.get(group.name, None):
+      raise ValueError('The outputs of the ops in %s cannot be used outside of the loop.' % group.name)
+
+    artifacts = artifacts or {}
+    body = self._group_to_template(group, inputs, outputs, dependencies, loop_items, artifacts)
+    body['name'] = group.name + '-iteration'
+    # The parallelism applies to the iterations, not to the ops of one iteration.
+    body.pop('parallelism', None)
+
+    template = {'name': group.name}
+    arguments = []
+    group_inputs = []
+    artifact_arguments = []
+    for param_name, _ in inputs.get(group.name, []):
+      if param_name in artifacts:
+        artifact_arguments.append({'name': param_name,
+                                   'from': '{{inputs.artifacts.%s}}' % param_name})
+        if not artifacts[param_name]:
+          continue
+      if loop_items.get(param_name, (None,))[0] == group.name:
+        field = loop_items[param_name][1]
+        value = '{{item.%s}}' % field if field else '{{item}}'
+      else:
+        group_inputs.append({'name': param_name})
+        value = '{{inputs.parameters.%s}}' % param_name
+      arguments.append({'name': param_name, 'value': value})
+    if group_inputs or artifact_arguments:
+      template['inputs'] = {}
+    if group_inputs:
+      group_inputs.sort(key=lambda x: x['name'])
+      template['inputs']['parameters'] = group_inputs
+    if artifact_arguments:
+      artifact_arguments.sort(key=lambda x: x['name'])
+      template['inputs']['artifacts'] = [{'name': x['name']} for x in artifact_arguments]
+    if group.parallelism:
+      template['parallelism'] = group.parallelism
+
+    task = {
+      'name': body['name'],
+      'template': body['name'],
+    }
+    if group.items_param is None:
+      task['withItems'] = group.items
+    elif group.items_param.value:
+      task['withParam'] = str(group.items_param.value)
+    else:
+      task['withParam'] = '{{inputs.parameters.%s}}' % self._pipelineparam_full_name(group.items_param)
+    if arguments or artifact_arguments:
+      task['arguments'] = {}
+    if arguments:
+      arguments.sort(key=lambda x: x['name'])
+      task['arguments']['parameters'] = arguments
+    if artifact_arguments:
+      task['arguments']['artifacts'] = artifact_arguments
+    template['dag'] = {'tasks': [task]}
+    return [template, body]
+
   def _create_templates(self, pipeline):
     """Create all groups and ops templates in the pipeline."""
 
-    new_root_group = pipeline.groups[0]
-
-    op_groups = self._get_groups_for_ops(new_root_group)
-    inputs, outputs = self._get_inputs_outputs(pipeline, new_root_group, op_groups)
-    dependencies = self._get_dependencies(pipeline, new_root_group, op_groups)
-    groups = self._get_groups(new_root_group)
+    with self._profiler.phase('group_analysis'):
+      group_index = GroupTreeIndex(pipeline.groups[0])
+      inputs, outputs = self._get_inputs_outputs(pipeline, group_index)
+      dependencies = self._get_dependencies(pipeline, group_index)
+      artifacts = self._get_artifact_outputs(pipeline, group_index)
 
     templates = []
-    for g in groups:
-      templates.append(self._group_to_template(g, inputs, outputs, dependencies))
+    with self._profiler.phase('group_templates'):
+      for g in group_index.groups:
+        if isinstance(g, dsl.ParallelFor):
+          templates.extend(self._loop_group_to_templates(g, inputs, outputs, dependencies,
+                                                         group_index.loop_items, artifacts))
+        else:
+          templates.append(self._group_to_template(g, inputs, outputs, dependencies,
+                                                   group_index.loop_items, artifacts))
 
-    for op in pipeline.ops.values():
-      templates.append(self._op_to_template(op))
+    with self._profiler.phase('op_templates'):
+      for op in pipeline.ops.values():
+        with self._profiler.op_template(op.name):
+          templates.append(self._op_to_template(op, pipeline.conf, artifacts))
     return templates
 
   def _create_volumes(self, pipeline):
@@ -434,11 +688,11 @@ class Compiler(object):
           #TODO: check for duplicity based on the serialized volumes instead of just name.
           if v.name not in volume_name_set:
             volume_name_set.add(v.name)
-            volumes.append(K8sHelper.convert_k8s_obj_to_json(v))
+            volumes.append(self._convert_k8s_obj_to_json(v))
     volumes.sort(key=lambda x: x['name'])
     return volumes
 
-  def _create_pipeline_workflow(self, args, pipeline):
+  def _create_pipeline_workflow(self, args, pipeline, deduplicate_templates=False, fuse_ops=False):
     """Create workflow for the pipeline."""
 
     # Input Parameters
@@ -460,6 +714,23 @@ class Compiler(object):
       if first_group.type == 'exit_handler':
         exit_handler = first_group.exit_op
 
+    # The exit handler template is referenced by name from the workflow spec.
+    op_names = set(pipeline.ops.keys())
+    if exit_handler:
+      op_names.discard(exit_handler.name)
+
+    if fuse_ops:
+      with self._profiler.phase('op_fusion'):
+        templates, self.op_fusion_stats = _fuse_ops(templates, op_names)
+      logging.info('Op fusion: %d tasks reduced to %d in %d fused chain(s).', *self.op_fusion_stats)
+      op_names &= set(t['name'] for t in templates)
+
+    if deduplicate_templates:
+      with self._profiler.phase('template_deduplication'):
+        templates, self.template_deduplication_stats = _deduplicate_templates(templates, op_names)
+      logging.info('Template deduplication: %d templates reduced to %d, %d bytes saved.',
+                   *self.template_deduplication_stats)
+
     # Volumes
     volumes = self._create_volumes(pipeline)
 
@@ -479,8 +750,21 @@ class Compiler(object):
     if len(pipeline.conf.image_pull_secrets) > 0:
       image_pull_secrets = []
       for image_pull_secret in pipeline.conf.image_pull_secrets:
-        image_pull_secrets.append(K8sHelper.convert_k8s_obj_to_json(image_pull_secret))
+        image_pull_secrets.append(self._convert_k8s_obj_to_json(image_pull_secret))
       workflow['spec']['imagePullSecrets'] = image_pull_secrets
+    if pipeline.conf.affinity:
+      workflow['spec']['affinity'] = self._convert_k8s_obj_to_json(pipeline.conf.affinity)
+    if pipeline.conf.tolerations:
+      workflow['spec']['tolerations'] = list(map(self._convert_k8s_obj_to_json,
+                                                 pipeline.conf.tolerations))
+    if pipeline.conf.priority_class_name:
+      workflow['spec']['podPriorityClassName'] = pipeline.conf.priority_class_name
+    if pipeline.conf.parallelism:
+      workflow['spec']['parallelism'] = pipeline.conf.parallelism
+    if pipeline.conf.timeout:
+      workflow['spec']['activeDeadlineSeconds'] = pipeline.conf.timeout
+    if pipeline.conf.artifact_repository_ref:
+      workflow['spec']['artifactRepositoryRef'] = pipeline.conf.artifact_repository_ref
     if exit_handler:
       workflow['spec']['onExit'] = exit_handler.name
     if volumes:
@@ -507,8 +791,13 @@ class Compiler(object):
 
     return _validate_exit_handler_helper(pipeline.groups[0], [], False)
 
-  def _compile(self, pipeline_func):
-    """Compile the given pipeline function into workflow."""
+  def _build_pipeline(self, pipeline_func):
+    """Runs the given pipeline function to build its pipeline, with sanitized names.
+
+    Returns:
+      A tuple (pipeline, args). args is the list of the PipelineParams of the pipeline
+      function arguments, with their default values.
+    """
 
     argspec = inspect.getfullargspec(pipeline_func)
 
@@ -531,7 +820,7 @@ class Compiler(object):
           break
       args_list.append(dsl.PipelineParam(K8sHelper.sanitize_k8s_name(arg_name), param_type = arg_type))
 
-    with dsl.Pipeline(pipeline_name) as p:
+    with self._profiler.phase('pipeline_function'), dsl.Pipeline(pipeline_name) as p:
       pipeline_func(*args_list)
 
     # Remove when argo supports local exit handler.
@@ -545,9 +834,38 @@ class Compiler(object):
         arg.value = default.value if isinstance(default, dsl.PipelineParam) else default
 
     # Sanitize operator names and param names
-    sanitized_ops = {}
+    with self._profiler.phase('sanitize'):
+      self._sanitize_names(p)
+    return p, args_list_with_defaults
+
+  def _compile(self, pipeline_func, deduplicate_templates=False, fuse_ops=False,
+               merge_duplicate_ops=False, targets=None):
+    """Compile the given pipeline function into workflow."""
+
+    p, args_list_with_defaults = self._build_pipeline(pipeline_func)
+    self._component_specs = [op._component_spec for op in p.ops.values()
+                             if op._component_spec is not None]
+
+    if targets is not None:
+      with self._profiler.phase('op_pruning'):
+        self.op_pruning_stats = _prune_ops(p, targets)
+      logging.info('Op pruning: %d ops reduced to %d.', *self.op_pruning_stats)
+
+    if merge_duplicate_ops:
+      with self._profiler.phase('duplicate_op_merging'):
+        self.duplicate_op_stats = _merge_duplicate_ops(p)
+      logging.info('Duplicate op merging: %d ops reduced to %d.', *self.duplicate_op_stats[:2])
+
+    workflow = self._create_pipeline_workflow(args_list_with_defaults, p, deduplicate_templates,
+                                              fuse_ops)
+    return workflow
+
+  def _sanitize_names(self, p):
+    """Sanitizes the names of the ops of a pipeline and of their params."""
+    new_names = {}
     for op in p.ops.values():
       sanitized_name = K8sHelper.sanitize_k8s_name(op.name)
+      new_names[op.name] = sanitized_name
       op.name = sanitized_name
       for param in op.inputs + op.argument_inputs:
         param.name = K8sHelper.sanitize_k8s_name(param.name)
@@ -567,34 +885,97 @@ class Compiler(object):
         for key in op.file_outputs.keys():
           sanitized_file_outputs[K8sHelper.sanitize_k8s_name(key)] = op.file_outputs[key]
         op.file_outputs = sanitized_file_outputs
-      sanitized_ops[sanitized_name] = op
-    p.ops = sanitized_ops
+      op.output_artifact_paths = {K8sHelper.sanitize_k8s_name(key): path
+                                  for key, path in op.output_artifact_paths.items()}
+    p._rename_ops(new_names)
 
-    workflow = self._create_pipeline_workflow(args_list_with_defaults, p)
-    return workflow
+  def _write_workflow(self, workflow, package_path, package_format='yaml'):
+    """Serializes the workflow straight into the pipeline file of a tar.gz package.
+
+    The workflow is streamed into a temporary file, which is then copied into the tar
+    member, so the manifest is never held in memory as a whole.
 
-  def compile(self, pipeline_func, package_path, type_check=False):
+    Args:
+      workflow: the workflow dict.
+      package_path: the output tar.gz file path.
+      package_format: 'yaml' (default) or 'json'. The package contains pipeline.yaml or
+          pipeline.json respectively.
+    """
+    if package_format not in ['yaml', 'json']:
+      raise ValueError('Invalid package format %s. Supported formats are yaml and json.' % package_format)
+
+    with tempfile.TemporaryFile() as workflow_file:
+      with self._profiler.phase('serialize'):
+        if package_format == 'json':
+          text_file = io.TextIOWrapper(workflow_file, encoding='utf-8')
+          json.dump(workflow, text_file, sort_keys=True)
+          text_file.flush()
+          text_file.detach()
+        else:
+          yaml.dump(workflow, workflow_file, Dumper=_WorkflowYamlDumper, default_flow_style=False,
+                    encoding='utf-8')
+      with self._profiler.phase('package'):
+        tarinfo = tarfile.TarInfo('pipeline.' + package_format)
+        tarinfo.size = workflow_file.tell()
+        workflow_file.seek(0)
+        with tarfile.open(package_path, "w:gz") as tar:
+          tar.addfile(tarinfo, fileobj=workflow_file)
+
+  def compile(self, pipeline_func, package_path, type_check=False, cache=None,
+              package_format='yaml', deduplicate_templates=False, profiler=None, fuse_ops=False,
+              merge_duplicate_ops=False, targets=None):
     """Compile the given pipeline function into workflow yaml.
 
     Args:
       pipeline_func: pipeline functions with @dsl.pipeline decorator.
       package_path: the output workflow tar.gz file path. for example, "~/a.tar.gz"
       type_check: whether to enable the type check or not, default: False.
+      cache: an optional CompilationCache. On a cache hit the cached package is written to
+          package_path and the compilation is skipped.
+      package_format: the format of the workflow in the package, 'yaml' (default) or 'json'.
+      deduplicate_templates: whether to emit ops that only differ in their argument values as
+          a single template, default: False. The result is reported in
+          self.template_deduplication_stats.
+      profiler: an optional CompilerProfiler recording the time spent in each compiler phase,
+          or a callback function, called as callback(name, seconds, allocated_blocks) at the
+          end of every phase.
+      fuse_ops: whether to run linear chains of python ops on the same image in a single pod,
+          default: False. The result is reported in self.op_fusion_stats.
+      merge_duplicate_ops: whether to run the ops with equal images, commands, arguments and
+          inputs in the same group only once, default: False. The result is reported in
+          self.duplicate_op_stats.
+      targets: an optional list of op names, such as 'train' or 'train 2'. Only the targets,
+          the ops they need and the exit handler are compiled. The result is reported in
+          self.op_pruning_stats.
     """
+    if profiler is not None and not isinstance(profiler, CompilerProfiler):
+      profiler = CompilerProfiler(callback=profiler)
+    cache_key = None
+    if cache is not None:
+      cache_key = cache.get_key(pipeline_func, type_check=type_check,
+                                package_format=package_format,
+                                deduplicate_templates=deduplicate_templates, fuse_ops=fuse_ops,
+                                merge_duplicate_ops=merge_duplicate_ops, targets=targets)
+      if cache.fetch(cache_key, package_path):
+        return
+
     import kfp
     type_check_old_value = kfp.TYPE_CHECK
     try:
       kfp.TYPE_CHECK = type_check
-      workflow = self._compile(pipeline_func)
-      yaml.Dumper.ignore_aliases = lambda *args : True
-      yaml_text = yaml.dump(workflow, default_flow_style=False)
-
-      from contextlib import closing
-      from io import BytesIO
-      with tarfile.open(package_path, "w:gz") as tar:
-        with closing(BytesIO(yaml_text.encode())) as yaml_file:
-          tarinfo = tarfile.TarInfo('pipeline.yaml')
-          tarinfo.size = len(yaml_file.getvalue())
-          tar.addfile(tarinfo, fileobj=yaml_file)
+      if profiler is not None:
+        self._profiler = profiler
+      workflow = self._compile(pipeline_func, deduplicate_templates, fuse_ops, merge_duplicate_ops,
+                               targets)
+      self._write_workflow(workflow, package_path, package_format)
     finally:
       kfp.TYPE_CHECK = type_check_old_value
+      # Fall back to the class level null profiler.
+      self.__dict__.pop('_profiler', None)
+
+    if cache_key is not None:
+      if cache.covers(pipeline_func, self._component_specs):
+        cache.store(cache_key, package_path)
+      else:
+        logging.info('%s uses components which are not part of the cache key. Skipping the '
+                     'compilation cache.', pipeline_func)
@@ -14,6 +14,13 @@
 
 
 import argparse
+from collections import namedtuple
+import concurrent.futures
+import contextlib
+import hashlib
+import importlib
+import importlib.util
+import json
 import kfp.dsl as dsl
 import kfp.compiler
 import os
@@ -21,6 +28,7 @@ import shutil
 import subprocess
 import sys
 import tempfile
+import time
 
 
 def parse_arguments():
@@ -29,29 +37,83 @@ def parse_arguments():
   parser = argparse.ArgumentParser()
   parser.add_argument('--py',
                       type=str,
-                      help='local absolute path to a py file.')
+                      action='append',
+                      help='local absolute path to a py file. Can be repeated to compile several files.')
   parser.add_argument('--package',
                       type=str,
-                      help='local path to a pip installable python package file.')
+                      action='append',
+                      help='local path to a pip installable python package file. '
+                           'Can be repeated to compile several packages.')
+  parser.add_argument('--dir',
+                      type=str,
+                      action='append',
+                      help='local path to a directory. All py files in it are compiled.')
   parser.add_argument('--function',
                       type=str,
                       help='The name of the function to compile if there are multiple.')
   parser.add_argument('--namespace',
                       type=str,
-                      help='The namespace for the pipeline function')
+                      action='append',
+                      help='The namespace for the pipeline function. When several packages are '
+                           'compiled, either give one namespace per package or a single one for all.')
   parser.add_argument('--output',
                       type=str,
                       required=True,
-                      help='local path to the output workflow yaml file.')
+                      help='local path to the output workflow yaml file. In batch mode, the '
+                           'directory the packages are written to.')
+  parser.add_argument('--jobs',
+                      type=int,
+                      default=os.cpu_count(),
+                      help='number of worker processes in batch mode, default is the number of CPUs.')
   parser.add_argument('--type-check',
                       action='store_true',
                       help='enable the type check, default is disabled.')
+  parser.add_argument('--package-format',
+                      type=str,
+                      choices=['yaml', 'json'],
+                      default='yaml',
+                      help='the format of the workflow in the output package, default is yaml.')
+  parser.add_argument('--cache-dir',
+                      type=str,
+                      help='directory of the compilation cache. Unchanged pipelines are not recompiled.')
+  parser.add_argument('--install-cache-dir',
+                      type=str,
+                      help='directory of the package install cache. Unchanged packages are not '
+                           'reinstalled by --package.')
+  parser.add_argument('--install-cache-max-size',
+                      type=float,
+                      help='maximum size of the package install cache in megabytes.')
+  parser.add_argument('--install-cache-max-age',
+                      type=float,
+                      help='number of days a package install is kept in the cache after its last use.')
+  parser.add_argument('--profile',
+                      type=str,
+                      nargs='?',
+                      const='-',
+                      help='print the time spent in each compiler phase, or write it as JSON to '
+                           'the given file path.')
+  parser.add_argument('--deduplicate-templates',
+                      action='store_true',
+                      help='emit ops that only differ in their argument values as a single template.')
+  parser.add_argument('--fuse-ops',
+                      action='store_true',
+                      help='run linear chains of python ops on the same image in a single pod.')
+  parser.add_argument('--merge-duplicate-ops',
+                      action='store_true',
+                      help='run the ops with the same image, command, arguments and inputs only once.')
+  parser.add_argument('--targets',
+                      type=str,
+                      nargs='+',
+                      help='names of the ops to compile, such as "train" or "train 2". Only they, '
+                           'the ops they need and the exit handler are compiled.')
 
   args = parser.parse_args()
   return args
 
 
-def _compile_pipeline_function(function_name, output_path, type_check):
+def _compile_pipeline_function(function_name, output_path, type_check, cache=None, package_format='yaml',
+                               deduplicate_templates=False, profile=None, fuse_ops=False,
+                               merge_duplicate_ops=False, targets=None):
 
   pipeline_funcs = list(dsl.Pipeline.get_pipeline_functions().keys())
   if len(pipeline_funcs) == 0:
@@ -69,40 +131,251 @@ def _compile_pipeline_function(function_name, output_path, type_check):
   else:
     pipeline_func = pipeline_funcs[0]
 
-  kfp.compiler.Compiler().compile(pipeline_func, output_path, type_check)
+  compiler = kfp.compiler.Compiler()
+  profiler = kfp.compiler.CompilerProfiler() if profile else None
+  compiler.compile(pipeline_func, output_path, type_check, cache=cache,
+                   package_format=package_format, deduplicate_templates=deduplicate_templates,
+                   profiler=profiler, fuse_ops=fuse_ops, merge_duplicate_ops=merge_duplicate_ops,
+                   targets=targets)
+  stats = compiler.template_deduplication_stats
+  if stats:
+    print('Template deduplication: %d templates reduced to %d, %d bytes saved.' % stats)
+  if compiler.op_fusion_stats:
+    print('Op fusion: %d tasks reduced to %d in %d fused chain(s).' % compiler.op_fusion_stats)
+  if compiler.duplicate_op_stats:
+    print('Duplicate op merging: %d ops reduced to %d.' % compiler.duplicate_op_stats[:2])
+    for op_name, survivor_name in sorted(compiler.duplicate_op_stats.merged_ops.items()):
+      print('  %s merged into %s' % (op_name, survivor_name))
+  if compiler.op_pruning_stats:
+    print('Target pruning: %d ops reduced to %d.' % compiler.op_pruning_stats)
+  if profile == '-':
+    print(profiler.format_report())
+  elif profile:
+    with open(profile, 'w') as f:
+      json.dump(profiler.to_dict(), f, indent=2)
 
 
-def compile_package(package_path, namespace, function_name, output_path, type_check):
-  tmpdir = tempfile.mkdtemp()
-  sys.path.insert(0, tmpdir)
+@contextlib.contextmanager
+def _installed_package(package_path, install_cache=None):
+  """Makes a package file importable for the duration of the context.
+
+  Without an install cache, the package is installed into a temporary directory which is
+  removed afterwards.
+  """
+  if install_cache:
+    install_dir = install_cache.install(package_path)
+  else:
+    install_dir = tempfile.mkdtemp()
+  sys.path.insert(0, install_dir)
   try:
-    subprocess.check_call(['python3', '-m', 'pip', 'install', package_path, '-t', tmpdir])
-    __import__(namespace)
-    _compile_pipeline_function(function_name, output_path, type_check)
+    if not install_cache:
+      subprocess.check_call(['python3', '-m', 'pip', 'install', package_path, '-t', install_dir])
+    yield install_dir
   finally:
-    del sys.path[0]
-    shutil.rmtree(tmpdir)
+    sys.path.remove(install_dir)
+    if not install_cache:
+      shutil.rmtree(install_dir)
+
+
+def compile_package(package_path, namespace, function_name, output_path, type_check, cache=None,
+                    package_format='yaml', deduplicate_templates=False, install_cache=None,
+                    profile=None, fuse_ops=False, merge_duplicate_ops=False, targets=None):
+  with _installed_package(package_path, install_cache):
+    __import__(namespace)
+    _compile_pipeline_function(function_name, output_path, type_check, cache, package_format,
+                               deduplicate_templates, profile, fuse_ops, merge_duplicate_ops,
+                               targets)
 
 
-def compile_pyfile(pyfile, function_name, output_path, type_check):
+def compile_pyfile(pyfile, function_name, output_path, type_check, cache=None, package_format='yaml',
+                   deduplicate_templates=False, profile=None, fuse_ops=False,
+                   merge_duplicate_ops=False, targets=None):
   sys.path.insert(0, os.path.dirname(pyfile))
   try:
     filename = os.path.basename(pyfile)
     __import__(os.path.splitext(filename)[0])
-    _compile_pipeline_function(function_name, output_path, type_check)
+    _compile_pipeline_function(function_name, output_path, type_check, cache, package_format,
+                               deduplicate_templates, profile, fuse_ops, merge_duplicate_ops,
+                               targets)
+  finally:
+    del sys.path[0]
+
+
+_BatchResult = namedtuple('_BatchResult', 'source function output seconds cached error')
+
+
+def _import_py_source(pyfile):
+  """Imports a py file under a module name derived from its path.
+
+  Distinct files with the same base name, which are common in batch mode, therefore never
+  shadow each other in sys.modules.
+  """
+  module_name = '_kfp_batch_%s_%s' % (
+      os.path.splitext(os.path.basename(pyfile))[0],
+      hashlib.sha256(os.path.abspath(pyfile).encode()).hexdigest()[:12])
+  spec = importlib.util.spec_from_file_location(module_name, pyfile)
+  module = importlib.util.module_from_spec(spec)
+  sys.modules[module_name] = module
+  sys.path.insert(0, os.path.dirname(pyfile))
+  try:
+    spec.loader.exec_module(module)
   finally:
     del sys.path[0]
 
 
+def _forget_modules(namespace):
+  """Worker processes are reused, so a package is forgotten once compiled, for the next
+  package with the same namespace."""
+  for module_name in list(sys.modules):
+    if module_name == namespace or module_name.startswith(namespace + '.'):
+      del sys.modules[module_name]
+
+
+def _compile_batch_source(source, output_dir, type_check, cache_dir, package_format,
+                          deduplicate_templates, install_cache=None, fuse_ops=False,
+                          merge_duplicate_ops=False):
+  """Compiles all pipeline functions of one --py file or --package in a worker process.
+
+  Args:
+    source: a tuple (kind, path, namespace) where kind is 'py' or 'package'.
+
+  Returns:
+    A list of _BatchResult, one per pipeline function.
+  """
+  kind, path, namespace = source
+  known_pipeline_funcs = set(dsl.Pipeline.get_pipeline_functions().keys())
+  cache = kfp.compiler.CompilationCache(cache_dir) if cache_dir else None
+  with contextlib.ExitStack() as stack:
+    try:
+      if kind == 'py':
+        _import_py_source(path)
+        output_prefix = os.path.splitext(os.path.basename(path))[0]
+      else:
+        stack.enter_context(_installed_package(path, install_cache))
+        stack.callback(_forget_modules, namespace)
+        importlib.import_module(namespace)
+        output_prefix = namespace
+      pipeline_funcs = [x for x in dsl.Pipeline.get_pipeline_functions().keys()
+                        if x not in known_pipeline_funcs]
+    except Exception as e:
+      return [_BatchResult(path, None, None, 0, False, '%s: %s' % (type(e).__name__, e))]
+
+    results = []
+    for pipeline_func in pipeline_funcs:
+      output_path = os.path.join(output_dir, '%s.%s.tar.gz' % (output_prefix, pipeline_func.__name__))
+      hits = cache.hits if cache else 0
+      start = time.perf_counter()
+      error = None
+      try:
+        kfp.compiler.Compiler().compile(pipeline_func, output_path, type_check, cache=cache,
+                                        package_format=package_format,
+                                        deduplicate_templates=deduplicate_templates,
+                                        fuse_ops=fuse_ops,
+                                        merge_duplicate_ops=merge_duplicate_ops)
+      except Exception as e:
+        error = '%s: %s' % (type(e).__name__, e)
+      results.append(_BatchResult(path, pipeline_func.__name__, output_path,
+                                  time.perf_counter() - start,
+                                  bool(cache) and cache.hits > hits, error))
+  if not results:
+    results.append(_BatchResult(path, None, None, 0, False, None))
+  return results
+
+
+def _get_batch_sources(args):
+  """Lists the (kind, path, namespace) sources given by --py, --dir and --package."""
+  sources = [('py', os.path.abspath(x), None) for x in args.py or []]
+  for directory in args.dir or []:
+    sources.extend(('py', os.path.abspath(os.path.join(directory, x)), None)
+                   for x in sorted(os.listdir(directory))
+                   if x.endswith('.py') and x != '__init__.py')
+  packages = args.package or []
+  namespaces = args.namespace or []
+  if packages:
+    if len(namespaces) == 1:
+      namespaces = namespaces * len(packages)
+    if len(namespaces) != len(packages):
+      raise ValueError('Either give one --namespace for all packages or one per --package.')
+    sources.extend(('package', x, namespace) for x, namespace in zip(packages, namespaces))
+  return sources
+
+
+def compile_batch(sources, output_dir, type_check, cache_dir=None, package_format='yaml',
+                  deduplicate_templates=False, jobs=None, install_cache=None, fuse_ops=False,
+                  merge_duplicate_ops=False):
+  """Compiles every pipeline function of the sources across a pool of processes.
+
+  One package per pipeline function is written to output_dir, named
+  <module or namespace>.<function name>.tar.gz. Each worker imports kfp once and is reused
+  for many sources.
+
+  Returns:
+    The list of _BatchResult of all sources.
+  """
+  os.makedirs(output_dir, exist_ok=True)
+  with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+    futures = [executor.submit(_compile_batch_source, source, output_dir, type_check, cache_dir,
+                               package_format, deduplicate_templates, install_cache, fuse_ops,
+                               merge_duplicate_ops)
+               for source in sources]
+    return [result for future in futures for result in future.result()]
+
+
+def _print_batch_summary(results, seconds, jobs):
+  compiled = [x for x in results if x.function and not x.error]
+  print('%12s %8s  %s' % ('seconds', 'cached', 'pipeline'))
+  for result in sorted(compiled, key=lambda x: x.seconds, reverse=True):
+    print('%12.3f %8s  %s:%s -> %s' % (result.seconds, 'yes' if result.cached else 'no',
+                                       result.source, result.function, result.output))
+  for result in results:
+    if result.error:
+      print('FAILED %s%s: %s' % (result.source, ':' + result.function if result.function else '',
+                                 result.error))
+    elif not result.function:
+      print('No pipeline function in %s.' % result.source)
+  print('Compiled %d pipeline(s) in %.3f seconds with %d job(s).' % (len(compiled), seconds, jobs))
+
+
 def main():
   args = parse_arguments()
-  if ((args.py is None and args.package is None) or
-      (args.py is not None and args.package is not None)):
+  cache = kfp.compiler.CompilationCache(args.cache_dir) if args.cache_dir else None
+  install_cache = None
+  if args.install_cache_dir:
+    install_cache = kfp.compiler.PackageInstallCache(
+        args.install_cache_dir,
+        max_size_bytes=int(args.install_cache_max_size * (1 << 20)) if args.install_cache_max_size else None,
+        max_age_seconds=args.install_cache_max_age * 24 * 3600 if args.install_cache_max_age else None)
+  num_inputs = len(args.py or []) + len(args.package or [])
+  if args.dir or num_inputs > 1:
+    if args.profile:
+      raise ValueError('--profile is not supported when compiling several pipelines.')
+    if args.targets:
+      raise ValueError('--targets is not supported when compiling several pipelines.')
+    sources = _get_batch_sources(args)
+    start = time.perf_counter()
+    results = compile_batch(sources, args.output, args.type_check, args.cache_dir,
+                            args.package_format, args.deduplicate_templates, args.jobs, install_cache,
+                            args.fuse_ops, args.merge_duplicate_ops)
+    _print_batch_summary(results, time.perf_counter() - start, args.jobs)
+    failures = [x for x in results if x.error]
+    if failures:
+      raise RuntimeError('%d pipeline(s) failed to compile.' % len(failures))
+    return
+
+  if num_inputs != 1:
     raise ValueError('Either --py or --package is needed but not both.')
   if args.py:
-    compile_pyfile(args.py, args.function, args.output, args.type_check)
+    compile_pyfile(args.py[0], args.function, args.output, args.type_check, cache, args.package_format,
+                   args.deduplicate_templates, args.profile, args.fuse_ops, args.merge_duplicate_ops,
+                   args.targets)
   else:
     if args.namespace is None:
       raise ValueError('--namespace is required for compiling packages.')
-    compile_package(args.package, args.namespace, args.function, args.output, args.type_check)
-  
+    compile_package(args.package[0], args.namespace[0], args.function, args.output, args.type_check,
+                    cache, args.package_format, args.deduplicate_templates, install_cache,
+                    args.profile, args.fuse_ops, args.merge_duplicate_ops, args.targets)
+  if cache:
+    print('Compilation cache: %d hit(s), %d miss(es).' % (cache.hits, cache.misses))
+  if install_cache:
+    print('Package install cache: %d hit(s), %d miss(es).' % (install_cache.hits, install_cache.misses))
+
@@ -26,7 +26,7 @@ from ._yaml_utils import load_yaml
 from ._structures import ComponentSpec
 from ._structures import *
 from kfp.dsl import PipelineParam
-from kfp.dsl._types import InconsistentTypeException, check_types
+from kfp.dsl._types import InconsistentTypeException, find_type_mismatch
 import kfp
 
 _default_component_name = 'Component'
@@ -219,9 +219,10 @@ def _create_task_factory_from_component_spec(component_spec:ComponentSpec, compo
             if isinstance(arguments[key], PipelineParam):
                 if kfp.TYPE_CHECK:
                     for input_spec in component_spec.inputs:
-                        if input_spec.name == key:
-                            if arguments[key].param_type is not None and not check_types(arguments[key].param_type.to_dict_or_str(), '' if input_spec.type is None else input_spec.type):
-                                raise InconsistentTypeException('Component "' + name + '" is expecting ' + key + ' to be type(' + str(input_spec.type) + '), but the passed argument is type(' + arguments[key].param_type.serialize() + ')')
+                        if input_spec.name == key and arguments[key].param_type is not None:
+                            mismatch = find_type_mismatch(arguments[key].param_type, '' if input_spec.type is None else input_spec.type)
+                            if mismatch is not None:
+                                raise InconsistentTypeException('Component "' + name + '" is expecting ' + key + ' to be type(' + str(input_spec.type) + '), but the passed argument is type(' + arguments[key].param_type.serialize() + ')', mismatch)
                 arguments[key] = str(arguments[key])
 
         task = TaskSpec(
@@ -240,10 +241,12 @@ def _create_task_factory_from_component_spec(component_spec:ComponentSpec, compo
     input_parameters  = [_dynamic.KwParameter(input_name_to_pythonic[port.name], annotation=(_try_get_object_by_name(str(port.type)) if port.type else inspect.Parameter.empty), default=port.default if port.default is not None else (None if port.optional else inspect.Parameter.empty)) for port in reordered_input_list]
     factory_function_parameters = input_parameters #Outputs are no longer part of the task factory function signature. The paths are always generated by the system.
     
-    return _dynamic.create_function_from_parameters(
+    task_factory = _dynamic.create_function_from_parameters(
         create_task_from_component_and_arguments,        
         factory_function_parameters,
         documentation='\n'.join(func_docstring_lines),
         func_name=name,
         func_filename=component_filename
     )
+    task_factory.component_spec = component_spec #Used by the compilation cache to detect component changes.
+    return task_factory
@@ -15,7 +15,9 @@
 from collections import OrderedDict
 from typing import Mapping
 from ._structures import ConcatPlaceholder, IfPlaceholder, InputValuePlaceholder, InputPathPlaceholder, IsPresentPlaceholder, OutputPathPlaceholder, TaskSpec
-from ._components import _generate_output_file_name, _default_component_name
+from ._components import _generate_input_file_name, _generate_output_file_name, _default_component_name
+from kfp.dsl._container_op import InputArgumentPath
+from kfp.dsl._pipeline_param import _extract_pipelineparams, _split_serialized_pipelineparams
 from kfp.dsl._metadata import ComponentMeta, ParameterMeta, TypeMeta, _annotation_to_typemeta
 
 def create_container_op_from_task(task_spec: TaskSpec):
@@ -29,6 +31,7 @@ def create_container_op_from_task(task_spec: TaskSpec):
     container_spec = component_spec.implementation.container
 
     output_paths = OrderedDict() #Preserving the order to make the kubernetes output names deterministic
+    artifact_argument_paths = []
     unconfigurable_output_paths = container_spec.file_outputs or {}
     for output in component_spec.outputs or []:
         if output.name in unconfigurable_output_paths:
@@ -57,8 +60,13 @@ def create_container_op_from_task(task_spec: TaskSpec):
             input_name = arg.input_name
             input_value = argument_values.get(input_name, None)
             if input_value is not None:
-                raise ValueError('ContainerOp does not support input artifacts - input {}'.format(input_name))
-                #return input_value
+                input_path = _generate_input_file_name(input_name)
+                #The task factory serialized the PipelineParam arguments. Resolving them back so that the op gets the artifact and depends on its producer.
+                segments = _split_serialized_pipelineparams(input_value) if isinstance(input_value, str) else []
+                if len(segments) == 1 and segments[0][1] is not None:
+                    input_value = _extract_pipelineparams(input_value)[0]
+                artifact_argument_paths.append(InputArgumentPath(input_value, input=input_name, path=input_path))
+                return input_path
             else:
                 input_spec = inputs_dict[input_name]
                 if input_spec.optional:
@@ -126,12 +134,13 @@ def create_container_op_from_task(task_spec: TaskSpec):
         output_paths=output_paths,
         env=container_spec.env,
         component_spec=component_spec,
+        artifact_argument_paths=artifact_argument_paths,
     )
 
 
 _dummy_pipeline=None
 
-def _create_container_op_from_resolved_task(name:str, container_image:str, command=None, arguments=None, output_paths=None, env : Mapping[str, str]=None, component_spec=None):
+def _create_container_op_from_resolved_task(name:str, container_image:str, command=None, arguments=None, output_paths=None, env : Mapping[str, str]=None, component_spec=None, artifact_argument_paths=None):
     from .. import dsl
     global _dummy_pipeline
     need_dummy = dsl.Pipeline._default_pipeline is None
@@ -162,9 +171,11 @@ def _create_container_op_from_resolved_task(name:str, container_image:str, comma
         command=command,
         arguments=arguments,
         file_outputs=output_paths_for_container_op,
+        artifact_argument_paths=artifact_argument_paths,
     )
 
     task._set_metadata(component_meta)
+    task._component_spec = component_spec
 
     if env:
         from kubernetes import client as k8s_client
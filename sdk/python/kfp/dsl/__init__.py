@@ -15,7 +15,8 @@
 
 from ._pipeline_param import PipelineParam
 from ._pipeline import Pipeline, pipeline, get_pipeline_conf
-from ._container_op import ContainerOp
-from ._ops_group import OpsGroup, ExitHandler, Condition
+from ._container_op import ContainerOp, InputArgumentPath
+from ._ops_group import OpsGroup, ExitHandler, Condition, ParallelFor
 from ._component import python_component
+from ._step_cache import StepCacheStore, LocalDirectoryCacheStore
 #TODO: expose the component decorator when ready
\ No newline at end of file
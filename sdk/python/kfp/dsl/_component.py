@@ -14,7 +14,7 @@
 
 from ._metadata import ComponentMeta, ParameterMeta, TypeMeta, _annotation_to_typemeta
 from ._pipeline_param import PipelineParam
-from ._types import check_types, InconsistentTypeException
+from ._types import find_type_mismatch, InconsistentTypeException
 import kfp
 
 def python_component(name, description=None, base_image=None, target_component_file: str = None):
@@ -99,19 +99,24 @@ def component(func):
     if kfp.TYPE_CHECK:
       arg_index = 0
       for arg in args:
-        if isinstance(arg, PipelineParam) and not check_types(arg.param_type.to_dict_or_str(), component_meta.inputs[arg_index].param_type.to_dict_or_str()):
-          raise InconsistentTypeException('Component "' + component_meta.name + '" is expecting ' + component_meta.inputs[arg_index].name +
-                                          ' to be type(' + component_meta.inputs[arg_index].param_type.serialize() +
-                                          '), but the passed argument is type(' + arg.param_type.serialize() + ')')
+        if isinstance(arg, PipelineParam):
+          mismatch = find_type_mismatch(arg.param_type, component_meta.inputs[arg_index].param_type)
+          if mismatch is not None:
+            raise InconsistentTypeException('Component "' + component_meta.name + '" is expecting ' + component_meta.inputs[arg_index].name +
+                                            ' to be type(' + component_meta.inputs[arg_index].param_type.serialize() +
+                                            '), but the passed argument is type(' + arg.param_type.serialize() + ')', mismatch)
         arg_index += 1
       if kargs is not None:
         for key in kargs:
           if isinstance(kargs[key], PipelineParam):
             for input_spec in component_meta.inputs:
-              if input_spec.name == key and not check_types(kargs[key].param_type.to_dict_or_str(), input_spec.param_type.to_dict_or_str()):
+              if input_spec.name != key:
+                continue
+              mismatch = find_type_mismatch(kargs[key].param_type, input_spec.param_type)
+              if mismatch is not None:
                 raise InconsistentTypeException('Component "' + component_meta.name + '" is expecting ' + input_spec.name +
                                                 ' to be type(' + input_spec.param_type.serialize() +
-                                                '), but the passed argument is type(' + kargs[key].param_type.serialize() + ')')
+                                                '), but the passed argument is type(' + kargs[key].param_type.serialize() + ')', mismatch)
 
     container_op = func(*args, **kargs)
     container_op._set_metadata(component_meta)
@@ -18,13 +18,83 @@ from . import _pipeline_param
 from ._pipeline_param import _extract_pipelineparams
 from ._metadata import ComponentMeta
 import re
-from typing import Dict
+from typing import Dict, List, Union
+
+
+_RETRY_POLICIES = ['Always', 'OnFailure', 'OnError']
+
+_ARTIFACT_COMPRESSIONS = ['gzip', 'none']
+
+
+def _validate_seconds(seconds, param_name):
+  """Validates a number of seconds. Argo only handles whole seconds, so fractions are rejected
+  rather than truncated, e.g. to '0s'."""
+  if not isinstance(seconds, int) or isinstance(seconds, bool):
+    raise ValueError('Invalid {}. Should be integer.'.format(param_name))
+  if seconds < 1:
+    raise ValueError('{} must be positive integer.'.format(param_name))
+
+
+def _duration_to_string(duration, param_name='duration'):
+  """Converts a duration in seconds to an argo duration string such as '30s'. Strings, such
+  as '2m', are kept as they are."""
+  if duration is None or isinstance(duration, str):
+    return duration
+  _validate_seconds(duration, param_name)
+  return '%ds' % duration
+
+
+def _validate_retry_policy(policy):
+  if policy is not None and policy not in _RETRY_POLICIES:
+    raise ValueError('Invalid retry policy %s. Must be one of %s.' % (policy, _RETRY_POLICIES))
+
+
+def _validate_artifact_compression(compression):
+  if compression is not None and compression not in _ARTIFACT_COMPRESSIONS:
+    raise ValueError('Invalid artifact compression %s. Must be one of %s.' %
+                     (compression, _ARTIFACT_COMPRESSIONS))
+
+
+class InputArgumentPath(object):
+  """Passes an argument to a ContainerOp as a local file instead of a command line value.
+
+  When the argument is the output of another op, the file is passed as an argo artifact
+  stored in the artifact repository, so large data does not go through the workflow status.
+  Other arguments, such as pipeline parameters and constants, are written to the file by argo.
+  Example usage:
+  ```python
+  producer = dsl.ContainerOp(name='producer', image='image', command=['produce', '/tmp/data'],
+                             output_artifact_paths={'data': '/tmp/data'})
+  dsl.ContainerOp(name='consumer', image='image', command=['consume', '/tmp/inputs/data'],
+                  artifact_argument_paths=[
+                      dsl.InputArgumentPath(producer.outputs['data'], path='/tmp/inputs/data')])
+  ```
+  """
+
+  def __init__(self, argument, input: str=None, path: str=None):
+    """Create a new instance of InputArgumentPath.
+
+    Args:
+      argument: the PipelineParam or constant value to pass.
+      input: the name of the input. Defaults to the name of the PipelineParam.
+      path: the local file path the argument is passed at. Defaults to /tmp/inputs/<input>/data.
+    """
+    if input is None:
+      if not isinstance(argument, _pipeline_param.PipelineParam):
+        raise ValueError('The input name is required for constant arguments.')
+      input = argument.name
+    self.argument = argument
+    self.input = input
+    self.path = path or '/tmp/inputs/%s/data' % input
+
 
 class ContainerOp(object):
   """Represents an op implemented by a docker container image."""
 
   def __init__(self, name: str, image: str, command: str=None, arguments: str=None,
-               file_outputs : Dict[str, str]=None, is_exit_handler=False):
+               file_outputs : Dict[str, str]=None, is_exit_handler=False,
+               output_artifact_paths : Dict[str, str]=None,
+               artifact_argument_paths : List[InputArgumentPath]=None):
     """Create a new instance of ContainerOp.
 
     Args:
@@ -40,6 +110,10 @@ class ContainerOp(object):
           the value of a PipelineParam is saved to its corresponding local file. It's
           one way for outside world to receive outputs of the container.
       is_exit_handler: Whether it is used as an exit handler.
+      output_artifact_paths: Maps output labels to local file or directory paths, which are
+          passed to the downstream ops as argo artifacts stored in the artifact repository,
+          instead of output parameter values.
+      artifact_argument_paths: List of InputArgumentPath, the arguments passed as local files.
     """
 
     if not _pipeline.Pipeline.get_default_pipeline():
@@ -58,27 +132,63 @@ class ContainerOp(object):
     self.resource_limits = {}
     self.resource_requests = {}
     self.node_selector = {}
+    self.affinity = None
+    self.tolerations = []
+    self.priority_class_name = None
     self.volumes = []
     self.volume_mounts = []
     self.env_variables = []
+    # Lists of tuples (V1Container, mirror_volume_mounts).
+    self.init_containers = []
+    self.sidecars = []
     self.pod_annotations = {}
     self.pod_labels = {}
     self.num_retries = 0
+    self.retry_policy = None
+    self.backoff_duration = None
+    self.backoff_factor = None
+    self.backoff_max_duration = None
+    self.timeout = None
+    # None means the pipeline level default of PipelineConf applies.
+    self.produces_ui_metadata = None
+    self.produces_metrics = None
+    self.cache_store = None
+    self.cache_ttl_seconds = None
+    # None means the pipeline level default of PipelineConf applies.
+    self.artifact_compression = None
     self._metadata = None
+    # The ComponentSpec the op was created from by kfp.components, if any.
+    self._component_spec = None
+    # The placeholder registry of the pipeline, which resolves the params serialized in the
+    # command and the arguments.
+    self._placeholders = _pipeline.Pipeline.get_default_pipeline().placeholders
 
-    self.argument_inputs = _extract_pipelineparams([str(arg) for arg in (command or []) + (arguments or [])])
+    self.argument_inputs = _extract_pipelineparams([str(arg) for arg in (command or []) + (arguments or [])],
+                                                   self._placeholders)
 
     self.file_outputs = file_outputs
+    self.output_artifact_paths = output_artifact_paths or {}
+    self.artifact_arguments = artifact_argument_paths or []
     self.dependent_op_names = []
 
     self.inputs = []
     if self.argument_inputs:
       self.inputs += self.argument_inputs
-
+    for argument in self.artifact_arguments:
+      if isinstance(argument.argument, _pipeline_param.PipelineParam):
+        self.inputs.append(argument.argument)
+    pipeline = _pipeline.Pipeline.get_default_pipeline()
+    for param in self.inputs:
+      if param.op_name:
+        pipeline.add_dependency(param.op_name, self.name)
+
+    overlapping_outputs = set(self.file_outputs or {}) & set(self.output_artifact_paths)
+    if overlapping_outputs:
+      raise ValueError('Outputs %s are both file outputs and output artifacts.' %
+                       sorted(overlapping_outputs))
     self.outputs = {}
-    if self.file_outputs:
-      self.outputs = {name: _pipeline_param.PipelineParam(name, op_name=self.name)
-                      for name in file_outputs.keys()}
+    for name in list((self.file_outputs or {}).keys()) + list(self.output_artifact_paths.keys()):
+      self.outputs[name] = _pipeline_param.PipelineParam(name, op_name=self.name)
 
     self.output=None
     if len(self.outputs) == 1:
@@ -102,6 +212,9 @@ class ContainerOp(object):
   def after(self, op):
     """Specify explicit dependency on another op."""
     self.dependent_op_names.append(op.name)
+    pipeline = _pipeline.Pipeline.get_default_pipeline()
+    if pipeline:
+      pipeline.add_dependency(op.name, self.name)
     return self
 
   def _validate_memory_string(self, memory_string):
@@ -250,6 +363,35 @@ class ContainerOp(object):
     self.env_variables.append(env_variable)
     return self
 
+  def add_init_container(self, container, mirror_volume_mounts: bool=False):
+    """Adds an init container, which runs to completion before the op's container starts,
+    e.g. to prefetch data into a volume shared with the op's container.
+
+    Args:
+      container: Kubernetes container
+      For detailed spec, check container definition
+      https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1Container.md
+      mirror_volume_mounts: whether the init container gets the volume mounts of the op's
+          container, so that they share e.g. an emptyDir volume added with add_volume.
+    """
+
+    self.init_containers.append((container, mirror_volume_mounts))
+    return self
+
+  def add_sidecar(self, container, mirror_volume_mounts: bool=False):
+    """Adds a sidecar container, which runs alongside the op's container, e.g. to serve a
+    cache. Sidecars are stopped when the op's container exits.
+
+    Args:
+      container: Kubernetes container
+      For detailed spec, check container definition
+      https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1Container.md
+      mirror_volume_mounts: whether the sidecar gets the volume mounts of the op's container.
+    """
+
+    self.sidecars.append((container, mirror_volume_mounts))
+    return self
+
   def add_node_selector_constraint(self, label_name, value):
     """Add a constraint for nodeSelector. Each constraint is a key-value pair label. For the 
     container to be eligible to run on a node, the node must have each of the constraints appeared
@@ -263,6 +405,41 @@ class ContainerOp(object):
     self.node_selector[label_name] = value
     return self
 
+  def add_affinity(self, affinity):
+    """Sets the affinity of the op's pod, e.g. to co-locate it with data or to spread pods
+    across nodes.
+
+    Args:
+      affinity: Kubernetes affinity
+      For detailed spec, check affinity definition
+      https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1Affinity.md
+    """
+
+    self.affinity = affinity
+    return self
+
+  def add_toleration(self, toleration):
+    """Adds a toleration to the op's pod, e.g. to run it on preemptible nodes.
+
+    Args:
+      toleration: Kubernetes toleration
+      For detailed spec, check toleration definition
+      https://github.com/kubernetes-client/python/blob/master/kubernetes/docs/V1Toleration.md
+    """
+
+    self.tolerations.append(toleration)
+    return self
+
+  def set_priority_class(self, priority_class_name: str):
+    """Sets the priority class of the op's pod.
+
+    Args:
+      priority_class_name: The name of a Kubernetes PriorityClass.
+    """
+
+    self.priority_class_name = priority_class_name
+    return self
+
   def add_pod_annotation(self, name: str, value: str):
     """Adds a pod's metadata annotation.
 
@@ -285,14 +462,104 @@ class ContainerOp(object):
     self.pod_labels[name] = value
     return self
 
-  def set_retry(self, num_retries: int):
+  def set_retry(self, num_retries: int, policy: str=None,
+                backoff_duration: Union[int, str]=None, backoff_factor: int=None,
+                backoff_max_duration: Union[int, str]=None):
     """Sets the number of times the task is retried until it's declared failed.
 
     Args:
       num_retries: Number of times to retry on failures.
+      policy: Which errors are retried. 'Always', 'OnFailure' (the container failed) or
+          'OnError' (argo or Kubernetes failed to run the container). Defaults to argo's
+          default, 'OnFailure'.
+      backoff_duration: The time before the first retry, in seconds or as a duration
+          string such as '2m'. Retries run right away by default.
+      backoff_factor: The factor the time before the next retry is multiplied by after
+          each retry.
+      backoff_max_duration: The maximum time, since the first attempt started, after
+          which the task is not retried anymore.
     """
 
+    _validate_retry_policy(policy)
     self.num_retries = num_retries
+    self.retry_policy = policy
+    self.backoff_duration = _duration_to_string(backoff_duration, 'backoff_duration')
+    self.backoff_factor = backoff_factor
+    self.backoff_max_duration = _duration_to_string(backoff_max_duration, 'backoff_max_duration')
+    return self
+
+  def set_timeout(self, seconds: int):
+    """Sets the timeout of the op. The op fails when it runs longer.
+
+    Args:
+      seconds: Number of seconds the op's pod is allowed to run.
+    """
+
+    _validate_seconds(seconds, 'timeout')
+    self.timeout = seconds
+    return self
+
+  def set_conventional_artifacts(self, ui_metadata: bool=None, metrics: bool=None):
+    """Declares whether the op produces the mlpipeline-ui-metadata and mlpipeline-metrics
+    output artifacts. The op skips the upload of the artifacts it does not produce.
+
+    Args:
+      ui_metadata: whether the op writes /mlpipeline-ui-metadata.json. If None, the pipeline
+          level default applies.
+      metrics: whether the op writes /mlpipeline-metrics.json. If None, the pipeline level
+          default applies.
+    """
+
+    self.produces_ui_metadata = ui_metadata
+    self.produces_metrics = metrics
+    return self
+
+  def set_caching(self, cache_store, ttl_seconds: int=None):
+    """Enables the caching of the results of the op.
+
+    Before running its command, the op computes a cache key from its image, its resolved
+    command and arguments, which include the values of the upstream outputs it consumes,
+    the contents of its input artifact files and its file outputs. If the store holds a fresh
+    entry for the key, the file outputs are restored from it and the command is skipped.
+    Otherwise the command runs and its file outputs are saved to the store. Pin the image by
+    digest so that the key changes with the image content. The container image needs sh, find
+    and sha256sum.
+
+    Args:
+      cache_store: a StepCacheStore, e.g. LocalDirectoryCacheStore.
+      ttl_seconds: the time an entry stays fresh after it is saved. If None, entries never
+          become stale.
+
+    Raises:
+      ValueError if the op has no explicit command, or if ttl_seconds is not a positive integer.
+    """
+
+    if not self.command:
+      raise ValueError('Caching requires the command of the op to be set explicitly.')
+    if ttl_seconds is not None:
+      # The TTL is written into the shell wrapper of the command, which only handles integers.
+      if not isinstance(ttl_seconds, int) or isinstance(ttl_seconds, bool):
+        raise ValueError('Invalid ttl_seconds. Should be integer.')
+      self._validate_positive_number(ttl_seconds, 'ttl_seconds')
+    if self.cache_store is None or self.cache_store.volume.name != cache_store.volume.name:
+      from kubernetes import client as k8s_client
+      self.add_volume(cache_store.volume)
+      self.add_volume_mount(k8s_client.V1VolumeMount(name=cache_store.volume.name,
+                                                     mount_path=cache_store.mount_path))
+    self.cache_store = cache_store
+    self.cache_ttl_seconds = ttl_seconds
+    return self
+
+  def set_artifact_compression(self, compression: str):
+    """Set the compression of the output artifacts of this op.
+
+    Args:
+      compression: 'gzip' stores the artifacts as tar.gz archives, which is the argo default.
+          'none' stores them as they are, e.g. for data that is already compressed.
+          Defaults to the compression of the PipelineConf.
+    """
+    _validate_artifact_compression(compression)
+    self.artifact_compression = compression
     return self
 
   def __repr__(self):
@@ -307,8 +574,8 @@ class ContainerOp(object):
     if not isinstance(metadata, ComponentMeta):
       raise ValueError('_set_medata is expecting ComponentMeta.')
     self._metadata = metadata
-    if self.file_outputs:
-      for output in self.file_outputs.keys():
+    if self.outputs:
+      for output in self.outputs.keys():
         output_type = self.outputs[output].param_type
         for output_meta in self._metadata.outputs:
           if output_meta.name == output:
@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import functools
+from types import MappingProxyType
 from typing import Dict, List
 from abc import ABCMeta, abstractmethod
-from ._types import BaseType, _check_valid_type_dict, _instance_to_dict
+from ._types import BaseType, _check_valid_type_dict, _freeze, _instance_to_dict, _thaw
 
 class BaseMeta(object):
   __metaclass__ = ABCMeta
@@ -33,17 +35,38 @@ class BaseMeta(object):
     return self.__dict__ == other.__dict__
 
 class TypeMeta(BaseMeta):
+  '''TypeMeta describes a type by its name and properties.
+
+  TypeMeta instances are immutable and hashable. The properties are a read-only copy of the
+  properties passed to the constructor.
+  '''
   def __init__(self,
       name: str = '',
       properties: Dict = None):
-    self.name = name
-    self.properties = {} if properties is None else properties
+    self._name = name
+    self._frozen_properties = _freeze({} if properties is None else properties)
+
+  @property
+  def name(self):
+    return self._name
+
+  @property
+  def properties(self):
+    return MappingProxyType(_thaw(self._frozen_properties))
+
+  def __eq__(self, other):
+    return (isinstance(other, TypeMeta) and self._name == other._name and
+            self._frozen_properties == other._frozen_properties)
+
+  def __hash__(self):
+    return hash((self._name, self._frozen_properties))
 
   def to_dict_or_str(self):
-    if self.properties is None or len(self.properties) == 0:
-      return self.name
+    properties = _thaw(self._frozen_properties)
+    if len(properties) == 0:
+      return self._name
     else:
-      return {self.name: self.properties}
+      return {self._name: properties}
 
   @staticmethod
   def from_dict_or_str(payload):
@@ -52,24 +75,36 @@ class TypeMeta(BaseMeta):
        payload (str/dict): the payload could be a str or a dict
     '''
 
-    type_meta = TypeMeta()
     if isinstance(payload, dict):
       if not _check_valid_type_dict(payload):
         raise ValueError(payload + ' is not a valid type string')
-      type_meta.name, type_meta.properties = list(payload.items())[0]
+      name, properties = list(payload.items())[0]
       # Convert possible OrderedDict to dict
-      type_meta.properties = dict(type_meta.properties)
+      return TypeMeta(name, dict(properties))
     elif isinstance(payload, str):
-      type_meta.name = payload
+      return TypeMeta(payload)
     else:
       raise ValueError('from_dict_or_str is expecting either dict or str.')
-    return type_meta
 
   def serialize(self):
     return str(self.to_dict_or_str())
 
   @staticmethod
   def deserialize(payload):
+    '''deserialize returns the TypeMeta of a payload
+     The payloads of the most recent calls are memoized, so deserializing the same payload again
+     returns the same immutable TypeMeta.
+     Args:
+       payload (str/dict): a serialized TypeMeta, a type name or a type dict
+    '''
+    try:
+      return _deserialize_frozen(_freeze(payload))
+    except TypeError:
+      # Unhashable property values are not memoized.
+      return TypeMeta._parse(payload)
+
+  @staticmethod
+  def _parse(payload):
     # If the payload is a string of a dict serialization, convert it back to a dict
     try:
       import ast
@@ -78,6 +113,11 @@ class TypeMeta(BaseMeta):
       pass
     return TypeMeta.from_dict_or_str(payload)
 
+@functools.lru_cache(maxsize=4096)
+def _deserialize_frozen(frozen_payload):
+  '''_deserialize_frozen returns the TypeMeta of a payload frozen by _freeze'''
+  return TypeMeta._parse(_thaw(frozen_payload))
+
 class ParameterMeta(BaseMeta):
   def __init__(self,
       name: str,
@@ -15,6 +15,7 @@
 
 from . import _container_op
 from . import _pipeline
+from ._pipeline_param import PipelineParam
 
 
 class OpsGroup(object):
@@ -34,6 +35,7 @@ class OpsGroup(object):
     self.ops = list()
     self.groups = list()
     self.name = name
+    self.parallelism = None
 
   def __enter__(self):
     if not _pipeline.Pipeline.get_default_pipeline():
@@ -50,6 +52,23 @@ class OpsGroup(object):
   def __exit__(self, *args):
     _pipeline.Pipeline.get_default_pipeline().pop_ops_group()
 
+  def set_parallelism(self, parallelism: int):
+    """Limits the number of pods of the group running at the same time.
+
+    Example usage:
+    ```python
+    with Condition(param1=='pizza').set_parallelism(2):
+      op1 = ContainerOp(...)
+    ```
+
+    Args:
+      parallelism: the maximum number of pods of the group running at the same time.
+    """
+    if parallelism < 1:
+      raise ValueError('parallelism must be a positive number.')
+    self.parallelism = parallelism
+    return self
+
 
 class ExitHandler(OpsGroup):
   """Represents an exit handler that is invoked upon exiting a group of ops.
@@ -99,3 +118,73 @@ class Condition(OpsGroup):
     """
     super(Condition, self).__init__('condition')
     self.condition = condition
+
+
+class LoopArguments(PipelineParam):
+  """Represents the item of a ParallelFor loop.
+
+  When the items are dicts, their fields are accessed as attributes, each field being a
+  PipelineParam of its own. This class is not supposed to be constructed by pipeline authors.
+  """
+
+  def __init__(self, name: str):
+    super(LoopArguments, self).__init__(name)
+    # Key is the field name, value is the PipelineParam of the field.
+    self._fields = {}
+
+  def __getattr__(self, field):
+    # Only called for attributes that are not found, i.e. for item fields.
+    if field.startswith('_'):
+      raise AttributeError(field)
+    if field not in self._fields:
+      self._fields[field] = PipelineParam('%s-subvar-%s' % (self.name, field))
+    return self._fields[field]
+
+
+class ParallelFor(OpsGroup):
+  """Represents a loop running its ops once per item, in parallel.
+
+  The items are either a static list, or a PipelineParam holding a JSON list at run time,
+  such as the output of an upstream op. The loop compiles to a single DAG task with argo
+  withItems or withParam respectively.
+
+  Example usage:
+  ```python
+  with ParallelFor([{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}], parallelism=10) as item:
+    op1 = ContainerOp(..., arguments=['--a', item.a, '--b', item.b])
+    op2 = ContainerOp(...)
+
+  with ParallelFor(list_op.output) as item:
+    op3 = ContainerOp(..., arguments=['echo %s' % item])
+  ```
+  """
+
+  def __init__(self, loop_args, parallelism: int=None):
+    """Create a new instance of ParallelFor.
+    Args:
+      loop_args: a list of items (strings, numbers or dicts), or a PipelineParam whose
+          value is a JSON list at run time.
+      parallelism: the maximum number of iterations running at the same time. Unlimited
+          by default.
+
+    Raises:
+      ValueError if loop_args is neither a list nor a PipelineParam, or if parallelism is
+      not a positive number.
+    """
+    super(ParallelFor, self).__init__('loop')
+    if isinstance(loop_args, PipelineParam):
+      self.items = None
+      self.items_param = loop_args
+    elif isinstance(loop_args, (list, tuple)):
+      self.items = list(loop_args)
+      self.items_param = None
+    else:
+      raise ValueError('ParallelFor expects a list or a PipelineParam, got %s.' % type(loop_args))
+    if parallelism is not None:
+      self.set_parallelism(parallelism)
+    self.loop_args = None
+
+  def __enter__(self):
+    super(ParallelFor, self).__enter__()
+    self.loop_args = LoopArguments(self.name + '-item')
+    return self.loop_args
@@ -14,9 +14,12 @@
 
 
 from . import _container_op
+from ._container_op import (_duration_to_string, _validate_artifact_compression,
+                            _validate_retry_policy, _validate_seconds)
 from ._metadata import  PipelineMeta, ParameterMeta, TypeMeta, _annotation_to_typemeta
 from . import _ops_group
-from ..components._naming import _make_name_unique_by_adding_index
+from ._pipeline_param import _PlaceholderRegistry
+from collections import defaultdict
 import sys
 
 
@@ -69,6 +72,21 @@ class PipelineConf():
   """
   def __init__(self):
     self.image_pull_secrets = []
+    self.affinity = None
+    self.tolerations = []
+    self.priority_class_name = None
+    self.parallelism = None
+    self.timeout = None
+    self.default_timeout = None
+    self.default_num_retries = 0
+    self.default_retry_policy = None
+    self.default_backoff_duration = None
+    self.default_backoff_factor = None
+    self.default_backoff_max_duration = None
+    self.artifact_repository_ref = None
+    self.produces_ui_metadata = True
+    self.produces_metrics = True
+    self.artifact_compression = None
 
   def set_image_pull_secrets(self, image_pull_secrets):
     """ configure the pipeline level imagepullsecret
@@ -80,6 +98,117 @@ class PipelineConf():
     """
     self.image_pull_secrets = image_pull_secrets
 
+  def set_affinity(self, affinity):
+    """ configure the default affinity of the pods of the pipeline
+
+    Ops override it with ContainerOp.add_affinity.
+
+    Args:
+      affinity: Kubernetes V1Affinity
+    """
+    self.affinity = affinity
+
+  def add_toleration(self, toleration):
+    """ add a default toleration to the pods of the pipeline
+
+    Args:
+      toleration: Kubernetes V1Toleration
+    """
+    self.tolerations.append(toleration)
+
+  def set_priority_class(self, priority_class_name: str):
+    """ configure the default priority class of the pods of the pipeline
+
+    Ops override it with ContainerOp.set_priority_class.
+
+    Args:
+      priority_class_name: the name of a Kubernetes PriorityClass.
+    """
+    self.priority_class_name = priority_class_name
+
+  def set_parallelism(self, max_num_pods: int):
+    """ configure the maximum number of pods of the pipeline running at the same time
+
+    Args:
+      max_num_pods: the maximum number of pods running at the same time.
+    """
+    if max_num_pods < 1:
+      raise ValueError('Pipeline parallelism must be a positive number.')
+    self.parallelism = max_num_pods
+
+  def set_timeout(self, seconds: int):
+    """ configure the timeout of the whole pipeline run
+
+    Args:
+      seconds: the number of seconds the run is allowed to run.
+    """
+    _validate_seconds(seconds, 'timeout')
+    self.timeout = seconds
+
+  def set_default_timeout(self, seconds: int):
+    """ configure the timeout of the ops that do not set one with ContainerOp.set_timeout
+
+    Args:
+      seconds: the number of seconds the pod of an op is allowed to run.
+    """
+    _validate_seconds(seconds, 'default timeout')
+    self.default_timeout = seconds
+
+  def set_default_retry(self, num_retries: int, policy: str=None, backoff_duration=None,
+                        backoff_factor: int=None, backoff_max_duration=None):
+    """ configure the retries of the ops that do not set them with ContainerOp.set_retry
+
+    See ContainerOp.set_retry for the arguments.
+    """
+    _validate_retry_policy(policy)
+    self.default_num_retries = num_retries
+    self.default_retry_policy = policy
+    self.default_backoff_duration = _duration_to_string(backoff_duration, 'backoff_duration')
+    self.default_backoff_factor = backoff_factor
+    self.default_backoff_max_duration = _duration_to_string(backoff_max_duration,
+                                                            'backoff_max_duration')
+
+  def set_artifact_repository_ref(self, config_map: str, key: str=None):
+    """ configure the workflow level artifact repository
+
+    The output artifacts of the ops are then stored in the referenced artifact repository,
+    instead of carrying an inline minio configuration each.
+
+    Args:
+      config_map: the name of the config map holding the artifact repository configuration.
+      key: the key of the configuration in the config map. If None, argo uses its default key.
+    """
+    self.artifact_repository_ref = {'configMap': config_map}
+    if key:
+      self.artifact_repository_ref['key'] = key
+
+  def set_conventional_artifacts(self, ui_metadata: bool=True, metrics: bool=True):
+    """ configure whether the ops produce the mlpipeline-ui-metadata and mlpipeline-metrics
+    output artifacts by default
+
+    Ops that do not produce an artifact skip its upload when the pod exits. Single ops can
+    override the default with ContainerOp.set_conventional_artifacts.
+
+    Args:
+      ui_metadata: whether the ops write /mlpipeline-ui-metadata.json.
+      metrics: whether the ops write /mlpipeline-metrics.json.
+    """
+    self.produces_ui_metadata = ui_metadata
+    self.produces_metrics = metrics
+
+  def set_artifact_compression(self, compression: str):
+    """ configure the default compression of the output artifacts of the ops
+
+    Single ops can override the default with ContainerOp.set_artifact_compression.
+
+    Args:
+      compression: 'gzip' stores the artifacts as tar.gz archives, which is the argo default.
+          'none' stores them as they are, which saves the compression time of data that is
+          already compressed.
+    """
+    _validate_artifact_compression(compression)
+    self.artifact_compression = compression
+
 def get_pipeline_conf():
   """Configure the pipeline level setting to the current pipeline
     Note: call the function inside the user defined pipeline function.
@@ -132,21 +261,33 @@ class Pipeline():
     """
     self.name = name
     self.ops = {}
+    # Key is the human name of ops, value is the next index to try when the name is taken.
+    self._name_indices = {}
+    # Key is op name, value is the innermost OpsGroup the op was added to. Exit handler ops
+    # are only defined, so they have no group.
+    self.op_groups = {}
+    # Key is op name, value is the set of names of the ops it consumes outputs from or runs
+    # after, and vice versa.
+    self.upstream_ops = defaultdict(set)
+    self.downstream_ops = defaultdict(set)
     # Add the root group.
     self.groups = [_ops_group.OpsGroup('pipeline', name=name)]
     self.group_id = 0
     self.conf = PipelineConf()
     self._metadata = None
+    self.placeholders = _PlaceholderRegistry()
 
   def __enter__(self):
     if Pipeline._default_pipeline:
       raise Exception('Nested pipelines are not allowed.')
 
     Pipeline._default_pipeline = self
+    _PlaceholderRegistry.active = self.placeholders
     return self
 
   def __exit__(self, *args):
     Pipeline._default_pipeline = None
+    _PlaceholderRegistry.active = None
         
   def add_op(self, op: _container_op.ContainerOp, define_only: bool):
     """Add a new operator.
@@ -159,14 +300,42 @@ class Pipeline():
     """
 
     #If there is an existing op with this name then generate a new name.
-    op_name = _make_name_unique_by_adding_index(op.human_name, list(self.ops.keys()), ' ')
+    #Ops are never removed, so the indices below the next index are all taken.
+    op_name = op.human_name
+    if op_name in self.ops:
+      index = self._name_indices.get(op.human_name, 2)
+      op_name = '%s %d' % (op.human_name, index)
+      while op_name in self.ops:
+        index += 1
+        op_name = '%s %d' % (op.human_name, index)
+      self._name_indices[op.human_name] = index + 1
 
     self.ops[op_name] = op
     if not define_only:
       self.groups[-1].ops.append(op)
+      self.op_groups[op_name] = self.groups[-1]
 
     return op_name
 
+  def add_dependency(self, upstream_op_name: str, downstream_op_name: str):
+    """Records that an op consumes an output of another op or runs after it."""
+    self.upstream_ops[downstream_op_name].add(upstream_op_name)
+    self.downstream_ops[upstream_op_name].add(downstream_op_name)
+
+  def _rename_ops(self, new_names):
+    """Renames the ops in the indexes of the pipeline.
+
+    Args:
+      new_names: dict of the old op names to the new ones.
+    """
+    self.ops = {new_names.get(name, name): op for name, op in self.ops.items()}
+    self.op_groups = {new_names.get(name, name): group for name, group in self.op_groups.items()}
+    for edges in [self.upstream_ops, self.downstream_ops]:
+      renamed = {new_names.get(name, name): set(new_names.get(x, x) for x in names)
+                 for name, names in edges.items()}
+      edges.clear()
+      edges.update(renamed)
+
   def push_ops_group(self, group: _ops_group.OpsGroup):
     """Push an OpsGroup into the stack.
 
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 
+import itertools
 import re
 from collections import namedtuple
 from ._metadata import TypeMeta
@@ -23,42 +24,148 @@ from ._metadata import TypeMeta
 ConditionOperator = namedtuple('ConditionOperator', 'operator operand1 operand2')
 PipelineParamTuple = namedtuple('PipelineParamTuple', 'name op value type')
 
-def _match_serialized_pipelineparam(payload: str):
+# Matches the interned placeholders, {{pipelineparam:#<id>}}, as well as both the typed and the
+# legacy untyped serialization of PipelineParam.
+_SERIALIZED_PIPELINEPARAM_PATTERN = re.compile(
+    r'{{pipelineparam:(?:#(\d+)|op=([\w\s_-]*);name=([\w\s_-]+);value=(.*?)(?:;type=(.*?);)?)}}')
+
+# The ids are unique across pipelines, so a placeholder never resolves to a param of another
+# pipeline.
+_placeholder_ids = itertools.count()
+
+
+class _PlaceholderRegistry(object):
+  """Interns the PipelineParams serialized in a pipeline as short placeholders.
+
+  A placeholder only holds an id, so extracting the PipelineParams from command lines is a
+  dictionary lookup instead of parsing their names, values and types. The placeholders are
+  resolved with the registry of their pipeline, which every ContainerOp keeps.
+  """
+
+  # The registry of the pipeline being defined, set by Pipeline.__enter__.
+  active = None
+
+  def __init__(self):
+    # Key is (op_name, name, repr(value), type), value is the placeholder. The value is a list
+    # or a dict for the params of dsl.ParallelFor, which are not hashable.
+    self._placeholders = {}
+    # Key is the placeholder id, value is the interned PipelineParam.
+    self._params = {}
+
+  def intern(self, param):
+    """Returns the placeholder of a PipelineParam."""
+    key = (param.op_name, param.name, repr(param.value), param.param_type)
+    placeholder = self._placeholders.get(key)
+    if placeholder is None:
+      param_id = next(_placeholder_ids)
+      # A copy, just like the legacy serialization, so later changes of param do not leak.
+      interned = PipelineParam(param.name, param.op_name, param.value, param.param_type)
+      self._params[param_id] = interned
+      placeholder = '{{pipelineparam:#%d}}' % param_id
+      self._placeholders[key] = placeholder
+    return placeholder
+
+  def get(self, param_id):
+    """Returns the interned PipelineParam of a placeholder id, or None if it is unknown."""
+    return self._params.get(param_id)
+
+  def __len__(self):
+    return len(self._params)
+
+  def __repr__(self):
+    return '<_PlaceholderRegistry of %d params>' % len(self._params)
+
+
+def _match_to_param_tuple(match, placeholders):
+  """Converts a pattern match to a PipelineParamTuple. The type of an interned param is its
+  TypeMeta instead of the serialized type. Returns None for placeholders unknown to the
+  placeholders registry."""
+  if match.group(1) is not None:
+    param = placeholders.get(int(match.group(1))) if placeholders is not None else None
+    if param is None:
+      return None
+    return PipelineParamTuple(name=param.name, op=param.op_name or '', value=param.value or '',
+                              type=param.param_type)
+  return PipelineParamTuple(name=match.group(3), op=match.group(2), value=match.group(4),
+                            type=match.group(5) or '')
+
+def _match_serialized_pipelineparam(payload: str, placeholders: _PlaceholderRegistry=None):
   """_match_serialized_pipelineparam matches the serialized pipelineparam.
   Args:
     payloads (str): a string that contains the serialized pipelineparam.
+    placeholders (_PlaceholderRegistry): the registry of the pipeline of the payload, see
+      _split_serialized_pipelineparams.
 
   Returns:
     PipelineParamTuple
   """
-  matches = re.findall(r'{{pipelineparam:op=([\w\s_-]*);name=([\w\s_-]+);value=(.*?);type=(.*?);}}', payload)
-  if len(matches) == 0:
-    matches = re.findall(r'{{pipelineparam:op=([\w\s_-]*);name=([\w\s_-]+);value=(.*?)}}', payload)
-  param_tuples = []
-  for match in matches:
-    if len(match) == 3:
-      param_tuples.append(PipelineParamTuple(name=match[1], op=match[0], value=match[2], type=''))
-    elif len(match) == 4:
-      param_tuples.append(PipelineParamTuple(name=match[1], op=match[0], value=match[2], type=match[3]))
-  return param_tuples
-
-def _extract_pipelineparams(payloads: str or list[str]):
+  return [segment for _, segment in _split_serialized_pipelineparams(payload, placeholders)
+          if segment is not None]
+
+def _split_serialized_pipelineparams(payload: str, placeholders: _PlaceholderRegistry=None):
+  """_split_serialized_pipelineparams tokenizes a string into literal and placeholder segments.
+  Args:
+    payload (str): a string that may contain serialized pipelineparams.
+    placeholders (_PlaceholderRegistry): the registry of the pipeline of the payload, which
+      resolves its interned placeholders. Defaults to the registry of the pipeline being
+      defined. Unknown interned placeholders are left as literal text.
+
+  Returns:
+    List of (text, PipelineParamTuple) tuples in the order they appear in the payload. For
+    literal segments the PipelineParamTuple is None. Joining all texts gives back the payload.
+  """
+  if '{{pipelineparam:' not in payload:
+    return [(payload, None)]
+  if placeholders is None:
+    placeholders = _PlaceholderRegistry.active
+  segments = []
+  literal_start = 0
+  for match in _SERIALIZED_PIPELINEPARAM_PATTERN.finditer(payload):
+    param_tuple = _match_to_param_tuple(match, placeholders)
+    if param_tuple is None:
+      continue
+    if match.start() > literal_start:
+      segments.append((payload[literal_start:match.start()], None))
+    segments.append((match.group(0), param_tuple))
+    literal_start = match.end()
+  if literal_start < len(payload):
+    segments.append((payload[literal_start:], None))
+  return segments
+
+def _extract_pipelineparams(payloads: str or list[str], placeholders: _PlaceholderRegistry=None):
   """_extract_pipelineparam extract a list of PipelineParam instances from the payload string.
-  Note: this function removes all duplicate matches.
+  Note: this function removes all duplicate matches. The PipelineParams are new instances, so
+  the callers may modify them.
 
   Args:
     payload (str or list[str]): a string/a list of strings that contains serialized pipelineparams
+    placeholders (_PlaceholderRegistry): the registry of the pipeline of the payloads, see
+      _split_serialized_pipelineparams.
   Return:
     List[PipelineParam]
   """
   if isinstance(payloads, str):
     payloads = [payloads]
-  param_tuples = []
-  for payload in payloads:
-    param_tuples += _match_serialized_pipelineparam(payload)
+  if placeholders is None:
+    placeholders = _PlaceholderRegistry.active
   pipeline_params = []
-  for param_tuple in list(set(param_tuples)):
-    pipeline_params.append(PipelineParam(param_tuple.name, param_tuple.op, param_tuple.value, TypeMeta.deserialize(param_tuple.type)))
+  seen = set()
+  for payload in payloads:
+    if '{{pipelineparam:' not in payload:
+      continue
+    for match in _SERIALIZED_PIPELINEPARAM_PATTERN.finditer(payload):
+      if match.group(1) is not None:
+        # Interned placeholders resolve to a copy of the interned PipelineParam.
+        param_id = int(match.group(1))
+        param = placeholders.get(param_id) if placeholders is not None else None
+        if param_id not in seen and param is not None:
+          seen.add(param_id)
+          pipeline_params.append(PipelineParam(param.name, param.op_name, param.value, param.param_type))
+        continue
+      param_tuple = _match_to_param_tuple(match, None)
+      if param_tuple not in seen:
+        seen.add(param_tuple)
+        pipeline_params.append(PipelineParam(param_tuple.name, param_tuple.op, param_tuple.value, TypeMeta.deserialize(param_tuple.type)))
   return pipeline_params
 
 class PipelineParam(object):
@@ -103,7 +210,11 @@ class PipelineParam(object):
     with other strings such as arguments. For example, we can support:
     ['echo %s' % param] as the container command and later a compiler can replace
     the placeholder "{{pipelineparam:op=%s;name=%s}}" with its own parameter identifier.
+    While a pipeline is being defined, the placeholder is interned in the pipeline as
+    "{{pipelineparam:#<id>}}".
     """
+    if _PlaceholderRegistry.active is not None:
+      return _PlaceholderRegistry.active.intern(self)
 
     #This is deleted because if users specify default values to PipelineParam,
     # The compiler can not detect it as the value is not NULL.
@@ -0,0 +1,64 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class StepCacheStore(object):
+  """Represents the storage of the step result cache.
+
+  The store is a volume mounted into the containers of the cached ops. Every cache entry is a
+  directory named after the cache key, holding the file outputs of one op run. Any volume
+  shared by the pods of the pipeline runs, such as a persistent volume claim, can back the
+  store.
+
+  Example usage:
+  ```python
+  store = StepCacheStore(k8s_client.V1Volume(
+      name='step-cache',
+      persistent_volume_claim=k8s_client.V1PersistentVolumeClaimVolumeSource(claim_name='cache')))
+  op.set_caching(store, ttl_seconds=24 * 3600)
+  ```
+  """
+
+  def __init__(self, volume, mount_path: str='/kfp-step-cache'):
+    """Create a new instance of StepCacheStore.
+
+    Args:
+      volume: the Kubernetes V1Volume holding the cache entries.
+      mount_path: the path the volume is mounted at in the containers.
+    """
+    self.volume = volume
+    self.mount_path = mount_path
+
+
+class LocalDirectoryCacheStore(StepCacheStore):
+  """Step cache store in a directory of the node the pods run on.
+
+  The entries are only shared between the pods scheduled on the same node, so this store is
+  meant for testing, e.g. on a single node cluster.
+  """
+
+  def __init__(self, path: str, mount_path: str='/kfp-step-cache'):
+    """Create a new instance of LocalDirectoryCacheStore.
+
+    Args:
+      path: the directory of the node holding the cache entries. It is created if missing.
+      mount_path: the path the directory is mounted at in the containers.
+    """
+    from kubernetes import client as k8s_client
+    super(LocalDirectoryCacheStore, self).__init__(
+        k8s_client.V1Volume(
+            name='kfp-step-cache',
+            host_path=k8s_client.V1HostPathVolumeSource(path=path, type='DirectoryOrCreate')),
+        mount_path)
+    self.path = path
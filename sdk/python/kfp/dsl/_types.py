@@ -12,6 +12,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from collections import namedtuple
+import functools
+
 class BaseType:
 	'''MetaType is a base type for all scalar and artifact types.
 	'''
@@ -79,27 +82,109 @@ class LocalPath(BaseType):
 		"type": "string"
 	}
 
+class TypeMismatch(namedtuple('TypeMismatch', 'reason type_name property_name checked_value expected_value')):
+	'''TypeMismatch describes why a type is not consistent with an expected type.
+	reason is one of TypeMismatch.TYPE_NAME, TypeMismatch.MISSING_PROPERTY and TypeMismatch.PROPERTY_VALUE.
+	For TYPE_NAME, checked_value and expected_value are the two type names.
+	'''
+	TYPE_NAME = 'type_name'
+	MISSING_PROPERTY = 'missing_property'
+	PROPERTY_VALUE = 'property_value'
+
+	def __str__(self):
+		if self.reason == TypeMismatch.TYPE_NAME:
+			return 'type name ' + str(self.checked_value) + ' is different from expected: ' + str(self.expected_value)
+		if self.reason == TypeMismatch.MISSING_PROPERTY:
+			return str(self.type_name) + ' has a property ' + str(self.property_name) + ' that the latter does not.'
+		return (str(self.type_name) + ' has a property ' + str(self.property_name) + ' with value: ' +
+						str(self.checked_value) + ' and ' + str(self.expected_value))
+
 class InconsistentTypeException(Exception):
 	'''InconsistencyTypeException is raised when two types are not consistent'''
-	pass
+	def __init__(self, message, mismatch: TypeMismatch = None):
+		if mismatch is not None:
+			message += ': ' + str(mismatch)
+		super(InconsistentTypeException, self).__init__(message)
+		self.mismatch = mismatch
 
 def check_types(checked_type, expected_type):
 	'''check_types checks the type consistency.
 	For each of the attribute in checked_type, there is the same attribute in expected_type with the same value.
 	However, expected_type could contain more attributes that checked_type does not contain.
 	Args:
-		checked_type (BaseType/str/dict): it describes a type from the upstream component output
-		expected_type (BaseType/str/dict): it describes a type from the downstream component input
+		checked_type (BaseType/str/dict/TypeMeta): it describes a type from the upstream component output
+		expected_type (BaseType/str/dict/TypeMeta): it describes a type from the downstream component input
 		'''
-	if isinstance(checked_type, BaseType):
-		checked_type = _instance_to_dict(checked_type)
-	elif isinstance(checked_type, str):
-		checked_type = {checked_type: {}}
-	if isinstance(expected_type, BaseType):
-		expected_type = _instance_to_dict(expected_type)
-	elif isinstance(expected_type, str):
-		expected_type = {expected_type: {}}
-	return _check_dict_types(checked_type, expected_type)
+	return find_type_mismatch(checked_type, expected_type) is None
+
+def find_type_mismatch(checked_type, expected_type):
+	'''find_type_mismatch checks the type consistency like check_types, and describes the inconsistency.
+	The results of the most recent checks are memoized, so checking the same pair of types again is a lookup.
+	Args:
+		checked_type (BaseType/str/dict/TypeMeta): it describes a type from the upstream component output
+		expected_type (BaseType/str/dict/TypeMeta): it describes a type from the downstream component input
+	Returns:
+		TypeMismatch, or None if the types are consistent
+	'''
+	try:
+		key = (_type_key(checked_type), _type_key(expected_type))
+		hash(key)
+	except TypeError:
+		# Unhashable property values are not memoized.
+		return _find_dict_type_mismatch(_type_to_dict(checked_type), _type_to_dict(expected_type))
+	return _find_type_key_mismatch(*key)
+
+@functools.lru_cache(maxsize=4096)
+def _find_type_key_mismatch(checked_key, expected_key):
+	'''_find_type_key_mismatch is the memoized find_type_mismatch of two _type_key'''
+	return _find_dict_type_mismatch(_type_key_to_dict(checked_key), _type_key_to_dict(expected_key))
+
+def _freeze(value):
+	'''_freeze converts a value to a hashable one, tagged with its type so that, e.g., lists and tuples differ'''
+	if isinstance(value, dict):
+		return (dict, frozenset((k, _freeze(v)) for k, v in value.items()))
+	if isinstance(value, (list, tuple)):
+		return (type(value), tuple(_freeze(v) for v in value))
+	return (type(value), value)
+
+def _thaw(frozen):
+	'''_thaw converts a value frozen by _freeze back to a new value equal to the original one'''
+	value_type, value = frozen
+	if value_type is dict:
+		return {k: _thaw(v) for k, v in value}
+	if value_type in (list, tuple):
+		return value_type(_thaw(v) for v in value)
+	return value
+
+def _type_key(type_):
+	'''_type_key returns a hashable key of a type, equal for the types which check the same way'''
+	if hasattr(type_, 'to_dict_or_str'):
+		# TypeMeta
+		return (type_.name, type_._frozen_properties)
+	if isinstance(type_, str):
+		return (type_, _freeze({}))
+	if isinstance(type_, BaseType):
+		return (type(type_).__name__, _freeze(type_.__dict__))
+	if not isinstance(type_, dict) or len(type_) != 1:
+		# Malformed types are not memoized, so they are checked the way they always were.
+		raise TypeError('Unexpected type ' + str(type_))
+	(type_name, properties), = type_.items()
+	return (type_name, _freeze(properties))
+
+def _type_key_to_dict(key):
+	'''_type_key_to_dict converts a _type_key back to the dict serialization of the type'''
+	type_name, properties = key
+	return {type_name: _thaw(properties)}
+
+def _type_to_dict(type_):
+	'''_type_to_dict normalizes a type to its dict serialization'''
+	if hasattr(type_, 'to_dict_or_str'):
+		type_ = type_.to_dict_or_str()
+	if isinstance(type_, BaseType):
+		return _instance_to_dict(type_)
+	if isinstance(type_, str):
+		return {type_: {}}
+	return type_
 
 def _check_valid_type_dict(payload):
 	'''_check_valid_type_dict checks whether a dict is a correct serialization of a type
@@ -128,28 +213,27 @@ def _instance_to_dict(instance):
 	'''
 	return {type(instance).__name__: instance.__dict__}
 
-def _check_dict_types(checked_type, expected_type):
-	'''_check_dict_types checks the type consistency.
+def _find_dict_type_mismatch(checked_type, expected_type):
+	'''_find_dict_type_mismatch checks the type consistency.
 	Args:
   	checked_type (dict): A dict that describes a type from the upstream component output
   	expected_type (dict): A dict that describes a type from the downstream component input
+	Returns:
+		TypeMismatch, or None if the types are consistent
 	'''
 	checked_type_name,_ = list(checked_type.items())[0]
 	expected_type_name,_ = list(expected_type.items())[0]
 	if checked_type_name == '' or expected_type_name == '':
 		# If the type name is empty, it matches any types
-		return True
+		return None
 	if checked_type_name != expected_type_name:
-		print('type name ' + str(checked_type_name) + ' is different from expected: ' + str(expected_type_name))
-		return False
+		return TypeMismatch(TypeMismatch.TYPE_NAME, checked_type_name, None, checked_type_name, expected_type_name)
 	type_name = checked_type_name
 	for type_property in checked_type[type_name]:
 		if type_property not in expected_type[type_name]:
-			print(type_name + ' has a property ' + str(type_property) + ' that the latter does not.')
-			return False
+			return TypeMismatch(TypeMismatch.MISSING_PROPERTY, type_name, type_property,
+													checked_type[type_name][type_property], None)
 		if checked_type[type_name][type_property] != expected_type[type_name][type_property]:
-			print(type_name + ' has a property ' + str(type_property) + ' with value: ' +
-						str(checked_type[type_name][type_property]) + ' and ' +
-						str(expected_type[type_name][type_property]))
-			return False
-	return True
+			return TypeMismatch(TypeMismatch.PROPERTY_VALUE, type_name, type_property,
+													checked_type[type_name][type_property], expected_type[type_name][type_property])
+	return None
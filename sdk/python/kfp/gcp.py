@@ -85,3 +85,47 @@ def use_tpu(tpu_cores: int, tpu_resource: str, tf_version: str):
         return task
 
     return _set_tpu_spec
+
+def prefetch_gcs(gcs_path: str, local_path: str='/prefetch', volume_name: str='gcs-prefetch', image: str='google/cloud-sdk:alpine'):
+    """An operator that downloads GCS data with an init container before the op's container starts.
+
+    The data is staged in an emptyDir volume mounted at local_path in the op's container, while
+    the op's image is pulled. Apply it after use_gcp_secret so that the init container uses the
+    same credentials.
+    Usage:
+        train = train_op(...)
+        train.apply(use_gcp_secret('user-gcp-sa')).apply(prefetch_gcs('gs://my-bucket/data', '/data'))
+
+    Args:
+      gcs_path: Required. The GCS object or directory to download, e.g. gs://my-bucket/data.
+      local_path: The directory the data is downloaded into.
+      volume_name: The name of the emptyDir volume holding the data.
+      image: The image of the init container. It needs gsutil and gcloud.
+    """
+
+    def _prefetch_gcs(task):
+        from kubernetes import client as k8s_client
+        import shlex
+        script = ('if [ -n "$GOOGLE_APPLICATION_CREDENTIALS" ]; then '
+                  'gcloud auth activate-service-account --key-file="$GOOGLE_APPLICATION_CREDENTIALS"; fi; '
+                  'gsutil -m cp -r {} {}'.format(shlex.quote(gcs_path), shlex.quote(local_path)))
+        return (
+            task
+                .add_volume(
+                    k8s_client.V1Volume(name=volume_name, empty_dir=k8s_client.V1EmptyDirVolumeSource())
+                )
+                .add_volume_mount(
+                    k8s_client.V1VolumeMount(name=volume_name, mount_path=local_path)
+                )
+                .add_init_container(
+                    k8s_client.V1Container(
+                        name=volume_name,
+                        image=image,
+                        command=['sh', '-c', script],
+                        env=list(task.env_variables),
+                    ),
+                    mirror_volume_mounts=True,
+                )
+        )
+
+    return _prefetch_gcs
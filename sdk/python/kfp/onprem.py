@@ -20,3 +20,56 @@ def mount_pvc(pvc_name='pipeline-claim', volume_name='pipeline', volume_mount_pa
                 )
         )
     return _mount_pvc
+
+def prefetch_s3(s3_path: str, local_path: str='/prefetch', endpoint_url: str=None, secret_name: str=None,
+                access_key_key: str='accesskey', secret_key_key: str='secretkey', recursive: bool=True,
+                volume_name: str='s3-prefetch', image: str='amazon/aws-cli'):
+    """
+        Modifier function to apply to a Container Op to download S3 data with an init container
+        before the op's container starts. The data is staged in an emptyDir volume mounted at
+        local_path, while the op's image is pulled.
+        Usage:
+            train = train_op(...)
+            train.apply(prefetch_s3('s3://my-bucket/data', '/data',
+                                    endpoint_url='http://minio-service.kubeflow:9000',
+                                    secret_name='mlpipeline-minio-artifact'))
+
+        Args:
+          s3_path: Required. The S3 object or prefix to download, e.g. s3://my-bucket/data.
+          local_path: The directory the data is downloaded into.
+          endpoint_url: The S3 endpoint, e.g. of a minio service. Defaults to AWS S3.
+          secret_name: The name of the secret holding the access key and the secret key.
+          access_key_key: The key of the access key in the secret.
+          secret_key_key: The key of the secret key in the secret.
+          recursive: Whether s3_path is a prefix to download recursively, or a single object.
+          volume_name: The name of the emptyDir volume holding the data.
+          image: The image of the init container. It needs the aws cli.
+    """
+    def _prefetch_s3(task):
+        from kubernetes import client as k8s_client
+        command = ['aws', 's3', 'cp', s3_path, local_path.rstrip('/') + '/']
+        if recursive:
+            command.append('--recursive')
+        if endpoint_url:
+            command += ['--endpoint-url', endpoint_url]
+        env = []
+        if secret_name:
+            for env_name, key in [('AWS_ACCESS_KEY_ID', access_key_key), ('AWS_SECRET_ACCESS_KEY', secret_key_key)]:
+                env.append(k8s_client.V1EnvVar(
+                    name=env_name,
+                    value_from=k8s_client.V1EnvVarSource(
+                        secret_key_ref=k8s_client.V1SecretKeySelector(name=secret_name, key=key))))
+        return (
+            task
+                .add_volume(
+                    k8s_client.V1Volume(name=volume_name, empty_dir=k8s_client.V1EmptyDirVolumeSource())
+                )
+                .add_volume_mount(
+                    k8s_client.V1VolumeMount(mount_path=local_path, name=volume_name)
+                )
+                .add_init_container(
+                    k8s_client.V1Container(name=volume_name, image=image, command=command, env=env or None),
+                    mirror_volume_mounts=True,
+                )
+        )
+    return _prefetch_s3
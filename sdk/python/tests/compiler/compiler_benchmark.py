@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Compiler scaling benchmark.
+
+Compiles synthetic pipelines of increasing size and prints the compile time per size.
+Usage:
+  python3 compiler_benchmark.py [--sizes 100 1000 10000]
+"""
+
+
+import argparse
+import time
+
+import kfp.compiler as compiler
+import kfp.dsl as dsl
+
+
+def make_synthetic_pipeline(num_ops, group_size=50):
+  """Creates a pipeline function with num_ops ops.
+
+  The ops are split into condition groups of group_size ops. Inside a group each op consumes
+  the output of the previous op, and the first op of every group consumes the output of the
+  first op of the previous group, so that values cross group boundaries.
+  """
+
+  @dsl.pipeline(name='synthetic %d' % num_ops, description='Synthetic benchmark pipeline.')
+  def synthetic_pipeline(flag='go'):
+    group_head = None
+    for group_start in range(0, num_ops, group_size):
+      with dsl.Condition(flag == 'go'):
+        previous = group_head
+        for i in range(group_start, min(group_start + group_size, num_ops)):
+          arguments = ['echo %s' % previous.output] if previous is not None else ['echo start']
+          op = dsl.ContainerOp(
+              name='step-%d' % i,
+              image='alpine:3.9',
+              command=['sh', '-c'],
+              arguments=arguments + ['> /tmp/out.txt'],
+              file_outputs={'out': '/tmp/out.txt'})
+          if i == group_start:
+            group_head = op
+          previous = op
+
+  return synthetic_pipeline
+
+
+def benchmark(sizes):
+  results = []
+  for size in sizes:
+    pipeline_func = make_synthetic_pipeline(size)
+    start = time.perf_counter()
+    compiler.Compiler()._compile(pipeline_func)
+    results.append((size, time.perf_counter() - start))
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                      help='numbers of ops of the synthetic pipelines.')
+  args = parser.parse_args()
+  print('%10s %12s %14s' % ('ops', 'seconds', 'ms per op'))
+  for size, seconds in benchmark(args.sizes):
+    print('%10d %12.3f %14.3f' % (size, seconds, seconds * 1000 / size))
+
+
+if __name__ == '__main__':
+  main()
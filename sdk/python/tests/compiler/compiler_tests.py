@@ -196,6 +196,43 @@ class TestCompiler(unittest.TestCase):
       shutil.rmtree(tmpdir)
       os.chdir(cwd)
 
+  def test_package_compile_with_install_cache(self):
+    """Test that compiling an unchanged package twice installs it once."""
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    test_package_dir = os.path.join(test_data_dir, 'testpackage')
+    tmpdir = tempfile.mkdtemp()
+    cwd = os.getcwd()
+    try:
+      os.chdir(test_package_dir)
+      subprocess.check_call(['python3', 'setup.py', 'sdist', '--format=gztar', '-d', tmpdir])
+      package_path = os.path.join(tmpdir, 'testsample-0.1.tar.gz')
+      install_cache = compiler.PackageInstallCache(os.path.join(tmpdir, 'cache'))
+      install_dir = install_cache.install(package_path)
+      self.assertTrue(os.path.isdir(os.path.join(install_dir, 'mypipeline')))
+      self.assertEqual(install_dir, install_cache.install(package_path))
+      self.assertEqual((1, 1), (install_cache.hits, install_cache.misses))
+
+      # An expired entry is evicted.
+      os.utime(install_dir, (0, 0))
+      install_cache.max_age_seconds = 3600
+      install_cache.evict()
+      self.assertFalse(os.path.exists(install_dir))
+
+      output = subprocess.check_output([
+          'dsl-compile', '--package', package_path, '--namespace', 'mypipeline',
+          '--output', os.path.join(tmpdir, 'compose.tar.gz'),
+          '--function', 'download_save_most_frequent_word',
+          '--install-cache-dir', install_cache.cache_dir]).decode()
+      self.assertIn('Package install cache: 0 hit(s), 1 miss(es).', output)
+      self.assertTrue(os.path.isdir(install_dir))
+      with open(os.path.join(test_data_dir, 'compose.yaml'), 'r') as f:
+        golden = yaml.load(f)
+      self.assertEqual(golden, self._get_yaml_from_tar(os.path.join(tmpdir, 'compose.tar.gz')))
+    finally:
+      shutil.rmtree(tmpdir)
+      os.chdir(cwd)
+
   def _test_py_compile(self, file_base_name):
     test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
     py_file = os.path.join(test_data_dir, file_base_name + '.py')
@@ -213,6 +250,42 @@ class TestCompiler(unittest.TestCase):
     finally:
       shutil.rmtree(tmpdir)
 
+  def test_py_compile_batch(self):
+    """Test compiling several py files in one dsl-compile invocation."""
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    tmpdir = tempfile.mkdtemp()
+    try:
+      subprocess.check_call([
+          'dsl-compile', '--py', os.path.join(test_data_dir, 'basic.py'),
+          '--py', os.path.join(test_data_dir, 'coin.py'), '--output', tmpdir, '--jobs', '2'])
+      self.assertEqual(['basic.save_most_frequent_word.tar.gz', 'coin.flipcoin.tar.gz'],
+                       sorted(os.listdir(tmpdir)))
+      for file_base_name, package_name in [('basic', 'basic.save_most_frequent_word.tar.gz'),
+                                           ('coin', 'coin.flipcoin.tar.gz')]:
+        with open(os.path.join(test_data_dir, file_base_name + '.yaml'), 'r') as f:
+          golden = yaml.load(f)
+        compiled = self._get_yaml_from_tar(os.path.join(tmpdir, package_name))
+
+        self.maxDiff = None
+        self.assertEqual(golden, compiled)
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_py_compile_targets(self):
+    """Test compiling only the ops needed by the --targets."""
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    tmpdir = tempfile.mkdtemp()
+    try:
+      target_tar = os.path.join(tmpdir, 'coin.tar.gz')
+      subprocess.check_call([
+          'dsl-compile', '--py', os.path.join(test_data_dir, 'coin.py'), '--output', target_tar,
+          '--targets', 'flip-again'])
+      compiled = self._get_yaml_from_tar(target_tar)
+      self.assertEqual({'pipeline-flip-coin', 'condition-1', 'flip', 'flip-again'},
+                       set(t['name'] for t in compiled['spec']['templates']))
+    finally:
+      shutil.rmtree(tmpdir)
+
   def test_py_compile_basic(self):
     """Test basic sequential pipeline."""
     self._test_py_compile('basic')
@@ -316,3 +389,775 @@ class TestCompiler(unittest.TestCase):
       task2 = op().after(task1)
     
     compiler.Compiler()._compile(pipeline)
+
+  def test_compilation_cache(self):
+    """Test that unchanged pipelines are served from the compilation cache."""
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    sys.path.append(test_data_dir)
+    import basic
+    tmpdir = tempfile.mkdtemp()
+    try:
+      cache = compiler.CompilationCache(os.path.join(tmpdir, 'cache'))
+      first_package_path = os.path.join(tmpdir, 'first.tar.gz')
+      compiler.Compiler().compile(basic.save_most_frequent_word, first_package_path, cache=cache)
+      self.assertEqual((0, 1), (cache.hits, cache.misses))
+
+      second_package_path = os.path.join(tmpdir, 'second.tar.gz')
+      compiler.Compiler().compile(basic.save_most_frequent_word, second_package_path, cache=cache)
+      self.assertEqual((1, 1), (cache.hits, cache.misses))
+      self.assertEqual(self._get_yaml_from_tar(first_package_path),
+                       self._get_yaml_from_tar(second_package_path))
+
+      # A different type_check flag is a different cache entry.
+      compiler.Compiler().compile(basic.save_most_frequent_word, second_package_path,
+                                  type_check=True, cache=cache)
+      self.assertEqual((1, 2), (cache.hits, cache.misses))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_compilation_cache_components(self):
+    """Test that pipelines using components out of reach of the cache key are not cached."""
+    from types import SimpleNamespace
+    from kfp.components._structures import ComponentSpec
+
+    def load_component(image):
+      return ComponentSpec.from_struct({'name': 'Echo', 'implementation': {'container': {'image': image}}})
+
+    # Stands for a task factory of kfp.components, which carries its ComponentSpec.
+    task_factory = SimpleNamespace(component_spec=load_component('image'))
+
+    @dsl.pipeline(name='reachable', description='')
+    def reachable_pipeline():
+      op = dsl.ContainerOp(name='echo', image='image')
+      op._component_spec = task_factory.component_spec
+
+    @dsl.pipeline(name='unreachable', description='')
+    def unreachable_pipeline():
+      op = dsl.ContainerOp(name='echo', image='image')
+      op._component_spec = load_component('image')
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+      cache = compiler.CompilationCache(os.path.join(tmpdir, 'cache'))
+      package_path = os.path.join(tmpdir, 'package.tar.gz')
+      for _ in range(2):
+        compiler.Compiler().compile(reachable_pipeline, package_path, cache=cache)
+      self.assertEqual((1, 1), (cache.hits, cache.misses))
+      for _ in range(2):
+        compiler.Compiler().compile(unreachable_pipeline, package_path, cache=cache)
+      self.assertEqual((1, 3), (cache.hits, cache.misses))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_group_tree_index(self):
+    """Test the ancestor chains and lowest common ancestors of the group tree index."""
+    from kfp.compiler._group_index import GroupTreeIndex
+
+    with dsl.Pipeline('somename') as p:
+      param = dsl.PipelineParam('param')
+      op1 = dsl.ContainerOp(name='op1', image='image')
+      with dsl.Condition(param == 'a') as condition1:
+        with dsl.Condition(param == 'b') as condition2:
+          op2 = dsl.ContainerOp(name='op2', image='image')
+        op3 = dsl.ContainerOp(name='op3', image='image')
+
+    index = GroupTreeIndex(p.groups[0])
+    self.assertEqual(['somename', condition1.name, condition2.name, 'op2'], index.ancestors['op2'])
+    self.assertEqual(condition1.name, index.lowest_common_ancestor('op2', 'op3'))
+    self.assertEqual(([condition2.name, 'op2'], ['op3']), index.uncommon_ancestors('op2', 'op3'))
+    self.assertEqual((['op1'], [condition1.name, 'op3']), index.uncommon_ancestors('op1', 'op3'))
+    self.assertEqual(['somename', condition1.name, condition2.name], [g.name for g in index.groups])
+    self.assertEqual(['param'], [x.name for x in index.condition_params['op2']])
+
+  def test_process_args(self):
+    """Test replacing serialized params with input references in a single pass."""
+    with dsl.Pipeline('somename') as p:
+      msg1 = dsl.PipelineParam('msg_1')
+      msg2 = dsl.PipelineParam('msg2', value='a.*[b]+')
+      op = dsl.ContainerOp(name='echo', image='image', command=['sh', '-c'],
+                           arguments=['echo %s %s' % (msg1, msg2), '--flag', str(msg1) * 3])
+    from kfp.compiler._k8s_helper import K8sHelper
+    for param in op.argument_inputs:
+      param.name = K8sHelper.sanitize_k8s_name(param.name)
+    processed = compiler.Compiler()._process_args(op.arguments, op.argument_inputs, p.placeholders)
+    self.assertEqual(['echo {{inputs.parameters.msg-1}} {{inputs.parameters.msg2}}',
+                      '--flag',
+                      '{{inputs.parameters.msg-1}}' * 3], processed)
+
+  def test_json_package(self):
+    """Test compiling a workflow into a pipeline.json package."""
+    import json
+    from kfp import Client
+
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    sys.path.append(test_data_dir)
+    import basic
+    tmpdir = tempfile.mkdtemp()
+    package_path = os.path.join(tmpdir, 'workflow.tar.gz')
+    try:
+      compiler.Compiler().compile(basic.save_most_frequent_word, package_path, package_format='json')
+      with tarfile.open(package_path, 'r:gz') as tar:
+        self.assertEqual(['pipeline.json'], tar.getnames())
+        compiled = json.load(tar.extractfile('pipeline.json'))
+      with open(os.path.join(test_data_dir, 'basic.yaml'), 'r') as f:
+        golden = yaml.load(f)
+
+      self.maxDiff = None
+      self.assertEqual(golden, compiled)
+      self.assertEqual(golden, Client.__new__(Client)._extract_pipeline_yaml(package_path))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_deduplicate_templates(self):
+    """Test that fan-out ops differing only in argument values share one template."""
+
+    @dsl.pipeline(name='fan out', description='')
+    def fan_out_pipeline(prefix='x'):
+      producer = dsl.ContainerOp(name='producer', image='alpine:3.9', command=['sh', '-c'],
+                                 arguments=['echo a > /tmp/out.txt'],
+                                 file_outputs={'out': '/tmp/out.txt'})
+      for i in range(3):
+        worker = dsl.ContainerOp(name='worker-%d' % i, image='python:3.7', command=['python3', '-c'],
+                                 arguments=['print(1)', str(i), prefix, producer.output],
+                                 file_outputs={'result': '/tmp/result.txt'})
+      dsl.ContainerOp(name='consumer', image='alpine:3.9', command=['echo'],
+                      arguments=[worker.output])
+
+    plain = compiler.Compiler()._compile(fan_out_pipeline)
+    dedup_compiler = compiler.Compiler()
+    workflow = dedup_compiler._compile(fan_out_pipeline, deduplicate_templates=True)
+
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertEqual(len(plain['spec']['templates']) - 2, len(templates))
+    self.assertIn('worker-0', templates)
+    self.assertNotIn('worker-1', templates)
+    self.assertEqual(['print(1)', '{{inputs.parameters.args-1}}', '{{inputs.parameters.args-2}}',
+                      '{{inputs.parameters.args-3}}'], templates['worker-0']['container']['args'])
+
+    tasks = {t['name']: t for t in templates['fan-out']['dag']['tasks']}
+    self.assertEqual('worker-0', tasks['worker-2']['template'])
+    self.assertEqual([
+        {'name': 'args-1', 'value': '2'},
+        {'name': 'args-2', 'value': '{{inputs.parameters.prefix}}'},
+        {'name': 'args-3', 'value': '{{tasks.producer.outputs.parameters.producer-out}}'},
+    ], tasks['worker-2']['arguments']['parameters'])
+    self.assertEqual([{'name': 'worker-2-result',
+                       'value': '{{tasks.worker-2.outputs.parameters.worker-0-result}}'}],
+                     tasks['consumer']['arguments']['parameters'])
+
+    stats = dedup_compiler.template_deduplication_stats
+    self.assertEqual((len(plain['spec']['templates']), len(templates)), stats[:2])
+    self.assertGreater(stats.bytes_saved, 0)
+
+  def test_fuse_ops(self):
+    """Test fusing a linear chain of python ops into a single pod."""
+    tmpdir = tempfile.mkdtemp()
+
+    def python_op(name, code, *inputs, image='python:3.7'):
+      return dsl.ContainerOp(
+          name=name, image=image, command=[sys.executable, '-c'],
+          arguments=[code, os.path.join(tmpdir, name)] + list(inputs),
+          file_outputs={'out': os.path.join(tmpdir, name)})
+
+    @dsl.pipeline(name='chain', description='')
+    def chain_pipeline(start='1'):
+      code = 'import sys; open(sys.argv[1], "w").write(str(int(sys.argv[2]) + 1))'
+      first = python_op('first', code, start)
+      second = python_op('second', code, first.output)
+      third = python_op('third', code, second.output)
+      python_op('other-image', code, third.output, image='python:3.6')
+      python_op('fan-out-1', code, first.output)
+
+    fusion_compiler = compiler.Compiler()
+    workflow = fusion_compiler._compile(chain_pipeline, fuse_ops=True)
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertEqual({'chain', 'first', 'third', 'other-image', 'fan-out-1'}, set(templates))
+    self.assertEqual((5, 4, 1), fusion_compiler.op_fusion_stats)
+
+    tasks = {t['name']: t for t in templates['chain']['dag']['tasks']}
+    self.assertEqual(['first'], tasks['third']['dependencies'])
+    self.assertEqual([{'name': 'first-out', 'value': '{{tasks.first.outputs.parameters.first-out}}'}],
+                     tasks['third']['arguments']['parameters'])
+    self.assertEqual([{'name': 'third-out', 'value': '{{tasks.third.outputs.parameters.third-out}}'}],
+                     tasks['other-image']['arguments']['parameters'])
+    fused = templates['third']
+    self.assertEqual([{'name': 'first-out'}], fused['inputs']['parameters'])
+    self.assertEqual(['second-out', 'third-out'],
+                     [p['name'] for p in fused['outputs']['parameters']])
+
+    # Run the fused steps with the input value argo would substitute.
+    command = [x.replace('{{inputs.parameters.first-out}}', '41')
+               for x in fused['container']['command'] + fused['container']['args']]
+    try:
+      subprocess.check_call(command)
+      saved_outputs = {p['name']: p['valueFrom']['path'] for p in fused['outputs']['parameters']}
+      with open(saved_outputs['second-out']) as f:
+        self.assertEqual('42', f.read())
+      with open(saved_outputs['third-out']) as f:
+        self.assertEqual('43', f.read())
+    finally:
+      shutil.rmtree(tmpdir)
+      shutil.rmtree('/tmp/kfp-fused-outputs', ignore_errors=True)
+
+  def test_merge_duplicate_ops(self):
+    """Test merging the ops which run the same container with the same inputs."""
+
+    def preprocess(data):
+      return dsl.ContainerOp(name='preprocess', image='image', command=['preprocess', data],
+                             file_outputs={'out': '/out.txt'})
+
+    @dsl.pipeline(name='shared', description='')
+    def shared_pipeline(data='gs://data', flag='on'):
+      first = preprocess(data)
+      second = preprocess(data)
+      dsl.ContainerOp(name='train', image='image', arguments=['train', first.output])
+      evaluate = dsl.ContainerOp(name='evaluate', image='image', arguments=['evaluate', second.output],
+                                 file_outputs={'out': '/out.txt'})
+      # Equal to evaluate once its input is rewired to the first preprocess.
+      dsl.ContainerOp(name='evaluate', image='image', arguments=['evaluate', first.output],
+                      file_outputs={'out': '/out.txt'})
+      dsl.ContainerOp(name='report', image='image', arguments=['report']).after(second)
+      with dsl.Condition(second.output == 'ok'):
+        dsl.ContainerOp(name='publish', image='image', arguments=['publish', evaluate.output])
+        # Not merged with the first preprocess, since it is in another group.
+        preprocess(data)
+
+    dedup_compiler = compiler.Compiler()
+    workflow = dedup_compiler._compile(shared_pipeline, merge_duplicate_ops=True)
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertEqual({'shared', 'condition-1', 'preprocess', 'preprocess-3', 'train', 'evaluate',
+                      'report', 'publish'}, set(templates))
+    self.assertEqual((8, 6, {'preprocess-2': 'preprocess', 'evaluate-2': 'evaluate'}),
+                     dedup_compiler.duplicate_op_stats)
+
+    tasks = {t['name']: t for t in templates['shared']['dag']['tasks']}
+    self.assertEqual(['preprocess'], tasks['evaluate']['dependencies'])
+    self.assertEqual([{'name': 'preprocess-out',
+                       'value': '{{tasks.preprocess.outputs.parameters.preprocess-out}}'}],
+                     tasks['evaluate']['arguments']['parameters'])
+    self.assertEqual(['preprocess'], tasks['report']['dependencies'])
+    self.assertEqual(sorted(['evaluate', 'preprocess']), sorted(tasks['condition-1']['dependencies']))
+    self.assertEqual(['evaluate', '{{inputs.parameters.preprocess-out}}'],
+                     templates['evaluate']['container']['args'])
+    self.assertEqual('{{tasks.preprocess.outputs.parameters.preprocess-out}} == ok',
+                     tasks['condition-1']['when'])
+
+    # Without the pass, every op runs.
+    plain = compiler.Compiler()._compile(shared_pipeline)
+    self.assertEqual(10, len(plain['spec']['templates']))
+
+  def test_merge_duplicate_ops_fields(self):
+    """Test that only the fields compiled into the templates decide whether ops are merged."""
+    from kubernetes import client as k8s_client
+
+    def train(memory):
+      op = dsl.ContainerOp(name='train', image='image', command=['train'])
+      op.add_env_variable(k8s_client.V1EnvVar(name='MODE', value='fast'))
+      op.set_memory_request(memory)
+      # Not compiled, so it does not prevent merging.
+      op.note = object()
+      return op
+
+    @dsl.pipeline(name='fields', description='')
+    def fields_pipeline():
+      train('1G')
+      train('1G')
+      train('2G')
+
+    dedup_compiler = compiler.Compiler()
+    dedup_compiler._compile(fields_pipeline, merge_duplicate_ops=True)
+    self.assertEqual((3, 2, {'train-2': 'train'}), dedup_compiler.duplicate_op_stats)
+
+  def test_targets(self):
+    """Test compiling only the ops needed by the targets."""
+
+    @dsl.pipeline(name='branches', description='')
+    def branches_pipeline(model='a'):
+      exit_op = dsl.ContainerOp(name='cleanup', image='image', command=['cleanup'],
+                                is_exit_handler=True)
+      with dsl.ExitHandler(exit_op):
+        data = dsl.ContainerOp(name='data', image='image', command=['data'],
+                               file_outputs={'out': '/out.txt'})
+        setup = dsl.ContainerOp(name='setup', image='image', command=['setup'])
+        check = dsl.ContainerOp(name='check', image='image', command=['check'],
+                                file_outputs={'out': '/out.txt'})
+        with dsl.Condition(check.output == 'ok'):
+          train = dsl.ContainerOp(name='train', image='image', arguments=['train', data.output],
+                                  file_outputs={'out': '/out.txt'}).after(setup)
+          dsl.ContainerOp(name='eval', image='image', arguments=['eval', train.output])
+          dsl.ContainerOp(name='train', image='image', arguments=['train', model])
+        with dsl.Condition(model == 'b'):
+          dsl.ContainerOp(name='report', image='image', arguments=['report', data.output])
+
+    pruning_compiler = compiler.Compiler()
+    workflow = pruning_compiler._compile(branches_pipeline, targets=['eval'])
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertEqual({'branches', 'exit-handler-1', 'condition-2', 'cleanup', 'data', 'setup',
+                      'check', 'train', 'eval'}, set(templates))
+    self.assertEqual((8, 6), pruning_compiler.op_pruning_stats)
+    self.assertEqual('cleanup', workflow['spec']['onExit'])
+    self.assertEqual(['check', 'condition-2', 'data', 'setup'],
+                     [t['name'] for t in templates['exit-handler-1']['dag']['tasks']])
+
+    workflow = compiler.Compiler()._compile(branches_pipeline, targets=['train 2', 'report'])
+    self.assertEqual({'branches', 'exit-handler-1', 'condition-2', 'condition-3', 'cleanup',
+                      'data', 'check', 'train-2', 'report'},
+                     set(t['name'] for t in workflow['spec']['templates']))
+
+    with self.assertRaises(ValueError):
+      compiler.Compiler()._compile(branches_pipeline, targets=['missing'])
+
+  def test_pipeline_simulator(self):
+    """Test simulating the makespan of a pipeline on a model cluster."""
+
+    @dsl.pipeline(name='simulated', description='')
+    def simulated_pipeline():
+      exit_op = dsl.ContainerOp(name='cleanup', image='image', command=['cleanup'],
+                                is_exit_handler=True)
+      with dsl.ExitHandler(exit_op):
+        prepare = dsl.ContainerOp(name='prepare', image='image', command=['prepare'],
+                                  file_outputs={'out': '/out.txt'}).set_cpu_request('2')
+        dsl.ContainerOp(name='report', image='image', arguments=['report', prepare.output])
+        evaluate = dsl.ContainerOp(name='evaluate', image='image', command=['evaluate'])
+        for _ in range(2):
+          train = dsl.ContainerOp(name='train', image='image', arguments=['train', prepare.output])
+          train.set_cpu_request('6').add_node_selector_constraint('accelerator', 'gpu')
+          evaluate.after(train)
+
+    durations = {'prepare': 10, 'train': 100, 'train 2': 100, 'evaluate': 20, 'report': 5}
+    report = compiler.PipelineSimulator().simulate(simulated_pipeline, durations)
+    self.assertEqual(190, report.makespan)
+    self.assertEqual(['prepare', 'train', 'evaluate'], report.critical_path)
+    self.assertEqual(130, report.critical_path_seconds)
+    self.assertEqual(3, report.peak_concurrency)
+    self.assertEqual({'cpu': 12}, report.peak_resources)
+
+    node_pools = [compiler.NodePool('cpu', 1, {'cpu': '4'}, {}),
+                  compiler.NodePool('gpu', 1, {'cpu': '8000m'}, {'accelerator': 'gpu'})]
+    report = compiler.PipelineSimulator(node_pools).simulate(simulated_pipeline, durations)
+    self.assertEqual(290, report.makespan)
+    self.assertEqual(2, report.peak_concurrency)
+    self.assertEqual({'cpu-0': 195, 'gpu-0': 90}, report.idle_time)
+    self.assertEqual(['prepare', 'report', 'train', 'train-2', 'evaluate', 'cleanup'],
+                     list(report.schedule))
+    self.assertEqual((110, 210, 'gpu-0'), report.schedule['train-2'])
+    self.assertEqual((230, 290, 'cpu-0'), report.schedule['cleanup'])
+
+    with self.assertRaises(ValueError):
+      compiler.PipelineSimulator(node_pools[:1]).simulate(simulated_pipeline, durations)
+
+  def test_pipeline_simulator_ties(self):
+    """Test that the simulator breaks the ties between equal branches by pipeline order."""
+
+    @dsl.pipeline(name='tied', description='')
+    def tied_pipeline():
+      start = dsl.ContainerOp(name='start', image='image', command=['start'])
+      end = dsl.ContainerOp(name='end', image='image', command=['end'])
+      for name in ['zeta', 'alpha', 'mu', 'beta', 'omega', 'kappa']:
+        branch = dsl.ContainerOp(name=name, image='image', command=[name]).after(start)
+        branch.set_cpu_request('1')
+        end.after(branch)
+
+    node_pools = [compiler.NodePool('default', 1, {'cpu': '1'}, {})]
+    report = compiler.PipelineSimulator(node_pools, default_duration=10).simulate(tied_pipeline)
+    self.assertEqual(['start', 'zeta', 'end'], report.critical_path)
+    self.assertEqual(['start', 'zeta', 'alpha', 'mu', 'beta', 'omega', 'kappa', 'end'],
+                     list(report.schedule))
+    self.assertEqual(80, report.makespan)
+
+  def test_pipeline_simulator_concurrent_ops(self):
+    """Test the idle time of a node running several ops at the same time."""
+
+    @dsl.pipeline(name='concurrent', description='')
+    def concurrent_pipeline():
+      start = dsl.ContainerOp(name='start', image='image', command=['start'])
+      for name in ['short', 'long']:
+        dsl.ContainerOp(name=name, image='image', command=[name]).after(start)
+
+    node_pools = [compiler.NodePool('default', 2, {'cpu': '4'}, {})]
+    durations = {'start': 10, 'short': 20, 'long': 50}
+    report = compiler.PipelineSimulator(node_pools).simulate(concurrent_pipeline, durations)
+    self.assertEqual(60, report.makespan)
+    self.assertEqual(2, report.peak_concurrency)
+    self.assertEqual({'default-0'}, {x.node for x in report.schedule.values()})
+    self.assertEqual({'default-0': 0, 'default-1': 60}, report.idle_time)
+
+  def test_artifact_passing(self):
+    """Test passing op outputs as argo artifacts."""
+
+    @dsl.pipeline(name='artifacts', description='')
+    def artifact_pipeline(config='{}'):
+      producer = dsl.ContainerOp(
+          name='producer', image='image', command=['produce', '/tmp/data', '/tmp/count'],
+          output_artifact_paths={'data': '/tmp/data'}, file_outputs={'count': '/tmp/count'})
+      producer.set_artifact_compression('none')
+      with dsl.Condition(config != ''):
+        dsl.ContainerOp(
+            name='consumer', image='image', command=['consume', '/tmp/inputs/data/data'],
+            arguments=['/tmp/inputs/count/data', '/tmp/config.json'],
+            artifact_argument_paths=[
+                dsl.InputArgumentPath(producer.outputs['data']),
+                dsl.InputArgumentPath(producer.outputs['count']),
+                dsl.InputArgumentPath(config, path='/tmp/config.json'),
+            ])
+      dsl.ContainerOp(name='printer', image='image', command=['echo', producer.outputs['count']],
+                      artifact_argument_paths=[
+                          dsl.InputArgumentPath('constant', input='extra', path='/tmp/extra')])
+
+    workflow = compiler.Compiler()._compile(artifact_pipeline)
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+
+    producer_outputs = templates['producer']['outputs']
+    self.assertEqual(['producer-count'], [p['name'] for p in producer_outputs['parameters']])
+    data_artifact = producer_outputs['artifacts'][1]
+    self.assertEqual('producer-data', data_artifact['name'])
+    self.assertEqual('/tmp/data', data_artifact['path'])
+    self.assertEqual({'none': {}}, data_artifact['archive'])
+    self.assertEqual('runs/{{workflow.uid}}/{{pod.name}}/producer-data', data_artifact['s3']['key'])
+    self.assertEqual('producer-count', producer_outputs['artifacts'][0]['name'])
+
+    # The count is also a parameter, since the printer takes it as a value.
+    self.assertEqual({
+      'parameters': [{'name': 'config'}, {'name': 'producer-count'}],
+      'artifacts': [
+        {'name': 'config', 'path': '/tmp/config.json', 'raw': {'data': '{{inputs.parameters.config}}'}},
+        {'name': 'producer-count', 'path': '/tmp/inputs/count/data'},
+        {'name': 'producer-data', 'path': '/tmp/inputs/data/data'},
+      ],
+    }, templates['consumer']['inputs'])
+
+    condition = templates['condition-1']
+    self.assertEqual([{'name': 'producer-count'}, {'name': 'producer-data'}],
+                     condition['inputs']['artifacts'])
+    self.assertEqual({'parameters': [
+                        {'name': 'config', 'value': '{{inputs.parameters.config}}'},
+                        {'name': 'producer-count', 'value': '{{inputs.parameters.producer-count}}'},
+                      ],
+                      'artifacts': [
+                        {'name': 'producer-count', 'from': '{{inputs.artifacts.producer-count}}'},
+                        {'name': 'producer-data', 'from': '{{inputs.artifacts.producer-data}}'},
+                      ]}, condition['dag']['tasks'][0]['arguments'])
+
+    tasks = {t['name']: t for t in templates['artifacts']['dag']['tasks']}
+    self.assertEqual([
+      {'name': 'producer-count', 'from': '{{tasks.producer.outputs.artifacts.producer-count}}'},
+      {'name': 'producer-data', 'from': '{{tasks.producer.outputs.artifacts.producer-data}}'},
+    ], tasks['condition-1']['arguments']['artifacts'])
+    self.assertEqual([{'name': 'extra', 'path': '/tmp/extra', 'raw': {'data': 'constant'}}],
+                     templates['printer']['inputs']['artifacts'])
+    self.assertEqual([{'name': 'producer-count',
+                       'value': '{{tasks.producer.outputs.parameters.producer-count}}'}],
+                     tasks['printer']['arguments']['parameters'])
+
+    @dsl.pipeline(name='artifact as value', description='')
+    def artifact_value_pipeline():
+      producer = dsl.ContainerOp(name='producer', image='image',
+                                 output_artifact_paths={'data': '/tmp/data'})
+      dsl.ContainerOp(name='consumer', image='image', arguments=[producer.output])
+
+    with self.assertRaises(ValueError):
+      compiler.Compiler()._compile(artifact_value_pipeline)
+
+  def test_compiler_profiler(self):
+    """Test recording the time spent in each compiler phase."""
+    test_data_dir = os.path.join(os.path.dirname(__file__), 'testdata')
+    sys.path.append(test_data_dir)
+    import volume
+    tmpdir = tempfile.mkdtemp()
+    try:
+      events = []
+      compiler.Compiler().compile(volume.volume_pipeline, os.path.join(tmpdir, 'a.tar.gz'),
+                                  profiler=lambda *event: events.append(event))
+      self.assertIn('op_template/download', [x[0] for x in events])
+
+      profiler = compiler.CompilerProfiler()
+      compiler.Compiler().compile(volume.volume_pipeline, os.path.join(tmpdir, 'b.tar.gz'),
+                                  profiler=profiler)
+      self.assertEqual(['pipeline_function', 'sanitize', 'group_analysis', 'group_templates',
+                        'k8s_convert', 'op_templates', 'serialize', 'package'],
+                       list(profiler.phases.keys()))
+      self.assertEqual(['download', 'echo'], sorted(profiler.op_templates.keys()))
+      self.assertEqual(1, profiler.phases['op_templates'].calls)
+      self.assertIn('op_templates', profiler.format_report())
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_conventional_artifacts(self):
+    """Test the artifact repository reference and the per op artifact opt out."""
+
+    @dsl.pipeline(name='artifacts', description='')
+    def artifacts_pipeline():
+      dsl.get_pipeline_conf().set_artifact_repository_ref('artifact-repositories', 'minio')
+      dsl.get_pipeline_conf().set_conventional_artifacts(metrics=False)
+      dsl.ContainerOp(name='default', image='image')
+      dsl.ContainerOp(name='metrics', image='image').set_conventional_artifacts(metrics=True)
+      dsl.ContainerOp(name='none', image='image').set_conventional_artifacts(False, False)
+
+    workflow = compiler.Compiler()._compile(artifacts_pipeline)
+    self.assertEqual({'configMap': 'artifact-repositories', 'key': 'minio'},
+                     workflow['spec']['artifactRepositoryRef'])
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertEqual([{'name': 'mlpipeline-ui-metadata', 'path': '/mlpipeline-ui-metadata.json'}],
+                     templates['default']['outputs']['artifacts'])
+    self.assertEqual(['mlpipeline-ui-metadata', 'mlpipeline-metrics'],
+                     [x['name'] for x in templates['metrics']['outputs']['artifacts']])
+    self.assertNotIn('outputs', templates['none'])
+
+  def test_parallel_for(self):
+    """Test compiling ParallelFor loops with static and dynamic items."""
+
+    @dsl.pipeline(name='loops', description='')
+    def loop_pipeline(message='hello'):
+      producer = dsl.ContainerOp(name='producer', image='image', file_outputs={'out': '/tmp/out'})
+      with dsl.ParallelFor([{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}], parallelism=2) as item:
+        dsl.ContainerOp(name='static', image='image', command=['echo', item.a, item.b, message])
+      with dsl.ParallelFor(producer.output) as item:
+        dsl.ContainerOp(name='dynamic', image='image', command=['echo', item])
+
+    templates = {t['name']: t for t in compiler.Compiler()._compile(loop_pipeline)['spec']['templates']}
+    self.assertEqual({
+      'name': 'loop-1',
+      'inputs': {'parameters': [{'name': 'message'}]},
+      'parallelism': 2,
+      'dag': {'tasks': [{
+        'name': 'loop-1-iteration',
+        'template': 'loop-1-iteration',
+        'withItems': [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}],
+        'arguments': {'parameters': [
+          {'name': 'loop-1-item-subvar-a', 'value': '{{item.a}}'},
+          {'name': 'loop-1-item-subvar-b', 'value': '{{item.b}}'},
+          {'name': 'message', 'value': '{{inputs.parameters.message}}'},
+        ]},
+      }]},
+    }, templates['loop-1'])
+    self.assertEqual(['echo', '{{inputs.parameters.loop-1-item-subvar-a}}',
+                      '{{inputs.parameters.loop-1-item-subvar-b}}', '{{inputs.parameters.message}}'],
+                     templates['static']['container']['command'])
+
+    loop_task = templates['loop-2']['dag']['tasks'][0]
+    self.assertEqual('{{inputs.parameters.producer-out}}', loop_task['withParam'])
+    self.assertIn({'name': 'loop-2-item', 'value': '{{item}}'}, loop_task['arguments']['parameters'])
+    root_tasks = {t['name']: t for t in templates['loops']['dag']['tasks']}
+    self.assertEqual(['producer'], root_tasks['loop-2']['dependencies'])
+    self.assertEqual([{'name': 'message', 'value': '{{inputs.parameters.message}}'}],
+                     root_tasks['loop-1']['arguments']['parameters'])
+
+  def test_parallelism(self):
+    """Test the workflow and group parallelism limits."""
+
+    @dsl.pipeline(name='parallelism', description='')
+    def parallelism_pipeline(flag='go'):
+      dsl.get_pipeline_conf().set_parallelism(10)
+      with dsl.Condition(flag == 'go').set_parallelism(2):
+        for i in range(4):
+          dsl.ContainerOp(name='op-%d' % i, image='image')
+      with dsl.ParallelFor(['a', 'b'], parallelism=3) as item:
+        dsl.ContainerOp(name='looped', image='image', command=['echo', item])
+
+    workflow = compiler.Compiler()._compile(parallelism_pipeline)
+    self.assertEqual(10, workflow['spec']['parallelism'])
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertEqual(2, templates['condition-1']['parallelism'])
+    self.assertEqual(3, templates['loop-2']['parallelism'])
+    self.assertNotIn('parallelism', templates['loop-2-iteration'])
+    self.assertNotIn('parallelism', templates['parallelism'])
+
+  def test_parallel_for_outputs_used_outside(self):
+    """Test that the outputs of looped ops cannot be used after the loop."""
+
+    @dsl.pipeline(name='loop outputs', description='')
+    def loop_outputs_pipeline():
+      with dsl.ParallelFor(['a', 'b']) as item:
+        op = dsl.ContainerOp(name='inner', image='image', command=['echo', item],
+                             file_outputs={'out': '/tmp/out'})
+      dsl.ContainerOp(name='outer', image='image', command=['echo', op.output])
+
+    with self.assertRaises(ValueError):
+      compiler.Compiler()._compile(loop_outputs_pipeline)
+
+  def test_step_cache(self):
+    """Test that a cached op restores its outputs instead of running again."""
+    tmpdir = tempfile.mkdtemp()
+    try:
+      cache_dir = os.path.join(tmpdir, 'cache')
+      output_path = os.path.join(tmpdir, 'out', 'value.txt')
+      runs_path = os.path.join(tmpdir, 'runs.txt')
+
+      @dsl.pipeline(name='cached', description='')
+      def cached_pipeline(message='hello'):
+        store = dsl.LocalDirectoryCacheStore('/var/kfp-cache', mount_path=cache_dir)
+        dsl.ContainerOp(
+            name='echo', image='alpine@sha256:0123', command=['sh', '-c'],
+            arguments=['echo run >> %s; mkdir -p %s; echo "$0" > %s' % (
+                runs_path, os.path.dirname(output_path), output_path), message],
+            file_outputs={'value': output_path}).set_caching(store, ttl_seconds=3600)
+
+      workflow = compiler.Compiler()._compile(cached_pipeline)
+      self.assertEqual([{'name': 'kfp-step-cache',
+                         'hostPath': {'path': '/var/kfp-cache', 'type': 'DirectoryOrCreate'}}],
+                       workflow['spec']['volumes'])
+      template = [t for t in workflow['spec']['templates'] if t['name'] == 'echo'][0]
+      self.assertNotIn('args', template['container'])
+      self.assertEqual([{'mountPath': cache_dir, 'name': 'kfp-step-cache'}],
+                       template['container']['volumeMounts'])
+      command = template['container']['command']
+      self.assertEqual(['sh', '-c'], command[:2])
+      self.assertEqual('{{inputs.parameters.message}}', command[-1])
+
+      def run(message):
+        subprocess.check_call([x.replace('{{inputs.parameters.message}}', message) for x in command])
+        with open(output_path) as f:
+          value = f.read().strip()
+        os.remove(output_path)
+        with open(runs_path) as f:
+          return value, len(f.readlines())
+
+      self.assertEqual(('hello', 1), run('hello'))
+      self.assertEqual(('hello', 1), run('hello'))
+      self.assertEqual(('bye', 2), run('bye'))
+
+      # Stale entries are recomputed.
+      for entry in os.listdir(cache_dir):
+        with open(os.path.join(cache_dir, entry, 'created'), 'w') as f:
+          f.write('0')
+      self.assertEqual(('hello', 3), run('hello'))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_step_cache_input_artifacts(self):
+    """Test that the step cache key covers the contents of the input artifacts."""
+    tmpdir = tempfile.mkdtemp()
+    try:
+      cache_dir = os.path.join(tmpdir, 'cache')
+      input_path = os.path.join(tmpdir, 'in', 'data')
+      output_path = os.path.join(tmpdir, 'out', 'value.txt')
+      runs_path = os.path.join(tmpdir, 'runs.txt')
+
+      @dsl.pipeline(name='cached', description='')
+      def cached_pipeline():
+        store = dsl.LocalDirectoryCacheStore('/var/kfp-cache', mount_path=cache_dir)
+        producer = dsl.ContainerOp(name='produce', image='image', command=['produce'],
+                                   output_artifact_paths={'data': '/data'})
+        dsl.ContainerOp(
+            name='copy', image='alpine@sha256:0123', command=['sh', '-c'],
+            arguments=['echo run >> %s; mkdir -p %s; cat %s/* > %s' % (
+                runs_path, os.path.dirname(output_path), input_path, output_path)],
+            artifact_argument_paths=[dsl.InputArgumentPath(producer.outputs['data'], path=input_path)],
+            file_outputs={'value': output_path}).set_caching(store)
+
+      workflow = compiler.Compiler()._compile(cached_pipeline)
+      template = [t for t in workflow['spec']['templates'] if t['name'] == 'copy'][0]
+      command = template['container']['command']
+
+      def run(data):
+        os.makedirs(input_path, exist_ok=True)
+        with open(os.path.join(input_path, 'part-0'), 'w') as f:
+          f.write(data)
+        subprocess.check_call(command)
+        with open(output_path) as f:
+          value = f.read().strip()
+        os.remove(output_path)
+        with open(runs_path) as f:
+          return value, len(f.readlines())
+
+      self.assertEqual(('hello', 1), run('hello'))
+      self.assertEqual(('hello', 1), run('hello'))
+      self.assertEqual(('bye', 2), run('bye'))
+    finally:
+      shutil.rmtree(tmpdir)
+
+  def test_scheduling_constraints(self):
+    """Test affinity, tolerations and priority classes of ops and pipelines."""
+    from kubernetes import client as k8s_client
+
+    affinity = k8s_client.V1Affinity(
+        node_affinity=k8s_client.V1NodeAffinity(
+            required_during_scheduling_ignored_during_execution=k8s_client.V1NodeSelector(
+                node_selector_terms=[k8s_client.V1NodeSelectorTerm(match_expressions=[
+                    k8s_client.V1NodeSelectorRequirement(key='zone', operator='In', values=['a'])])])))
+    toleration = k8s_client.V1Toleration(key='preemptible', operator='Exists', effect='NoSchedule')
+
+    @dsl.pipeline(name='scheduling', description='')
+    def scheduling_pipeline():
+      dsl.get_pipeline_conf().add_toleration(toleration)
+      dsl.get_pipeline_conf().set_priority_class('batch')
+      dsl.ContainerOp(name='default', image='image')
+      dsl.ContainerOp(name='critical', image='image') \
+        .add_affinity(affinity) \
+        .add_toleration(k8s_client.V1Toleration(key='gpu', operator='Exists')) \
+        .set_priority_class('latency-critical')
+
+    workflow = compiler.Compiler()._compile(scheduling_pipeline)
+    self.assertEqual([{'key': 'preemptible', 'operator': 'Exists', 'effect': 'NoSchedule'}],
+                     workflow['spec']['tolerations'])
+    self.assertEqual('batch', workflow['spec']['podPriorityClassName'])
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertNotIn('affinity', templates['default'])
+    self.assertEqual({'nodeAffinity': {'requiredDuringSchedulingIgnoredDuringExecution': {
+        'nodeSelectorTerms': [{'matchExpressions': [{'key': 'zone', 'operator': 'In', 'values': ['a']}]}]
+    }}}, templates['critical']['affinity'])
+    self.assertEqual([{'key': 'gpu', 'operator': 'Exists'}], templates['critical']['tolerations'])
+    self.assertEqual('latency-critical', templates['critical']['priorityClassName'])
+
+  def test_timeouts_and_retries(self):
+    """Test op timeouts, retry backoff and their pipeline level defaults."""
+
+    @dsl.pipeline(name='retries', description='')
+    def retry_pipeline():
+      conf = dsl.get_pipeline_conf()
+      conf.set_timeout(7200)
+      conf.set_default_timeout(600)
+      conf.set_default_retry(2, policy='OnError')
+      dsl.ContainerOp(name='default', image='image')
+      dsl.ContainerOp(name='custom', image='image') \
+        .set_timeout(60) \
+        .set_retry(5, policy='Always', backoff_duration=30, backoff_factor=2,
+                   backoff_max_duration='1h')
+
+    workflow = compiler.Compiler()._compile(retry_pipeline)
+    self.assertEqual(7200, workflow['spec']['activeDeadlineSeconds'])
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    self.assertEqual(600, templates['default']['activeDeadlineSeconds'])
+    self.assertEqual({'limit': 2, 'retryPolicy': 'OnError'}, templates['default']['retryStrategy'])
+    self.assertEqual(60, templates['custom']['activeDeadlineSeconds'])
+    self.assertEqual({
+      'limit': 5,
+      'retryPolicy': 'Always',
+      'backoff': {'duration': '30s', 'factor': 2, 'maxDuration': '1h'},
+    }, templates['custom']['retryStrategy'])
+
+  def test_init_containers_and_sidecars(self):
+    """Test init containers, sidecars and the data prefetch helpers."""
+    from kubernetes import client as k8s_client
+    from kfp import gcp, onprem
+
+    @dsl.pipeline(name='prefetch', description='')
+    def prefetch_pipeline():
+      op = dsl.ContainerOp(name='train', image='image')
+      op.add_init_container(k8s_client.V1Container(name='setup', image='busybox', command=['true']))
+      op.add_sidecar(k8s_client.V1Container(name='proxy', image='proxy'), mirror_volume_mounts=True)
+      op.apply(gcp.use_gcp_secret('user-gcp-sa')).apply(gcp.prefetch_gcs('gs://bucket/data', '/data'))
+      dsl.ContainerOp(name='eval', image='image').apply(onprem.prefetch_s3(
+          's3://bucket/model', '/model', endpoint_url='http://minio:9000', secret_name='minio'))
+
+    workflow = compiler.Compiler()._compile(prefetch_pipeline)
+    templates = {t['name']: t for t in workflow['spec']['templates']}
+    init_containers = templates['train']['initContainers']
+    self.assertEqual(['setup', 'gcs-prefetch'], [c['name'] for c in init_containers])
+    self.assertNotIn('mirrorVolumeMounts', init_containers[0])
+    self.assertTrue(init_containers[1]['mirrorVolumeMounts'])
+    self.assertIn('gsutil -m cp -r gs://bucket/data /data', init_containers[1]['command'][2])
+    self.assertIn('GOOGLE_APPLICATION_CREDENTIALS', [e['name'] for e in init_containers[1]['env']])
+    self.assertEqual([{'name': 'proxy', 'image': 'proxy', 'mirrorVolumeMounts': True}],
+                     templates['train']['sidecars'])
+    self.assertIn({'name': 'gcs-prefetch', 'mountPath': '/data'},
+                  templates['train']['container']['volumeMounts'])
+
+    s3_container = templates['eval']['initContainers'][0]
+    self.assertEqual(['aws', 's3', 'cp', 's3://bucket/model', '/model/', '--recursive',
+                      '--endpoint-url', 'http://minio:9000'], s3_container['command'])
+    self.assertEqual(['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY'],
+                     [e['name'] for e in s3_container['env']])
+    volumes = {v['name']: v for v in workflow['spec']['volumes']}
+    self.assertEqual({}, volumes['gcs-prefetch']['emptyDir'])
+    self.assertEqual({}, volumes['s3-prefetch']['emptyDir'])
@@ -835,6 +835,40 @@ implementation:
         with self.assertRaises(InconsistentTypeException):
             b_task = task_factory_b(in1=a_task.outputs['out1'])
 
+    def test_input_path_argument_is_passed_as_artifact(self):
+        component_a = '''\
+name: Produce
+outputs:
+  - {name: data}
+implementation:
+  container:
+    image: busybox
+    command: [bash, -c, 'mkdir -p "$(dirname "$0")"; date > "$0"', {outputPath: data}]
+'''
+        component_b = '''\
+name: Consume
+inputs:
+  - {name: data}
+implementation:
+  container:
+    image: busybox
+    command: [cat, {inputPath: data}]
+'''
+        task_factory_a = comp.load_component_from_text(component_a)
+        task_factory_b = comp.load_component_from_text(component_b)
+
+        @kfp.dsl.pipeline(name='artifact passing', description='')
+        def artifact_pipeline():
+            a_task = task_factory_a()
+            task_factory_b(a_task.outputs['data'])
+
+        workflow = kfp.compiler.Compiler()._compile(artifact_pipeline)
+        templates = {template['name']: template for template in workflow['spec']['templates']}
+        self.assertEqual(templates['consume']['inputs']['artifacts'], [{'name': 'produce-data', 'path': '/inputs/data/data'}])
+        tasks = {task['name']: task for task in templates['artifact-passing']['dag']['tasks']}
+        self.assertEqual(tasks['consume']['dependencies'], ['produce'])
+        self.assertEqual(tasks['consume']['arguments']['artifacts'], [{'name': 'produce-data', 'from': '{{tasks.produce.outputs.artifacts.produce-data}}'}])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 
-from kfp.dsl import Pipeline, PipelineParam, ContainerOp
+from kfp.dsl import Pipeline, PipelineParam, ContainerOp, InputArgumentPath, LocalDirectoryCacheStore
 import unittest
 
 class TestContainerOp(unittest.TestCase):
@@ -39,3 +39,65 @@ class TestContainerOp(unittest.TestCase):
       op2 = ContainerOp(name='op2', image='image')
       op2.after(op1)
     self.assertCountEqual(op2.dependent_op_names, [op1.name])
+
+  def test_set_caching(self):
+    """Test enabling the step cache."""
+    store = LocalDirectoryCacheStore('/tmp/cache')
+    with Pipeline('somename') as p:
+      op1 = ContainerOp(name='op1', image='image', command=['echo'])
+      op1.set_caching(store, ttl_seconds=60).set_caching(store, ttl_seconds=120)
+      op2 = ContainerOp(name='op2', image='image')
+      with self.assertRaises(ValueError):
+        op2.set_caching(store)
+      for ttl_seconds in [0, 1.5, '60']:
+        with self.assertRaises(ValueError):
+          op1.set_caching(store, ttl_seconds=ttl_seconds)
+
+    self.assertIs(store, op1.cache_store)
+    self.assertEqual(120, op1.cache_ttl_seconds)
+    self.assertEqual(['kfp-step-cache'], [x.name for x in op1.volumes])
+    self.assertEqual(['/kfp-step-cache'], [x.mount_path for x in op1.volume_mounts])
+
+  def test_invalid_retry_and_timeout(self):
+    """Test validating retry policies and timeouts."""
+    with Pipeline('somename') as p:
+      op1 = ContainerOp(name='op1', image='image')
+      with self.assertRaises(ValueError):
+        op1.set_retry(3, policy='Sometimes')
+      for seconds in [0, 1.5, '60', True]:
+        with self.assertRaises(ValueError):
+          op1.set_timeout(seconds)
+      for duration in [0, 0.5, -1]:
+        with self.assertRaises(ValueError):
+          op1.set_retry(3, backoff_duration=duration)
+
+  def test_init_containers_and_sidecars(self):
+    """Test adding init containers and sidecars."""
+    from kubernetes import client as k8s_client
+    with Pipeline('somename') as p:
+      op1 = ContainerOp(name='op1', image='image')
+      init = k8s_client.V1Container(name='init', image='busybox')
+      sidecar = k8s_client.V1Container(name='sidecar', image='proxy')
+      self.assertIs(op1, op1.add_init_container(init).add_sidecar(sidecar, mirror_volume_mounts=True))
+    self.assertEqual([(init, False)], op1.init_containers)
+    self.assertEqual([(sidecar, True)], op1.sidecars)
+
+  def test_artifacts(self):
+    """Test output artifacts and arguments passed as files."""
+    with Pipeline('somename') as p:
+      op1 = ContainerOp(name='op1', image='image', file_outputs={'count': '/tmp/count'},
+                        output_artifact_paths={'data': '/tmp/data'})
+      argument = InputArgumentPath(op1.outputs['data'])
+      self.assertEqual('data', argument.input)
+      self.assertEqual('/tmp/inputs/data/data', argument.path)
+      op2 = ContainerOp(name='op2', image='image', artifact_argument_paths=[argument])
+      self.assertEqual(1, len(op2.inputs))
+      self.assertIs(op1.outputs['data'], op2.inputs[0])
+      with self.assertRaises(ValueError):
+        InputArgumentPath('constant')
+      with self.assertRaises(ValueError):
+        ContainerOp(name='op3', image='image', file_outputs={'data': '/tmp/a'},
+                    output_artifact_paths={'data': '/tmp/b'})
+      with self.assertRaises(ValueError):
+        op2.set_artifact_compression('bzip2')
+    self.assertEqual(['count', 'data'], sorted(op1.outputs.keys()))
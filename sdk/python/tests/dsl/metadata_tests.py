@@ -44,6 +44,24 @@ class TestTypeMeta(unittest.TestCase):
     self.assertNotEqual(type_a, type_b)
     self.assertNotEqual(type_a, type_c)
     self.assertEqual(type_a, type_d)
+    self.assertEqual(hash(type_a), hash(type_d))
+    self.assertEqual(1, len({type_a, type_d}))
+
+  def test_deserialize_memoized(self):
+    type_a = TypeMeta.deserialize("{'GCSPath': {'file_type': 'csv'}}")
+    self.assertEqual(type_a, TypeMeta(name='GCSPath', properties={'file_type': 'csv'}))
+    self.assertEqual(type_a, TypeMeta.deserialize({'GCSPath': {'file_type': 'csv'}}))
+    # The memoized types are shared, so they cannot be modified.
+    with self.assertRaises(TypeError):
+      type_a.properties['file_type'] = 'tsv'
+    with self.assertRaises(AttributeError):
+      type_a.name = 'GCSPatha'
+    # Nor through the properties passed to the constructor.
+    properties = {'file_type': 'csv'}
+    type_b = TypeMeta(name='GCSPath', properties=properties)
+    properties['file_type'] = 'tsv'
+    self.assertEqual(type_a, type_b)
+    self.assertEqual(hash(type_a), hash(type_b))
 
 
 class TestComponentMeta(unittest.TestCase):
@@ -13,7 +13,7 @@
 # limitations under the License.
 
 
-from kfp.dsl import Pipeline, PipelineParam, ContainerOp, ExitHandler, OpsGroup
+from kfp.dsl import Pipeline, PipelineParam, ContainerOp, ExitHandler, OpsGroup, ParallelFor
 import unittest
 
 
@@ -71,3 +71,34 @@ class TestExitHandler(unittest.TestCase):
         exit_op.after(op1)
         with ExitHandler(exit_op=exit_op):
           pass
+
+
+class TestParallelFor(unittest.TestCase):
+
+  def test_basic(self):
+    """Test basic usage."""
+    with Pipeline('somename') as p:
+      with ParallelFor([{'a': 1}, {'a': 2}], parallelism=5) as item:
+        op1 = ContainerOp(name='op1', image='image', arguments=[item.a, item])
+
+    loop_group = p.groups[0].groups[0]
+    self.assertEqual('loop', loop_group.type)
+    self.assertEqual(5, loop_group.parallelism)
+    self.assertEqual([{'a': 1}, {'a': 2}], loop_group.items)
+    self.assertEqual('op1', loop_group.ops[0].name)
+    self.assertEqual('loop-1-item', item.name)
+    self.assertEqual('loop-1-item-subvar-a', item.a.name)
+    self.assertIs(item.a, item.a)
+    self.assertCountEqual(['loop-1-item', 'loop-1-item-subvar-a'], [x.name for x in op1.inputs])
+
+  def test_param_items(self):
+    """Test looping over the items of a PipelineParam."""
+    with Pipeline('somename') as p:
+      op1 = ContainerOp(name='op1', image='image', file_outputs={'out': '/tmp/out'})
+      with ParallelFor(op1.output):
+        pass
+    self.assertIs(op1.output, p.groups[0].groups[0].items_param)
+
+  def test_invalid_items(self):
+    with self.assertRaises(ValueError):
+      ParallelFor('abc')
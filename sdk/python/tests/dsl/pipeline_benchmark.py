@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Pipeline construction benchmark.
+
+Builds pipelines of increasing size and prints the construction time per size. All the ops
+share the same name, which the pipeline makes unique, and consume the output of the previous
+op.
+Usage:
+  python3 pipeline_benchmark.py [--sizes 1000 10000 50000]
+"""
+
+
+import argparse
+import time
+
+import kfp.dsl as dsl
+
+
+def build_pipeline(num_ops, group_size=100):
+  """Builds a pipeline with num_ops same-named ops, split into condition groups of group_size
+  ops."""
+  with dsl.Pipeline('benchmark') as pipeline:
+    flag = dsl.PipelineParam('flag')
+    previous = None
+    for group_start in range(0, num_ops, group_size):
+      with dsl.Condition(flag == 'go'):
+        for _ in range(group_start, min(group_start + group_size, num_ops)):
+          arguments = ['echo %s' % previous.output] if previous is not None else ['echo start']
+          previous = dsl.ContainerOp(
+              name='step',
+              image='alpine:3.9',
+              command=['sh', '-c'],
+              arguments=arguments + ['> /tmp/out.txt'],
+              file_outputs={'out': '/tmp/out.txt'})
+  return pipeline
+
+
+def benchmark(sizes):
+  results = []
+  for size in sizes:
+    start = time.perf_counter()
+    pipeline = build_pipeline(size)
+    results.append((size, time.perf_counter() - start))
+    assert len(pipeline.ops) == size
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000],
+                      help='numbers of ops of the pipelines.')
+  args = parser.parse_args()
+  print('%10s %12s %14s' % ('ops', 'seconds', 'ms per op'))
+  for size, seconds in benchmark(args.sizes):
+    print('%10d %12.3f %14.3f' % (size, seconds, seconds * 1000 / size))
+
+
+if __name__ == '__main__':
+  main()
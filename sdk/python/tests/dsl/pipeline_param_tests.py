@@ -13,8 +13,8 @@
 # limitations under the License.
 
 
-from kfp.dsl import PipelineParam
-from kfp.dsl._pipeline_param import _extract_pipelineparams
+from kfp.dsl import Pipeline, PipelineParam
+from kfp.dsl._pipeline_param import _extract_pipelineparams, _split_serialized_pipelineparams
 from kfp.dsl._metadata import TypeMeta
 import unittest
 
@@ -64,4 +64,55 @@ class TestPipelineParam(unittest.TestCase):
     # Expecting the _extract_pipelineparam to dedup the pipelineparams among all the payloads.
     payload = [str(p1) + stuff_chars + str(p2), str(p2) + stuff_chars + str(p3)]
     params = _extract_pipelineparams(payload)
-    self.assertListEqual([p1, p2, p3], params)
\ No newline at end of file
+    self.assertListEqual([p1, p2, p3], params)
+  def test_split_serialized_pipelineparams(self):
+    """Test tokenizing a payload into literal and placeholder segments."""
+    p1 = PipelineParam(name='param1', op_name='op1')
+    p2 = PipelineParam(name='param2', value='a.*b+')
+    payload = 'echo ' + str(p1) + ' and ' + str(p2)
+    segments = _split_serialized_pipelineparams(payload)
+    self.assertEqual(payload, ''.join(text for text, _ in segments))
+    self.assertEqual(['echo ', str(p1), ' and ', str(p2)], [text for text, _ in segments])
+    self.assertIsNone(segments[0][1])
+    self.assertEqual(('param1', 'op1', ''), segments[1][1][:3])
+    self.assertEqual(('param2', '', 'a.*b+'), segments[3][1][:3])
+    self.assertEqual([('no params', None)], _split_serialized_pipelineparams('no params'))
+
+  def test_interned_placeholders(self):
+    """Test the short placeholders of the params serialized inside a pipeline."""
+    p1 = PipelineParam(name='param1', op_name='op1',
+                       param_type=TypeMeta(name='customized_type_a', properties={'property_a': 'value_a'}))
+    p2 = PipelineParam(name='param2', value='a;b}}')
+    with Pipeline('somename') as p:
+      placeholder = str(p1)
+      self.assertRegex(placeholder, r'^{{pipelineparam:#\d+}}$')
+      self.assertEqual(placeholder, str(p1))
+      placeholder2 = str(p2)
+      payload = ['echo %s %s' % (p1, p2), str(p2)]
+    self.assertEqual(2, len(p.placeholders))
+    params = _extract_pipelineparams(payload, p.placeholders)
+    self.assertEqual([('op1', 'param1', None), (None, 'param2', 'a;b}}')],
+                     [(x.op_name, x.name, x.value) for x in params])
+    self.assertEqual('customized_type_a', params[0].param_type.name)
+    # The extracted params are copies, so modifying them does not change the next extraction.
+    params[0].op_name = 'op2'
+    self.assertEqual('op1', _extract_pipelineparams(payload, p.placeholders)[0].op_name)
+    # The placeholders are only resolved with the registry of their pipeline.
+    self.assertEqual([], _extract_pipelineparams(payload))
+    self.assertEqual([], _extract_pipelineparams(payload, Pipeline('other').placeholders))
+    segments = _split_serialized_pipelineparams(payload[0], p.placeholders)
+    self.assertEqual(['echo ', placeholder, ' ', placeholder2], [text for text, _ in segments])
+    self.assertEqual(('param1', 'op1', ''), segments[1][1][:3])
+    # Outside of a pipeline, the params are serialized in full.
+    self.assertEqual('{{pipelineparam:op=;name=param2;value=a;b}};type=;}}', str(p2))
+
+  def test_interned_placeholders_with_unhashable_values(self):
+    """Test interning params whose values are lists or dicts, like the params of loops."""
+    p1 = PipelineParam(name='items', value=[{'a': 1}, {'a': 2}])
+    p2 = PipelineParam(name='items', value=[{'a': 1}, {'a': 3}])
+    with Pipeline('somename') as p:
+      self.assertEqual(str(p1), str(p1))
+      self.assertNotEqual(str(p1), str(p2))
+      payload = '%s %s' % (p1, p2)
+    self.assertEqual([[{'a': 1}, {'a': 2}], [{'a': 1}, {'a': 3}]],
+                     [x.value for x in _extract_pipelineparams([payload], p.placeholders)])
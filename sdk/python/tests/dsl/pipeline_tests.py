@@ -14,6 +14,7 @@
 
 import kfp
 from kfp.dsl import Pipeline, PipelineParam, ContainerOp, pipeline
+from kfp.dsl._pipeline import PipelineConf
 from kfp.dsl._metadata import PipelineMeta, ParameterMeta, TypeMeta
 from kfp.dsl._types import GCSPath, Integer
 import unittest
@@ -32,6 +33,23 @@ class TestPipeline(unittest.TestCase):
     self.assertEqual(p.ops['op1'].name, 'op1')
     self.assertEqual(p.ops['op2'].name, 'op2')
 
+  def test_op_indexes(self):
+    """Test the unique op names, and the group and dependency indexes of the ops."""
+    with Pipeline('somename') as p:
+      op1 = ContainerOp(name='op', image='image', file_outputs={'out': '/out.txt'})
+      op2 = ContainerOp(name='op', image='image', arguments=[op1.output])
+      op3 = ContainerOp(name='op', image='image').after(op1)
+
+    self.assertEqual(['op', 'op 2', 'op 3'], [op1.name, op2.name, op3.name])
+    self.assertIs(p.op_groups['op 2'], p.groups[0])
+    self.assertEqual({'op'}, p.upstream_ops['op 2'])
+    self.assertEqual({'op'}, p.upstream_ops['op 3'])
+    self.assertEqual({'op 2', 'op 3'}, p.downstream_ops['op'])
+
+    p._rename_ops({'op 2': 'op-2'})
+    self.assertEqual({'op', 'op-2', 'op 3'}, set(p.ops.keys()))
+    self.assertEqual({'op-2', 'op 3'}, p.downstream_ops['op'])
+
   def test_nested_pipelines(self):
     """Test nested pipelines"""
     with self.assertRaises(Exception):
@@ -74,4 +92,17 @@ class TestPipeline(unittest.TestCase):
     golden_meta.inputs.append(ParameterMeta(name='b', description='', param_type=TypeMeta(name='Integer'), default=12))
 
     pipeline_meta = Pipeline.get_pipeline_functions()[my_pipeline1]
-    self.assertEqual(pipeline_meta, golden_meta)
\ No newline at end of file
+    self.assertEqual(pipeline_meta, golden_meta)
+
+  def test_invalid_conf_timeouts(self):
+    """Test validating the timeouts and retry backoffs of the pipeline conf."""
+    conf = PipelineConf()
+    for seconds in [0, 1.5, '60', True]:
+      with self.assertRaises(ValueError):
+        conf.set_timeout(seconds)
+      with self.assertRaises(ValueError):
+        conf.set_default_timeout(seconds)
+    with self.assertRaises(ValueError):
+      conf.set_default_retry(3, backoff_duration=0.5)
+    conf.set_default_retry(3, backoff_duration=30, backoff_max_duration='1h')
+    self.assertEqual(('30s', '1h'), (conf.default_backoff_duration, conf.default_backoff_max_duration))
@@ -13,7 +13,8 @@
 # limitations under the License.
 
 
-from kfp.dsl._types import _instance_to_dict, check_types, GCSPath
+from kfp.dsl._metadata import TypeMeta
+from kfp.dsl._types import _instance_to_dict, check_types, find_type_mismatch, GCSPath, TypeMismatch
 import unittest
 
 class TestTypes(unittest.TestCase):
@@ -64,3 +65,28 @@ class TestTypes(unittest.TestCase):
     self.assertFalse(check_types(typeA, typeC))
     self.assertTrue(check_types(typeC, typeA))
     self.assertFalse(check_types(typeA, typeD))
+
+  def test_find_type_mismatch(self):
+    typeA = {'A': {'X': 'value1', 'Y': 'value2'}}
+    typeB = {'A': {'X': 'value1', 'Y': 'value3'}}
+    self.assertIsNone(find_type_mismatch(typeA, typeA))
+    self.assertEqual(TypeMismatch(TypeMismatch.PROPERTY_VALUE, 'A', 'Y', 'value2', 'value3'),
+                     find_type_mismatch(typeA, typeB))
+    self.assertEqual(TypeMismatch(TypeMismatch.MISSING_PROPERTY, 'A', 'Y', 'value2', None),
+                     find_type_mismatch(typeA, {'A': {'X': 'value1'}}))
+    self.assertEqual(TypeMismatch(TypeMismatch.TYPE_NAME, 'A', None, 'A', 'GCSPath'),
+                     find_type_mismatch(typeA, GCSPath()))
+    self.assertEqual('type name A is different from expected: GCSPath', str(find_type_mismatch(typeA, 'GCSPath')))
+    # TypeMeta and the empty type, which matches any type
+    self.assertIsNone(find_type_mismatch(TypeMeta('A', {'X': 'value1'}), typeA))
+    self.assertIsNone(find_type_mismatch(TypeMeta(), 'GCSPath'))
+    # The memoized results do not depend on the property order
+    self.assertEqual(find_type_mismatch(typeA, typeB),
+                     find_type_mismatch({'A': {'Y': 'value2', 'X': 'value1'}}, typeB))
+    # Nor do they mix up lists and tuples
+    self.assertIsNone(find_type_mismatch({'A': {'X': [1, 2]}}, {'A': {'X': [1, 2]}}))
+    self.assertEqual(TypeMismatch(TypeMismatch.PROPERTY_VALUE, 'A', 'X', (1, 2), [1, 2]),
+                     find_type_mismatch({'A': {'X': (1, 2)}}, {'A': {'X': [1, 2]}}))
+    # Malformed type dicts are checked by their first type, as they always were
+    self.assertEqual(TypeMismatch(TypeMismatch.TYPE_NAME, 'A', None, 'A', 'B'),
+                     find_type_mismatch({'A': {}, 'C': {}}, {'B': {}}))
@@ -0,0 +1,139 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import kfp.dsl as dsl
+from kfp import LocalRunner
+
+
+class TestLocalRunner(unittest.TestCase):
+
+  def test_run(self):
+    """Test running a pipeline locally."""
+
+    def python_op(name, code, *arguments, **kwargs):
+      return dsl.ContainerOp(name=name, image='python:3.7', command=['python3', '-c', code],
+                             arguments=list(arguments), **kwargs)
+
+    write = 'import sys, os; os.makedirs(os.path.dirname(sys.argv[1]), exist_ok=True); open(sys.argv[1], "w").write(sys.argv[2])'
+
+    @dsl.pipeline(name='local', description='')
+    def local_pipeline(word='hello', times='2'):
+      exit_op = python_op('cleanup', write, '/tmp/done.txt', 'done', is_exit_handler=True,
+                          file_outputs={'done': '/tmp/done.txt'})
+      with dsl.ExitHandler(exit_op):
+        repeat = python_op('repeat', 'import sys; open(sys.argv[1], "w").write(sys.argv[2] * int(sys.argv[3]))',
+                           '/tmp/out.txt', word, times, file_outputs={'out': '/tmp/out.txt'})
+        upper = python_op('upper', 'import sys; open(sys.argv[2], "w").write(open(sys.argv[1]).read().upper())',
+                          '/tmp/inputs/text/data', '/tmp/out.txt', file_outputs={'out': '/tmp/out.txt'},
+                          artifact_argument_paths=[dsl.InputArgumentPath(repeat.output, input='text')])
+        with dsl.Condition(times > 1):
+          python_op('many', write, '/tmp/out.txt', upper.output, file_outputs={'out': '/tmp/out.txt'})
+        with dsl.Condition(times == 1):
+          python_op('once', write, '/tmp/out.txt', upper.output, file_outputs={'out': '/tmp/out.txt'})
+        python_op('fail', 'import sys; sys.exit(1)')
+
+    work_dir = tempfile.mkdtemp()
+    try:
+      result = LocalRunner(work_dir=work_dir).run(local_pipeline, {'word': 'ab'})
+      self.assertEqual('Failed', result.status)
+      self.assertEqual({'repeat': 'Succeeded', 'upper': 'Succeeded', 'many': 'Succeeded',
+                        'once': 'Skipped', 'fail': 'Failed', 'cleanup': 'Succeeded'},
+                       result.op_statuses)
+      self.assertEqual({'out': 'abab'}, result.outputs['repeat'])
+      self.assertEqual({'out': 'ABAB'}, result.outputs['many'])
+      self.assertEqual({'done': 'done'}, result.outputs['cleanup'])
+      self.assertTrue(os.path.exists(os.path.join(work_dir, 'fail', 'log.txt')))
+    finally:
+      shutil.rmtree(work_dir)
+
+
+  def test_run_errors(self):
+    """Test that ops which cannot be prepared, started or evaluated fail without aborting the run."""
+
+    @dsl.pipeline(name='errors', description='')
+    def errors_pipeline():
+      exit_op = dsl.ContainerOp(name='cleanup', image='image', command=['missing-cleanup-binary'],
+                                is_exit_handler=True)
+      with dsl.ExitHandler(exit_op):
+        missing = dsl.ContainerOp(name='missing', image='image', command=['missing-binary'],
+                                  file_outputs={'out': '/tmp/out.txt'})
+        dsl.ContainerOp(name='after-missing', image='image', command=['true']).after(missing)
+        silent = dsl.ContainerOp(name='silent', image='image', command=['python3', '-c', 'pass'],
+                                 file_outputs={'out': '/tmp/out.txt'})
+        dsl.ContainerOp(name='consume', image='image', command=['python3', '-c', 'pass'],
+                        artifact_argument_paths=[dsl.InputArgumentPath(silent.output)])
+        with dsl.Condition(silent.output == 'yes'):
+          dsl.ContainerOp(name='conditional', image='image', command=['true'])
+
+    work_dir = tempfile.mkdtemp()
+    try:
+      result = LocalRunner(work_dir=work_dir).run(errors_pipeline)
+      self.assertEqual('Failed', result.status)
+      self.assertEqual({'missing': 'Failed', 'after-missing': 'Omitted', 'silent': 'Succeeded',
+                        'consume': 'Failed', 'conditional': 'Failed', 'cleanup': 'Failed'},
+                       result.op_statuses)
+      with open(os.path.join(work_dir, 'missing', 'log.txt')) as f:
+        self.assertIn('could not be started', f.read())
+      with open(os.path.join(work_dir, 'consume', 'log.txt')) as f:
+        self.assertIn('could not be prepared', f.read())
+    finally:
+      shutil.rmtree(work_dir)
+
+  def test_run_rewrites_whole_paths(self):
+    """Test that only whole output paths are rewritten in the command arguments."""
+    echo = 'import sys; open(sys.argv[1], "w").write(" ".join(sys.argv[2:]))'
+
+    @dsl.pipeline(name='paths', description='')
+    def paths_pipeline():
+      dsl.ContainerOp(name='echo', image='image', command=['python3', '-c', echo],
+                      arguments=['/tmp/out', '/tmp/output_dir', 'wrote /tmp/out', '--out=/tmp/out'],
+                      file_outputs={'out': '/tmp/out'})
+
+    work_dir = tempfile.mkdtemp()
+    try:
+      result = LocalRunner(work_dir=work_dir).run(paths_pipeline)
+      self.assertEqual('Succeeded', result.status)
+      local_path = os.path.join(work_dir, 'echo', 'outputs', 'out', 'out')
+      self.assertEqual('/tmp/output_dir wrote /tmp/out --out=%s' % local_path,
+                       result.outputs['echo']['out'])
+    finally:
+      shutil.rmtree(work_dir)
+
+  def test_run_conf_defaults(self):
+    """Test that the ops get the pipeline level timeout and retries."""
+    count = 'import sys; f = open(sys.argv[1], "a"); f.write("x"); f.close(); sys.exit(1)'
+
+    @dsl.pipeline(name='defaults', description='')
+    def defaults_pipeline():
+      dsl.ContainerOp(name='sleep', image='image', command=['python3', '-c', 'import time; time.sleep(30)'])
+      dsl.ContainerOp(name='retry', image='image', command=['python3', '-c', count],
+                      arguments=['attempts.txt'])
+      dsl.get_pipeline_conf().set_default_timeout(1)
+      dsl.get_pipeline_conf().set_default_retry(2)
+
+    work_dir = tempfile.mkdtemp()
+    try:
+      result = LocalRunner(work_dir=work_dir).run(defaults_pipeline)
+      self.assertEqual({'sleep': 'Failed', 'retry': 'Failed'}, result.op_statuses)
+      with open(os.path.join(work_dir, 'sleep', 'log.txt')) as f:
+        self.assertIn('timed out', f.read())
+      with open(os.path.join(work_dir, 'retry', 'attempts.txt')) as f:
+        self.assertEqual('xxx', f.read())
+    finally:
+      shutil.rmtree(work_dir)
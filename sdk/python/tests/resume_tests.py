@@ -0,0 +1,78 @@
+# Copyright 2019 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import unittest
+
+import kfp.compiler as compiler
+import kfp.dsl as dsl
+from kfp._resume import build_resume_workflow
+
+
+class TestResume(unittest.TestCase):
+
+  def test_build_resume_workflow(self):
+    """Test building a workflow resuming a run from its failed steps."""
+
+    @dsl.pipeline(name='resume', description='')
+    def resume_pipeline():
+      prepare = dsl.ContainerOp(name='prepare', image='image', command=['prepare'],
+                                file_outputs={'count': '/count.txt'},
+                                output_artifact_paths={'data': '/data'})
+      dsl.ContainerOp(name='stats', image='image', command=['stats', prepare.outputs['count']])
+      with dsl.Condition(prepare.outputs['count'] != '0'):
+        dsl.ContainerOp(name='train', image='image', command=['train', prepare.outputs['count']],
+                        artifact_argument_paths=[dsl.InputArgumentPath(prepare.outputs['data'])])
+
+    workflow = compiler.Compiler()._compile(resume_pipeline)
+    workflow['metadata'] = {'name': 'resume-x7k2p', 'uid': '1234'}
+    data_location = {'bucket': 'mlpipeline', 'key': 'runs/1234/prepare-data.tgz'}
+    workflow['status'] = {'phase': 'Failed', 'nodes': {
+      'root': {'type': 'DAG', 'templateName': 'resume', 'displayName': 'resume-x7k2p',
+               'phase': 'Failed'},
+      'p': {'type': 'Pod', 'templateName': 'prepare', 'displayName': 'prepare',
+            'boundaryID': 'root', 'phase': 'Succeeded', 'outputs': {
+              'parameters': [{'name': 'prepare-count', 'value': '12'}],
+              'artifacts': [{'name': 'prepare-data', 'path': '/data', 's3': data_location}]}},
+      's': {'type': 'Pod', 'templateName': 'stats', 'displayName': 'stats',
+            'boundaryID': 'root', 'phase': 'Succeeded'},
+      'c': {'type': 'DAG', 'templateName': 'condition-1', 'displayName': 'condition-1',
+            'boundaryID': 'root', 'phase': 'Failed'},
+      't': {'type': 'Pod', 'templateName': 'train', 'displayName': 'train',
+            'boundaryID': 'c', 'phase': 'Failed'},
+    }}
+
+    resumed, skipped_tasks = build_resume_workflow(workflow)
+    self.assertEqual([('resume', 'prepare'), ('resume', 'stats')], sorted(skipped_tasks))
+    self.assertEqual({'generateName': 'resume-x7k2p-'}, resumed['metadata'])
+    self.assertNotIn('status', resumed)
+    templates = {t['name']: t for t in resumed['spec']['templates']}
+    self.assertEqual({'resume', 'condition-1', 'train'}, set(templates))
+    self.assertEqual([{
+      'name': 'condition-1',
+      'template': 'condition-1',
+      'when': '12 != 0',
+      'arguments': {
+        'parameters': [{'name': 'prepare-count', 'value': '12'}],
+        'artifacts': [{'name': 'prepare-data', 's3': data_location}],
+      },
+    }], templates['resume']['dag']['tasks'])
+    # The workflow of the run is left as it is.
+    self.assertIn('status', workflow)
+    self.assertIn('prepare', [t['name'] for t in workflow['spec']['templates']])
+
+    for node in workflow['status']['nodes'].values():
+      node['phase'] = 'Succeeded'
+    with self.assertRaises(ValueError):
+      build_resume_workflow(workflow)
+